@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up, the change stream uses the ORM.
+from core.streams import EventStreamRouter  # noqa: E402
+
+application = EventStreamRouter(django_application)
@@ -63,8 +63,16 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.nplusone.NPlusOneMiddleware",
 ]
 
+# N+1 query detection, see core.nplusone. Off unless a sample rate is set.
+NPLUSONE_SAMPLE_RATE = float(os.environ.get("NPLUSONE_SAMPLE_RATE", 0))
+NPLUSONE_THRESHOLD = int(os.environ.get("NPLUSONE_THRESHOLD", 10))
+# "log", "raise" or the dotted path of a callable taking the detections
+# and the request, to emit metrics.
+NPLUSONE_ACTION = os.environ.get("NPLUSONE_ACTION", "log")
+
 ROOT_URLCONF = "app.urls"
 
 TEMPLATES = [
@@ -89,16 +97,86 @@ WSGI_APPLICATION = "app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections come from a pool shared by the threads of each worker, see
+# core.db.backends.pooled_postgresql.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.backends.pooled_postgresql",
         "HOST": os.environ.get("DB_HOST"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        "POOL": {
+            "MIN_SIZE": int(os.environ.get("DB_POOL_MIN_SIZE", 1)),
+            "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "MAX_LIFETIME": int(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+            "PING_INTERVAL": 1,
+            "TIMEOUT": 10,
+        },
     }
 }
 
+# Read replicas, with the settings of the primary but their host. Tests use
+# the primary in their place.
+REPLICA_HOSTS = list(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")))
+for index, host in enumerate(REPLICA_HOSTS, start=1):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "REPLICA": True,
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Shards holding the recipes, tags and ingredients of the users, see
+# core.db.sharding. The default database is the first shard. Tests use it in
+# their place.
+SHARD_HOSTS = list(filter(None, os.environ.get("DB_SHARD_HOSTS", "").split(",")))
+for index, host in enumerate(SHARD_HOSTS, start=1):
+    DATABASES[f"shard_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+SHARDS = ["default"] + [f"shard_{index}" for index in range(1, len(SHARD_HOSTS) + 1)]
+# Shard assignments are cached this long, moving a user waits as much.
+# The cache is local to each node, invalidating an entry only reaches the
+# node doing it: the others serve it until it expires.
+SHARD_DIRECTORY_SECONDS = int(os.environ.get("SHARD_DIRECTORY_SECONDS", 30))
+SHARD_DIRECTORY_CACHE = "default"
+
+DATABASE_ROUTERS = ["core.db.routers.ShardRouter", "core.db.routers.ReplicaRouter"]
+# A user reads from the primary for this long after writing.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+# Shared by the nodes, the next request of a user may reach another one.
+REPLICA_STICKY_CACHE = "shared"
+# Replicas further behind are skipped, their lag is measured this often.
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+
+# Cache
+# Shared by the uWSGI workers of a node, see core.cache.SharedMemoryCache.
+# The default size leaves room in Docker's 64MB /dev/shm.
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.SharedMemoryCache",
+        "LOCATION": os.environ.get("CACHE_LOCATION", "/dev/shm/recipe-api-cache"),
+        "OPTIONS": {
+            "SIZE": int(os.environ.get("CACHE_SIZE", 32 * 1024 * 1024)),
+            "SLOT_SIZE": 4096,
+            "WAYS": 8,
+            "STRIPES": 64,
+        },
+    },
+    # On the default database, for the state every node must see. Expired
+    # entries are culled once there are MAX_ENTRIES.
+    "shared": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "shared_cache",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -149,7 +227,38 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.CustomUser"
 
-REST_FRAMEWORK = {"DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema"}
+REST_FRAMEWORK = {
+    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # The browsable API is only rendered in development.
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+    ]
+    + (["rest_framework.renderers.BrowsableAPIRenderer"] if DEBUG else []),
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
 
 # Get the image upload to work through the browsable interface.
 SPECTACULAR_SETTINGS = {"COMPONENT_SPLIT_REQUEST": True}
+
+# Built by the build_schema command, the schema is generated on first use
+# when it is missing.
+SCHEMA_ARTIFACT_DIR = os.environ.get("SCHEMA_ARTIFACT_DIR", BASE_DIR / "schema")
+
+# Sync tokens older than this trigger a full resync, tombstones are kept as long.
+SYNC_TOKEN_MAX_AGE = int(os.environ.get("SYNC_TOKEN_MAX_AGE", 30 * 24 * 60 * 60))
+
+# Limits of the batch endpoint, reads of a parallel batch share the workers.
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", 20))
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 4))
+
+# Broker of the change stream, use core.events.PostgresBroker to fan out
+# the notifications of every worker process through LISTEN/NOTIFY.
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "core.events.LocalBroker")
+EVENTS_MAX_QUEUED = 100
+EVENTS_HEARTBEAT = 15
@@ -13,8 +13,6 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
@@ -24,17 +22,31 @@ from core import views
 # from recipe import urls as recipeUrls
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/health-check/", views.health_check, name="health-check"),
-    path("api/schema/", SpectacularAPIView.as_view(), name="api-schema"),
-    path(
-        "api/docs/",
-        SpectacularSwaggerView.as_view(url_name="api-schema"),
-        name="api-docs",
-    ),
+    path("api/batch/", views.BatchView.as_view(), name="batch"),
     path("api/user/", include("user.urls")),
     path("api/recipe/", include("recipe.urls")),
 ]
 
+# The API-only settings leave out the admin and the schema apps.
+if "django.contrib.admin" in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns.append(path("admin/", admin.site.urls))
+
+if "drf_spectacular" in settings.INSTALLED_APPS:
+    from drf_spectacular.views import SpectacularSwaggerView
+
+    from core.schema import CachedSchemaView
+
+    urlpatterns += [
+        path("api/schema/", CachedSchemaView.as_view(), name="api-schema"),
+        path(
+            "api/docs/",
+            SpectacularSwaggerView.as_view(url_name="api-schema"),
+            name="api-docs",
+        ),
+    ]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
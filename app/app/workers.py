@@ -0,0 +1,72 @@
+"""
+Size the uWSGI workers from the CPUs and the memory of the container.
+
+Prints the number of workers, for scripts/run.sh:
+
+    uwsgi --workers $(python -m app.workers) ...
+"""
+import os
+
+CGROUP = "/sys/fs/cgroup"
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_count():
+    """Return the CPUs available to the process, honouring a cgroup quota"""
+    count = len(os.sched_getaffinity(0))
+    quota = _read(f"{CGROUP}/cpu.max")  # cgroup v2: "<quota> <period>"
+    if quota and not quota.startswith("max"):
+        limit, period = (int(value) for value in quota.split())
+        count = min(count, max(1, limit // period))
+    else:
+        limit = _read(f"{CGROUP}/cpu/cpu.cfs_quota_us")  # cgroup v1
+        period = _read(f"{CGROUP}/cpu/cpu.cfs_period_us")
+        if limit and period and int(limit) > 0:
+            count = min(count, max(1, int(limit) // int(period)))
+    return count
+
+
+def memory_limit():
+    """Return the memory available to the container in bytes"""
+    limits = []
+    for path in (f"{CGROUP}/memory.max", f"{CGROUP}/memory/memory.limit_in_bytes"):
+        value = _read(path)
+        if value and value.isdigit():
+            limits.append(int(value))
+    meminfo = _read("/proc/meminfo") or ""
+    for line in meminfo.splitlines():
+        if line.startswith("MemTotal:"):
+            limits.append(int(line.split()[1]) * 1024)
+    return min(limits) if limits else None
+
+
+def recommended_workers(cpus, memory, worker_memory, reserve):
+    """Return 2 workers per CPU plus one, within the memory budget"""
+    workers = 2 * cpus + 1
+    if memory is not None:
+        workers = min(workers, (memory - reserve) // worker_memory)
+    return max(1, workers)
+
+
+def workers():
+    """Return the worker count, UWSGI_WORKERS overrides the computed one"""
+    if os.environ.get("UWSGI_WORKERS"):
+        return int(os.environ["UWSGI_WORKERS"])
+    mb = 1024 * 1024
+    return recommended_workers(
+        cpu_count(),
+        memory_limit(),
+        int(os.environ.get("WORKER_MEMORY_MB", 96)) * mb,
+        int(os.environ.get("MEMORY_RESERVE_MB", 256)) * mb,
+    )
+
+
+if __name__ == "__main__":
+    print(workers())
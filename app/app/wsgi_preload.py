@@ -0,0 +1,29 @@
+"""
+WSGI config loading and freezing the project before the workers fork.
+
+Run uWSGI without lazy-apps so the master imports this module once, every
+worker then shares the warmed state copy-on-write.
+"""
+import gc
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+# Collections in the master would leave holes in the pages the workers share.
+gc.disable()
+
+application = get_wsgi_application()
+
+from core import preload  # noqa: E402
+
+preload.warm()
+preload.freeze()
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    gc.enable()
+else:
+    postfork(gc.enable)
@@ -0,0 +1,78 @@
+"""
+Benchmarks of the API hot paths.
+
+They are Django test cases that are not collected by the test suite, run
+them with:
+
+    python manage.py test benchmarks --pattern "bench_*.py"
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from core import models
+
+
+def measure(func, repeat=20):
+    """Call func repeat times and return the timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summary(timings):
+    """Return the median and p99 of timings in milliseconds"""
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered), p99
+
+
+def report(title, header, rows):
+    """Print a benchmark result table"""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    print(f"\n{title}")
+    for row in [header, *rows]:
+        print("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))
+
+
+def create_recipes(user, count, tags=20, ingredients=50, per_recipe=5):
+    """Create count recipes linked to shared tags and ingredients"""
+    tag_objs = models.Tag.objects.bulk_create(
+        models.Tag(user=user, name=f"Tag {i}") for i in range(tags)
+    )
+    ingredient_objs = models.Ingredient.objects.bulk_create(
+        models.Ingredient(user=user, name=f"Ingredient {i}") for i in range(ingredients)
+    )
+    recipes = models.Recipe.objects.bulk_create(
+        models.Recipe(
+            user=user,
+            title=f"Recipe {i}",
+            description="Lorem ipsum dolor sit amet " * 10,
+            time_minutes=10 + i % 50,
+            price=Decimal("5.25") + i % 7,
+            link=f"https://example.com/recipes/{i}",
+        )
+        for i in range(count)
+    )
+    if not recipes or recipes[0].pk is None:
+        recipes = list(models.Recipe.objects.filter(user=user).order_by("id"))
+    models.RecipeTag.objects.bulk_create(
+        models.RecipeTag(
+            user=user, recipe_id=recipe.pk, tag_id=tag_objs[(i + j) % tags].pk
+        )
+        for i, recipe in enumerate(recipes)
+        for j in range(min(per_recipe, tags))
+    )
+    models.RecipeIngredient.objects.bulk_create(
+        models.RecipeIngredient(
+            user=user,
+            recipe_id=recipe.pk,
+            ingredient_id=ingredient_objs[(i + j) % ingredients].pk,
+        )
+        for i, recipe in enumerate(recipes)
+        for j in range(min(per_recipe, ingredients))
+    )
+    return recipes
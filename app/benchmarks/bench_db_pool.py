@@ -0,0 +1,84 @@
+"""
+Latency of a query on a pooled connection against a new connection per request
+
+Needs PostgreSQL, run with the project settings rather than a SQLite override.
+"""
+import threading
+import unittest
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from benchmarks import measure, report, summary
+from core.db.backends.pooled_postgresql import base
+from core.db.pool import ConnectionPool
+
+THREADS = 8
+REQUESTS = 200
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class ConnectionPoolBenchmark(SimpleTestCase):
+    """Run SELECT 1 requests from concurrent threads"""
+
+    databases = ["default"]
+
+    def setUp(self):
+        params = connection.get_connection_params()
+        options = connection.settings_dict["OPTIONS"]
+        self.connect = lambda: base.connect(params, options)
+
+    def query(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        conn.rollback()
+
+    def per_request(self):
+        conn = self.connect()
+        try:
+            self.query(conn)
+        finally:
+            conn.close()
+
+    def run_threads(self, request):
+        timings = []
+        lock = threading.Lock()
+
+        def worker():
+            local = measure(request, REQUESTS)
+            with lock:
+                timings.extend(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summary(timings)
+
+    def test_pool(self):
+        pool = ConnectionPool(
+            self.connect, ping=base.ping, min_size=THREADS, max_size=THREADS
+        )
+        pool.fill()
+
+        def pooled():
+            conn = pool.acquire()
+            try:
+                self.query(conn)
+            finally:
+                pool.release(conn, reset=base.reset)
+
+        rows = []
+        for name, request in (("per request", self.per_request), ("pooled", pooled)):
+            median, p99 = self.run_threads(request)
+            rows.append((name, f"{median:.2f}", f"{p99:.2f}"))
+        pool.close()
+        stats = pool.stats()
+        report(
+            f"SELECT 1 from {THREADS} threads, {REQUESTS} requests each",
+            ("connections", "median ms", "p99 ms"),
+            rows,
+        )
+        print(f"pool wait p99 {stats['wait_p99_ms']} ms, created {stats['created']}")
@@ -0,0 +1,49 @@
+"""
+Serialization cost of the fast read path against the DRF serializers
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from benchmarks import create_recipes, measure, report, summary
+from core import models
+from recipe import fastpath, serializers
+
+
+class FastPathBenchmark(TestCase):
+    """Compare RecipeSerializer with the fast path on 1000 recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="bench@example.com", password="benchpass123"
+        )
+        create_recipes(self.user, 1000)
+
+    def test_fastpath(self):
+        queryset = models.Recipe.objects.filter(user=self.user).order_by("-id")
+        prefetched = list(queryset.prefetch_related("tags", "ingredients"))
+
+        cases = [
+            (
+                "RecipeSerializer, queries included",
+                lambda: serializers.RecipeSerializer(
+                    queryset.prefetch_related("tags", "ingredients"), many=True
+                ).data,
+            ),
+            (
+                "RecipeSerializer, objects prefetched",
+                lambda: serializers.RecipeSerializer(prefetched, many=True).data,
+            ),
+            (
+                "fast path, queries included",
+                lambda: fastpath.serialize(queryset, serializers.RecipeSerializer),
+            ),
+        ]
+        rows = []
+        for name, func in cases:
+            median, p99 = summary(measure(func, repeat=10))
+            rows.append((name, f"{median:.1f}", f"{p99:.1f}"))
+        report(
+            "Recipe list serialization, 1000 recipes",
+            ("case", "median ms", "p99 ms"),
+            rows,
+        )
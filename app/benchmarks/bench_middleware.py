@@ -0,0 +1,36 @@
+"""
+Per-request overhead of the full middleware stack against the API-only one
+"""
+from django.conf import settings
+from django.test import Client, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from app import settings_api
+from benchmarks import measure, report, summary
+
+
+class MiddlewareBenchmark(SimpleTestCase):
+    """Time the health check through each middleware stack"""
+
+    def time_stack(self, middleware):
+        with override_settings(MIDDLEWARE=middleware):
+            client = Client()
+            url = reverse("health-check")
+            client.get(url)  # Builds the middleware chain.
+            return summary(measure(lambda: client.get(url), 2000))
+
+    def test_middleware(self):
+        rows = []
+        for name, middleware in (
+            ("app.settings", settings.MIDDLEWARE),
+            ("app.settings_api", settings_api.MIDDLEWARE),
+        ):
+            median, p99 = self.time_stack(middleware)
+            rows.append(
+                (name, len(middleware), f"{median * 1000:.0f}", f"{p99 * 1000:.0f}")
+            )
+        report(
+            "GET /api/health-check/ through the middleware stack",
+            ("settings", "middleware", "median us", "p99 us"),
+            rows,
+        )
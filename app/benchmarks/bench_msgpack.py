@@ -0,0 +1,46 @@
+"""
+Payload size and encode time of MessagePack against JSON
+"""
+import gzip
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import create_recipes, measure, report, summary
+from core import models
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from recipe import fastpath, serializers
+
+
+class MessagePackBenchmark(TestCase):
+    """Compare the encodings of a list of 1000 recipes"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="bench@example.com", password="benchpass123"
+        )
+        create_recipes(user, 1000)
+        self.data = fastpath.serialize(
+            models.Recipe.objects.order_by("-id"), serializers.RecipeSerializer
+        )
+
+    def test_msgpack(self):
+        rows = []
+        for renderer in (JSONRenderer(), ORJSONRenderer(), MessagePackRenderer()):
+            body = renderer.render(self.data)
+            median, p99 = summary(measure(lambda: renderer.render(self.data), 50))
+            rows.append(
+                (
+                    type(renderer).__name__,
+                    len(body),
+                    len(gzip.compress(body)),
+                    f"{median:.2f}",
+                    f"{p99:.2f}",
+                )
+            )
+        report(
+            "Encoding a 1000 recipe list",
+            ("renderer", "bytes", "gzip bytes", "median ms", "p99 ms"),
+            rows,
+        )
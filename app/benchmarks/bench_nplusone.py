@@ -0,0 +1,41 @@
+"""
+Per-request overhead of the N+1 query detector on the recipe list
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks import create_recipes, measure, report, summary
+
+RECIPES = 100
+
+
+class NPlusOneBenchmark(TestCase):
+    """Time the recipe list with the detector off and watching every request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email="bench@example.com", password="x"
+        )
+        create_recipes(cls.user, RECIPES)
+
+    def time_list(self, sample_rate):
+        with override_settings(NPLUSONE_SAMPLE_RATE=sample_rate):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            url = reverse("recipe:recipe-list") + "?fields=id,title,tags"
+            client.get(url)  # Builds the middleware chain.
+            return summary(measure(lambda: client.get(url), 300))
+
+    def test_nplusone(self):
+        rows = []
+        for sample_rate in (0, 1):
+            median, p99 = self.time_list(sample_rate)
+            rows.append((sample_rate, f"{median:.2f}", f"{p99:.2f}"))
+        report(
+            f"GET the list of {RECIPES} recipes",
+            ("sample rate", "median ms", "p99 ms"),
+            rows,
+        )
@@ -0,0 +1,77 @@
+"""
+Per-user query latency and vacuum time of the recipe tables, before and
+after partitioning them by user
+
+Needs PostgreSQL, run with the project settings rather than a SQLite override.
+The tables of the test database stay partitioned for the rest of the run.
+"""
+import random
+import time
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+
+from benchmarks import create_recipes, measure, report, summary
+from core import models
+from core.db import partitioning
+
+USERS = 200
+RECIPES_PER_USER = 100
+QUERIES = 200
+TABLES = ", ".join(model._meta.db_table for model in partitioning.PARTITIONED_MODELS)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class PartitioningBenchmark(TransactionTestCase):
+    """Query the recipes of one user and vacuum after deleting a tenth"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(email=f"user{i}@example.com", password="x")
+            for i in range(USERS)
+        ]
+        for user in self.users:
+            create_recipes(user, RECIPES_PER_USER)
+
+    def per_user_query(self):
+        user = random.choice(self.users)
+        list(
+            models.Recipe.objects.filter(user=user).prefetch_related(
+                "tags", "ingredients"
+            )
+        )
+
+    def vacuum(self):
+        # A tenth of the users churned their recipes.
+        for user in self.users[: USERS // 10]:
+            models.Recipe.objects.filter(user=user).delete()
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM ANALYZE {TABLES}")
+        return (time.perf_counter() - start) * 1000
+
+    def run_layout(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {TABLES}")
+        median, p99 = summary(measure(self.per_user_query, QUERIES))
+        vacuum = self.vacuum()
+        return (name, f"{median:.2f}", f"{p99:.2f}", f"{vacuum:.0f}")
+
+    def test_partitioning(self):
+        rows = [self.run_layout("heap")]
+
+        # The same data again, on the partitioned tables.
+        for user in self.users[: USERS // 10]:
+            create_recipes(user, RECIPES_PER_USER)
+        for model in partitioning.PARTITIONED_MODELS:
+            partitioning.partition(connection, model)
+        rows.append(self.run_layout(f"{partitioning.PARTITIONS} partitions"))
+
+        report(
+            f"{USERS} users with {RECIPES_PER_USER} recipes each",
+            ("tables", "query median ms", "query p99 ms", "vacuum ms"),
+            rows,
+        )
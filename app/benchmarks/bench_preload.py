@@ -0,0 +1,92 @@
+"""
+Unique memory of forked workers with and without the preloaded master
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from benchmarks import report
+
+WORKERS = 4
+
+# Forks workers like the uWSGI master, each serves a few requests and then
+# reports its memory usage.
+MASTER = """
+import gc, json, os, sys
+
+preload = sys.argv[1] == "preload"
+if preload:
+    gc.disable()
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+from core import preload as preloading
+
+if preload:
+    preloading.warm()
+    preloading.freeze()
+
+results = []
+for _ in range({workers}):
+    read, write = os.pipe()
+    if os.fork() == 0:
+        gc.enable()
+        from django.test import Client
+
+        client = Client()
+        for _ in range(20):
+            client.get("/api/health-check/")
+            client.get("/api/recipe/recipes/")
+            client.get("/api/schema/")
+        gc.collect()
+        os.write(write, json.dumps(preloading.memory_usage()).encode())
+        os._exit(0)
+    os.close(write)
+    results.append(json.loads(os.read(read, 4096)))
+    os.wait()
+print(json.dumps(results))
+"""
+
+
+@unittest.skipUnless(os.path.exists("/proc/self/smaps_rollup"), "needs Linux")
+class PreloadBenchmark(SimpleTestCase):
+    """Compare workers forked from a cold and a preloaded master"""
+
+    def run_master(self, mode):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            "PYTHONPATH": os.pathsep.join(sys.path),
+        }
+        result = subprocess.run(
+            [sys.executable, "-c", MASTER.format(workers=WORKERS), mode],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_preload(self):
+        rows = []
+        for mode in ("cold", "preload"):
+            workers = self.run_master(mode)
+            rows.append(
+                (
+                    mode,
+                    WORKERS,
+                    sum(worker["rss"] for worker in workers) // WORKERS,
+                    sum(worker["pss"] for worker in workers) // WORKERS,
+                    sum(worker["uss"] for worker in workers) // WORKERS,
+                )
+            )
+        report(
+            "Mean memory of a worker after serving requests",
+            ("master", "workers", "rss kB", "pss kB", "unique kB"),
+            rows,
+        )
@@ -0,0 +1,36 @@
+"""
+Rendering cost of the orjson renderer against DRF's JSONRenderer
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import create_recipes, measure, report, summary
+from core import models
+from core.renderers import ORJSONRenderer
+from recipe import fastpath, serializers
+
+
+class RendererBenchmark(TestCase):
+    """Compare the renderers on a list of 1000 recipes"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="bench@example.com", password="benchpass123"
+        )
+        create_recipes(user, 1000)
+        self.data = fastpath.serialize(
+            models.Recipe.objects.order_by("-id"), serializers.RecipeSerializer
+        )
+
+    def test_renderers(self):
+        rows = []
+        for renderer in (JSONRenderer(), ORJSONRenderer()):
+            median, p99 = summary(measure(lambda: renderer.render(self.data), 50))
+            size = len(renderer.render(self.data))
+            rows.append((type(renderer).__name__, size, f"{median:.2f}", f"{p99:.2f}"))
+        report(
+            "Rendering a 1000 recipe list",
+            ("renderer", "bytes", "median ms", "p99 ms"),
+            rows,
+        )
@@ -0,0 +1,86 @@
+"""
+Throughput of the shared memory cache under multi-process contention
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from benchmarks import report
+from core.cache import SharedMemoryCache
+
+OPTIONS = {"SIZE": 16 * 1024 * 1024, "SLOT_SIZE": 1024, "WAYS": 8, "STRIPES": 64}
+OPERATIONS = 20000
+KEYS = 2000
+VALUE = {"title": "Recipe", "tags": list(range(20))}
+
+
+def work(make_cache, seed, barrier, results):
+    """Run a mix of 90% reads and read misses filled by a write"""
+    cache = make_cache()
+    rng = random.Random(seed)
+    hits = 0
+    barrier.wait()
+    start = time.perf_counter()
+    for _ in range(OPERATIONS):
+        key = f"recipe:{rng.randrange(KEYS)}"
+        if rng.random() < 0.1:
+            cache.set(key, VALUE)
+        elif cache.get(key) is None:
+            cache.set(key, VALUE)
+        else:
+            hits += 1
+    results.put((time.perf_counter() - start, hits))
+
+
+class SharedMemoryCacheBenchmark(SimpleTestCase):
+    """Compare the shared cache with one local memory cache per process"""
+
+    def run_processes(self, make_cache, processes):
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(processes)
+        results = context.Queue()
+        workers = [
+            context.Process(target=work, args=(make_cache, seed, barrier, results))
+            for seed in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = max(seconds for seconds, _ in outcomes)
+        hits = sum(hits for _, hits in outcomes)
+        return processes * OPERATIONS / elapsed, hits / (processes * OPERATIONS)
+
+    def test_contention(self):
+        rows = []
+        for processes in (1, 2, 4, 8):
+            with tempfile.TemporaryDirectory() as directory:
+                location = os.path.join(directory, "cache")
+                shared, shared_hits = self.run_processes(
+                    lambda: SharedMemoryCache(location, {"OPTIONS": OPTIONS}),
+                    processes,
+                )
+            local, local_hits = self.run_processes(
+                lambda: LocMemCache("bench", {"OPTIONS": {"MAX_ENTRIES": KEYS}}),
+                processes,
+            )
+            rows.append(
+                (
+                    processes,
+                    f"{shared:,.0f}",
+                    f"{shared_hits:.1%}",
+                    f"{local:,.0f}",
+                    f"{local_hits:.1%}",
+                )
+            )
+        report(
+            f"{OPERATIONS} cache operations per process over {KEYS} keys",
+            ("processes", "shared ops/s", "shared hits", "locmem ops/s", "locmem hits"),
+            rows,
+        )
@@ -0,0 +1,42 @@
+"""
+Payload size and latency of sparse fieldsets against the full recipe list
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks import create_recipes, measure, report, summary
+
+RECIPE_URL = reverse("recipe:recipe-list")
+
+
+class SparseFieldsBenchmark(TestCase):
+    """Compare the full recipe list with sparse fieldsets"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="bench@example.com", password="benchpass123"
+        )
+        self.client.force_authenticate(self.user)
+        create_recipes(self.user, 1000)
+
+    def test_sparse_fields(self):
+        cases = [
+            ("full", {}),
+            ("fields=title,time_minutes", {"fields": "title,time_minutes"}),
+            ("expand=tags", {"fields": "title", "expand": "tags"}),
+        ]
+        rows = []
+        for name, params in cases:
+            size = len(self.client.get(RECIPE_URL, params).content)
+            median, p99 = summary(
+                measure(lambda: self.client.get(RECIPE_URL, params), repeat=10)
+            )
+            rows.append((name, size, f"{median:.1f}", f"{p99:.1f}"))
+        report(
+            "Recipe list, 1000 recipes",
+            ("case", "bytes", "median ms", "p99 ms"),
+            rows,
+        )
@@ -1,9 +1,14 @@
 """ Django admin customizations """
 
+from contextlib import contextmanager
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from core import models
+from core.db import sharding
+from core.pagination import EstimatedCountPaginator
 
 
 class UserAdmin(BaseUserAdmin):
@@ -11,6 +16,8 @@ class UserAdmin(BaseUserAdmin):
 
     ordering = ["id"]
     list_display = ["email", "name"]
+    # Prefix searches use the upper(email) index, see migration 0014.
+    search_fields = ["^email"]
     fieldsets = (
         (None, {"fields": ("email", "password", "name")}),
         (
@@ -39,7 +46,146 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class ShardListFilter(admin.SimpleListFilter):
+    """Pick the shard a changelist reads, the default database otherwise"""
+
+    title = _("shard")
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.shard_aliases()]
+
+    def choices(self, changelist):
+        current = self.value() or sharding.PRIMARY
+        for alias, title in self.lookup_choices:
+            yield {
+                "selected": alias == current,
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: alias}
+                ),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        if self.value() in sharding.shard_aliases():
+            return queryset.using(self.value())
+        return queryset
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist of a table with millions of rows.
+
+    Counts are estimated past a threshold, rows come in primary key order
+    and searches match the start of an indexed column. The rows are sharded:
+    the changelist reads one shard at a time and the pages of an object run
+    on the shard holding it. Adding an object and the autocomplete widgets
+    only see the default database.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ["-id"]
+    sortable_by = ["id"]
+    list_select_related = ["user"]
+    list_filter = [ShardListFilter]
+    autocomplete_fields = ["user"]
+
+    def object_shard(self, object_id):
+        """Return the shard holding an object, its id is unique across shards"""
+        for alias in sharding.shard_aliases():
+            try:
+                manager = self.model._default_manager.using(alias)
+                if manager.filter(pk=object_id).exists():
+                    return alias
+            except (ValidationError, ValueError):
+                break
+        return sharding.PRIMARY
+
+    @contextmanager
+    def on_shard_of(self, object_id):
+        if object_id is None:
+            yield
+            return
+        with sharding.use_shard(self.object_shard(object_id)):
+            yield
+
+    def changeform_view(self, request, object_id=None, *args, **kwargs):
+        with self.on_shard_of(object_id):
+            return super().changeform_view(request, object_id, *args, **kwargs)
+
+    def delete_view(self, request, object_id, *args, **kwargs):
+        with self.on_shard_of(object_id):
+            return super().delete_view(request, object_id, *args, **kwargs)
+
+    def history_view(self, request, object_id, *args, **kwargs):
+        with self.on_shard_of(object_id):
+            return super().history_view(request, object_id, *args, **kwargs)
+
+
+class ShardedInline(admin.TabularInline):
+    """Inline whose widgets read the shard of the page"""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if sharding.is_sharded(db_field.related_model):
+            kwargs.setdefault("using", sharding.current_shard())
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class RecipeTagInline(ShardedInline):
+    model = models.RecipeTag
+    fields = ["tag"]
+    autocomplete_fields = ["tag"]
+    extra = 1
+
+
+class RecipeIngredientInline(ShardedInline):
+    model = models.RecipeIngredient
+    fields = ["ingredient"]
+    autocomplete_fields = ["ingredient"]
+    extra = 1
+
+
+class RecipeAdmin(LargeTableAdmin):
+    """Define the admin pages for recipes.
+
+    Tags and ingredients are edited inline with autocomplete widgets rather
+    than as a select listing every row of their table.
+    """
+
+    list_display = ["id", "title", "user", "time_minutes", "price"]
+    search_fields = ["^title"]
+    inlines = [RecipeTagInline, RecipeIngredientInline]
+
+    def save_formset(self, request, form, formset, change):
+        # Set through the many-to-many field so its signals keep the change
+        # log, the events and the documents up to date as for the API.
+        formset.save(commit=False)
+        name = "tag" if formset.model is models.RecipeTag else "ingredient"
+        selected = [
+            inline.cleaned_data[name]
+            for inline in formset.forms
+            if inline.cleaned_data.get(name) and inline not in formset.deleted_forms
+        ]
+        getattr(form.instance, f"{name}s").set(selected)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        for through in [models.RecipeTag, models.RecipeIngredient]:
+            # A recipe given to another user moves its through rows along.
+            through.objects.filter(recipe=recipe).exclude(
+                user_id=recipe.user_id
+            ).update(user_id=recipe.user_id)
+
+
+class RecipeAttrAdmin(LargeTableAdmin):
+    """Define the admin pages for tags and ingredients"""
+
+    list_display = ["id", "name", "user"]
+    search_fields = ["^name"]
+
+
 admin.site.register(models.CustomUser, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, RecipeAttrAdmin)
+admin.site.register(models.Ingredient, RecipeAttrAdmin)
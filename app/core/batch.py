@@ -0,0 +1,169 @@
+"""
+Run several API requests in one, through the URL resolver and in-process.
+
+The batch request is authenticated once, the sub-requests reuse its user
+and token and skip the middleware. Each sub-request commits on its own.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import orjson
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Headers of the sub-responses worth passing on.
+RESPONSE_HEADERS = ("Content-Type", "ETag", "Location", "Retry-After", "Vary")
+
+# Copied from the batch request to the sub-requests, except for the body and
+# the headers about its own response: the sub-responses are embedded in it
+# as JSON, they can be neither compressed nor empty 304s.
+SKIPPED_META = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_CONTENT_TYPE",
+    "HTTP_ACCEPT_ENCODING",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_IF_NONE_MATCH",
+    "wsgi.input",
+)
+
+
+class SubRequestError(Exception):
+    """A sub-request that can not be dispatched"""
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def build_request(parent, method, path, body=None):
+    """Return a WSGI request for a sub-request, authenticated as the parent"""
+    url = urlsplit(path)
+    payload = b"" if body is None else orjson.dumps(body)
+    environ = {
+        key: value for key, value in parent.META.items() if key not in SKIPPED_META
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "HTTP_ACCEPT": "application/json",
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(payload)),
+            "wsgi.input": io.BytesIO(payload),
+        }
+    )
+    request = WSGIRequest(environ)
+    # DRF authenticates requests carrying these without the authenticators.
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    return request
+
+
+def resolve_view(path, excluded=()):
+    """Return the view, args and kwargs of an API path"""
+    url = urlsplit(path)
+    if url.scheme or url.netloc or not url.path.startswith("/api/"):
+        raise SubRequestError(400, "Only paths under /api/ can be batched.")
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        raise SubRequestError(404, "Not found.")
+    if getattr(match.func, "cls", None) in excluded:
+        raise SubRequestError(400, "This path can not be batched.")
+    return match
+
+
+def _body(response):
+    """Return the JSON of a sub-response body"""
+    content = response.content
+    if not content:
+        return b"null"
+    if response.get("Content-Type", "").startswith("application/json"):
+        return content
+    return orjson.dumps(content.decode("utf-8", "replace"))
+
+
+def _error(status, detail):
+    return {"status": status, "headers": {}, "body": orjson.dumps({"detail": detail})}
+
+
+def dispatch(parent, item, excluded=()):
+    """Run one sub-request, return its status, headers and JSON body"""
+    try:
+        match = resolve_view(item["path"], excluded)
+        request = build_request(parent, item["method"], item["path"], item.get("body"))
+        response = match.func(request, *match.args, **match.kwargs)
+        if getattr(response, "streaming", False):
+            return _error(400, "Streaming responses can not be batched.")
+        if hasattr(response, "render"):
+            response.render()
+    except SubRequestError as error:
+        return _error(error.status, error.detail)
+    except Http404:
+        return _error(404, "Not found.")
+    except Exception:
+        logger.exception("Batched %s %s failed", item["method"], item["path"])
+        return _error(500, "Server error.")
+    headers = {name: response[name] for name in RESPONSE_HEADERS if name in response}
+    return {"status": response.status_code, "headers": headers, "body": _body(response)}
+
+
+def _dispatch_in_thread(parent, item, excluded):
+    try:
+        return dispatch(parent, item, excluded)
+    finally:
+        # Worker threads give their connections back after each request.
+        connections.close_all()
+
+
+def run(parent, items, parallel=False, excluded=()):
+    """Run sub-requests in order, return their results in the same order.
+
+    With parallel, consecutive safe sub-requests run concurrently, writes
+    still run one at a time and only after the requests before them.
+    """
+    if not parallel:
+        return [dispatch(parent, item, excluded) for item in items]
+
+    results = []
+    reads = []
+    with ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS) as executor:
+        for item in items + [None]:
+            if item is not None and item["method"] in SAFE_METHODS:
+                reads.append(item)
+                continue
+            if len(reads) == 1:
+                results.append(dispatch(parent, reads[0], excluded))
+            elif reads:
+                results.extend(
+                    executor.map(
+                        lambda read: _dispatch_in_thread(parent, read, excluded),
+                        reads,
+                    )
+                )
+            reads = []
+            if item is not None:
+                results.append(dispatch(parent, item, excluded))
+    return results
+
+
+def render(results):
+    """Return the JSON of the batch response, the bodies kept as they are"""
+    parts = [
+        b'{"status":%d,"headers":%s,"body":%s}'
+        % (result["status"], orjson.dumps(result["headers"]), result["body"])
+        for result in results
+    ]
+    return b'{"responses":[' + b",".join(parts) + b"]}"
@@ -0,0 +1,119 @@
+"""
+Cheap checks run by the fast_boot command before a worker starts serving.
+"""
+import hashlib
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.contrib.staticfiles.finders import get_finders
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import OperationalError
+
+STATIC_MANIFEST = ".collectstatic-hash"
+
+
+def probe(alias="default"):
+    """Open a connection and run a trivial query, raise if it fails"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        connection.close()
+
+
+def backoff(attempt, base=0.1, cap=5.0):
+    """Return a delay with full jitter for a retry attempt"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def wait_for_database(alias="default", timeout=60, on_retry=None):
+    """Probe the database until it answers, return the attempts it took"""
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        try:
+            probe(alias)
+            return attempt + 1
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            if on_retry:
+                on_retry(attempt)
+            time.sleep(backoff(attempt))
+            attempt += 1
+
+
+def static_hash():
+    """Return a hash of the path and content of every static file to collect"""
+    digest = hashlib.sha256()
+    files = []
+    for finder in get_finders():
+        for path, storage in finder.list(["CVS", ".*", "*~"]):
+            prefix = getattr(storage, "prefix", None) or ""
+            files.append((os.path.join(prefix, path), storage.path(path)))
+    # The first finder to list a path wins, as in collectstatic.
+    seen = set()
+    for name, source in files:
+        if name in seen:
+            continue
+        seen.add(name)
+        digest.update(name.encode() + b"\0")
+        with open(source, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def static_manifest_path():
+    return os.path.join(settings.STATIC_ROOT, STATIC_MANIFEST)
+
+
+def collected_hash():
+    """Return the hash recorded by the last collectstatic, or None"""
+    try:
+        with open(static_manifest_path()) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def record_hash(value):
+    with open(static_manifest_path(), "w") as file:
+        file.write(value)
+
+
+def migrated_databases():
+    """Return the databases holding the schema, the default one and the shards"""
+    return list(dict.fromkeys(["default", *settings.SHARDS]))
+
+
+def unapplied_migrations(aliases=None):
+    """Return the migrations migrate would apply on each database, by alias.
+
+    Databases that are up to date are left out.
+    """
+    pending = {}
+    for alias in aliases or migrated_databases():
+        executor = MigrationExecutor(connections[alias])
+        targets = executor.loader.graph.leaf_nodes()
+        plan = [migration for migration, _ in executor.migration_plan(targets)]
+        if plan:
+            pending[alias] = plan
+    return pending
+
+
+def missing_cache_tables(alias="default"):
+    """Return the tables of the database caches createcachetable would create"""
+    existing = set(connections[alias].introspection.table_names())
+    return [
+        caches[name]._table
+        for name in settings.CACHES
+        if isinstance(caches[name], DatabaseCache)
+        and caches[name]._table not in existing
+    ]
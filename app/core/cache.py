@@ -0,0 +1,332 @@
+"""
+Cache backend shared by the worker processes of a node.
+
+The entries live in a memory-mapped file split in sets of fixed-size slots.
+A key hashes to one set and is evicted least recently used first within
+it. Sets are guarded by striped locks: a thread lock for the threads of a
+process and an fcntl range lock for the other processes.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from functools import cached_property
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+MAGIC = b"RCPCACHE"
+VERSION = 1
+
+# magic, version, slot size, sets, ways, stripes
+HEADER = struct.Struct("<8sIIIII")
+HEADER_SIZE = 64
+# hits, misses, evictions, sets of each stripe
+STATS = struct.Struct("<QQQQ")
+STAT_NAMES = ("hits", "misses", "evictions", "sets")
+# key hash (0 for an empty slot), expiry (0 for none), last use, key and
+# value lengths
+SLOT = struct.Struct("<QdQII")
+
+# One region per file and process, cache instances are per thread.
+_regions = {}
+_regions_lock = threading.Lock()
+
+
+def _hash(key):
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class Region:
+    """A memory-mapped file of slots shared by the processes opening it"""
+
+    def __init__(self, path, size, slot_size, ways, stripes):
+        if slot_size <= SLOT.size:
+            raise ImproperlyConfigured(f"SLOT_SIZE must exceed {SLOT.size} bytes.")
+        self.slot_size = slot_size
+        self.ways = ways
+        self.stripes = stripes
+        self.slots_offset = HEADER_SIZE + STATS.size * stripes
+        self.sets = (size - self.slots_offset) // (slot_size * ways)
+        if self.sets < 1:
+            raise ImproperlyConfigured("SIZE is too small for a single set.")
+        self.size = self.slots_offset + self.sets * ways * slot_size
+        self.thread_locks = [threading.Lock() for _ in range(stripes)]
+        header = HEADER.pack(MAGIC, VERSION, slot_size, self.sets, ways, stripes)
+        while not self._open(path, header):
+            pass
+        self.map = mmap.mmap(self.fd, self.size)
+
+    def _open(self, path, header):
+        """Open and initialize the file, False if it has to be reopened"""
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Byte 0 guards the initialization, the stripes lock the next bytes.
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            ready = self._initialize(path, header)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 0)
+        if not ready:
+            os.close(self.fd)
+        return ready
+
+    def _initialize(self, path, header):
+        if os.fstat(self.fd).st_nlink == 0:
+            # Replaced by another process while waiting for the lock.
+            return False
+        existing = os.pread(self.fd, HEADER.size, 0)
+        if existing[:8] == MAGIC and existing != header:
+            # Left with another geometry by a previous release, processes
+            # still mapping it keep it while new ones share a fresh file.
+            os.unlink(path)
+            return False
+        if existing[:8] != MAGIC:
+            os.ftruncate(self.fd, self.size)
+            try:
+                # Reserved now, a full tmpfs would raise SIGBUS on use.
+                os.posix_fallocate(self.fd, 0, self.size)
+            except OSError as exc:
+                os.ftruncate(self.fd, 0)
+                raise ImproperlyConfigured(
+                    f"{path} can not hold {self.size} bytes, make /dev/shm "
+                    f"larger or SIZE smaller: {exc}"
+                )
+            os.pwrite(self.fd, header, 0)
+        return True
+
+    @contextmanager
+    def locked(self, stripe):
+        with self.thread_locks[stripe]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 1 + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 1 + stripe)
+
+    def count(self, stripe, name):
+        """Increment a counter of a stripe, the stripe lock must be held"""
+        offset = HEADER_SIZE + STATS.size * stripe + 8 * STAT_NAMES.index(name)
+        (value,) = struct.unpack_from("<Q", self.map, offset)
+        struct.pack_into("<Q", self.map, offset, value + 1)
+
+    def stats(self):
+        """Return the counters summed over the stripes"""
+        totals = dict.fromkeys(STAT_NAMES, 0)
+        for stripe in range(self.stripes):
+            counters = STATS.unpack_from(self.map, HEADER_SIZE + STATS.size * stripe)
+            for name, value in zip(STAT_NAMES, counters):
+                totals[name] += value
+        return totals
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+def get_region(path, size, slot_size, ways, stripes):
+    with _regions_lock:
+        region = _regions.get(path)
+        if region is None:
+            region = _regions[path] = Region(path, size, slot_size, ways, stripes)
+        return region
+
+
+class SharedMemoryCache(BaseCache):
+    """Cache backend storing the entries in a file shared by the workers.
+
+    LOCATION is the file path, preferably under /dev/shm. OPTIONS take the
+    SIZE of the file in bytes, the SLOT_SIZE holding one entry, the WAYS
+    of each set and the number of lock STRIPES. Entries that do not fit in
+    a slot are not cached.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        options = params.get("OPTIONS", {})
+        super().__init__(params)
+        self._path = location
+        self._geometry = (
+            int(options.get("SIZE", 64 * 1024 * 1024)),
+            int(options.get("SLOT_SIZE", 4096)),
+            int(options.get("WAYS", 8)),
+            int(options.get("STRIPES", 64)),
+        )
+
+    @cached_property
+    def _region(self):
+        return get_region(self._path, *self._geometry)
+
+    def _locate(self, key):
+        """Return the key hash, the first slot offset of its set and its stripe"""
+        key_hash = _hash(key)
+        region = self._region
+        index = key_hash % region.sets
+        offset = region.slots_offset + index * region.ways * region.slot_size
+        return key_hash, offset, index % region.stripes
+
+    def _find(self, key, key_hash, offset):
+        """Return the offset of the live slot of a key, or None"""
+        region = self._region
+        encoded = key.encode()
+        for way in range(region.ways):
+            slot = offset + way * region.slot_size
+            slot_hash, expires, _, key_len, _ = SLOT.unpack_from(region.map, slot)
+            if slot_hash != key_hash:
+                continue
+            start = slot + SLOT.size
+            if region.map[start : start + key_len] != encoded:
+                continue
+            if expires and expires <= time.time():
+                self._clear_slot(slot)
+                return None
+            return slot
+        return None
+
+    def _read(self, slot):
+        region = self._region
+        _, _, _, key_len, value_len = SLOT.unpack_from(region.map, slot)
+        start = slot + SLOT.size + key_len
+        return region.map[start : start + value_len]
+
+    def _write(self, slot, key_hash, key, pickled, expires):
+        region = self._region
+        encoded = key.encode()
+        start = slot + SLOT.size
+        region.map[start : start + len(encoded)] = encoded
+        start += len(encoded)
+        region.map[start : start + len(pickled)] = pickled
+        SLOT.pack_into(
+            region.map,
+            slot,
+            key_hash,
+            expires or 0.0,
+            time.monotonic_ns(),
+            len(encoded),
+            len(pickled),
+        )
+
+    def _touch_slot(self, slot):
+        struct.pack_into("<Q", self._region.map, slot + 16, time.monotonic_ns())
+
+    def _clear_slot(self, slot):
+        SLOT.pack_into(self._region.map, slot, 0, 0.0, 0, 0, 0)
+
+    def _victim(self, offset, stripe):
+        """Return an empty or expired slot of a set, else its least recent one"""
+        region = self._region
+        now = time.time()
+        oldest = None
+        for way in range(region.ways):
+            slot = offset + way * region.slot_size
+            slot_hash, expires, used, _, _ = SLOT.unpack_from(region.map, slot)
+            if not slot_hash or (expires and expires <= now):
+                return slot
+            if oldest is None or used < oldest[0]:
+                oldest = (used, slot)
+        region.count(stripe, "evictions")
+        return oldest[1]
+
+    def _store(self, key, pickled, timeout, only_new=False):
+        expires = self.get_backend_timeout(timeout)
+        key_hash, offset, stripe = self._locate(key)
+        fits = SLOT.size + len(key.encode()) + len(pickled) <= self._region.slot_size
+        with self._region.locked(stripe):
+            slot = self._find(key, key_hash, offset)
+            if only_new and slot is not None:
+                return False
+            if not fits or (expires is not None and expires <= time.time()):
+                if slot is not None:
+                    self._clear_slot(slot)
+                return False
+            if slot is None:
+                slot = self._victim(offset, stripe)
+            self._write(slot, key_hash, key, pickled, expires)
+            self._region.count(stripe, "sets")
+            return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        return self._store(key, pickled, timeout, only_new=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store(key, pickle.dumps(value, self.pickle_protocol), timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        key_hash, offset, stripe = self._locate(key)
+        with self._region.locked(stripe):
+            slot = self._find(key, key_hash, offset)
+            if slot is None:
+                self._region.count(stripe, "misses")
+                return default
+            self._region.count(stripe, "hits")
+            self._touch_slot(slot)
+            pickled = self._read(slot)
+        return pickle.loads(pickled)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        key_hash, offset, stripe = self._locate(key)
+        with self._region.locked(stripe):
+            slot = self._find(key, key_hash, offset)
+            if slot is None:
+                return False
+            expires = self.get_backend_timeout(timeout)
+            struct.pack_into("<d", self._region.map, slot + 8, expires or 0.0)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        key_hash, offset, stripe = self._locate(key)
+        with self._region.locked(stripe):
+            slot = self._find(key, key_hash, offset)
+            if slot is None:
+                raise ValueError("Key '%s' not found" % key)
+            (expires,) = struct.unpack_from("<d", self._region.map, slot + 8)
+            new_value = pickle.loads(self._read(slot)) + delta
+            pickled = pickle.dumps(new_value, self.pickle_protocol)
+            if SLOT.size + len(key.encode()) + len(pickled) > self._region.slot_size:
+                self._clear_slot(slot)
+            else:
+                self._write(slot, key_hash, key, pickled, expires)
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        key_hash, offset, stripe = self._locate(key)
+        with self._region.locked(stripe):
+            return self._find(key, key_hash, offset) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        key_hash, offset, stripe = self._locate(key)
+        with self._region.locked(stripe):
+            slot = self._find(key, key_hash, offset)
+            if slot is None:
+                return False
+            self._clear_slot(slot)
+            return True
+
+    def clear(self):
+        region = self._region
+        for stripe in range(region.stripes):
+            with region.locked(stripe):
+                for index in range(stripe, region.sets, region.stripes):
+                    offset = (
+                        region.slots_offset + index * region.ways * region.slot_size
+                    )
+                    for way in range(region.ways):
+                        self._clear_slot(offset + way * region.slot_size)
+
+    def stats(self):
+        """Return the hit, miss, eviction and set counts of every process"""
+        return self._region.stats()
@@ -0,0 +1,112 @@
+"""
+PostgreSQL backend taking its connections from a per-process pool.
+
+Configured by the POOL dictionary of the database settings: MIN_SIZE,
+MAX_SIZE, MAX_LIFETIME and TIMEOUT in seconds, and PING_INTERVAL, the idle
+time after which a connection is pinged before reuse.
+"""
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions, extras
+
+from core.db.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(conn_params, options):
+    """Open a connection like the postgresql backend does"""
+    connection = base.Database.connect(**conn_params)
+    if "isolation_level" in options:
+        connection.set_session(isolation_level=options["isolation_level"])
+    # Same dummy loads() as the postgresql backend, JSONField decodes itself.
+    extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def ping(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    if not connection.autocommit:
+        connection.rollback()
+
+
+def reset(connection):
+    """Leave no transaction open on a connection going back to the pool"""
+    if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+
+def get_pool(alias, connect, options):
+    """Return the pool of an alias in this process.
+
+    Connections inherited through fork() belong to the parent process, so a
+    forked worker starts a pool of its own.
+    """
+    key = (alias, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                connect,
+                ping=ping,
+                min_size=options.get("MIN_SIZE", 0),
+                max_size=options.get("MAX_SIZE", 10),
+                max_lifetime=options.get("MAX_LIFETIME", 1800),
+                ping_interval=options.get("PING_INTERVAL", 1),
+                timeout=options.get("TIMEOUT", 10),
+            )
+        return pool
+
+
+def pool_stats():
+    """Return the statistics of the pools of this process by alias"""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [
+            (alias, pool) for (alias, owner), pool in _pools.items() if owner == pid
+        ]
+    return {alias: pool.stats() for alias, pool in pools}
+
+
+def close_pools():
+    """Close the idle connections of this process, before forking workers"""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (_, owner), pool in _pools.items() if owner == pid]
+    for pool in pools:
+        pool.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Borrow connections from the pool and give them back on close"""
+
+    @property
+    def pool(self):
+        return get_pool(
+            self.alias,
+            lambda: connect(
+                self.get_connection_params(), self.settings_dict["OPTIONS"]
+            ),
+            self.settings_dict.get("POOL", {}),
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        pool.fill()
+        connection = pool.acquire()
+        # Read the default isolation level like a new connection would.
+        connection.autocommit = False
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = options.get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection, reset=reset)
@@ -0,0 +1,254 @@
+"""
+Hash partition the recipes and their through tables by user, online.
+
+PostgreSQL only. For each table a partitioned copy is created, kept in sync
+by a trigger while the existing rows are copied in batches, then swapped in
+under a short lock. The old table is kept as <table>_unpartitioned until
+dropped.
+
+The primary key of a partitioned table must hold the partition key, so it
+becomes (id, user_id). Foreign keys to core_recipe can not point to that and
+are dropped, the application deletes the dependent rows itself.
+"""
+import logging
+import re
+
+from django.db import transaction
+
+from core import models
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS = 16
+BATCH_SIZE = 10000
+
+PARTITIONED_MODELS = [models.Recipe, models.RecipeTag, models.RecipeIngredient]
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [table])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _table_exists(connection, table):
+    return table in connection.introspection.table_names()
+
+
+def _names(model):
+    table = model._meta.db_table
+    return table, f"{table}_partitioned", f"{table}_mirror"
+
+
+def create_sql(model, partitions=PARTITIONS):
+    """Return the statements creating the partitioned copy of a table"""
+    table, new, _ = _names(model)
+    statements = [
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS) "
+        f"PARTITION BY HASH (user_id)",
+        f"ALTER TABLE {new} ADD PRIMARY KEY (id, user_id)",
+    ]
+    for fields in model._meta.unique_together:
+        columns = ", ".join(model._meta.get_field(name).column for name in fields)
+        statements.append(f"ALTER TABLE {new} ADD UNIQUE (user_id, {columns})")
+    # The per-user lists, the primary key leads with id.
+    statements.append(f"CREATE INDEX ON {new} (user_id, id)")
+    # Leading columns of the unique constraints are indexed already.
+    indexed = {"user_id"} | {
+        model._meta.get_field(fields[0]).column
+        for fields in model._meta.unique_together
+    }
+    for field in model._meta.concrete_fields:
+        if field.is_relation and field.column not in indexed:
+            statements.append(f"CREATE INDEX ON {new} (user_id, {field.column})")
+    statements.extend(
+        f"CREATE TABLE {new}_{index} PARTITION OF {new} "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {index})"
+        for index in range(partitions)
+    )
+    return statements
+
+
+def existing_indexes_sql(connection, model):
+    """Return the statements recreating the other indexes of a table on its copy.
+
+    Unique indexes and the indexes of single foreign keys are left out,
+    create_sql() gives the copy their per-user versions.
+    """
+    table, new, _ = _names(model)
+    relations = {
+        field.column for field in model._meta.concrete_fields if field.is_relation
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_get_indexdef(i.indexrelid), i.indisunique, "
+            "ARRAY(SELECT a.attname::text FROM pg_attribute a "
+            "WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)) "
+            "FROM pg_index i WHERE i.indrelid = %s::regclass",
+            [table],
+        )
+        rows = cursor.fetchall()
+    statements = []
+    for definition, unique, columns in rows:
+        if unique or (len(columns) == 1 and columns[0] in relations):
+            continue
+        statements.append(
+            re.sub(
+                r"^CREATE INDEX \S+ ON (ONLY )?\S+",
+                f"CREATE INDEX ON {new}",
+                definition,
+            )
+        )
+    return statements
+
+
+def mirror_sql(model):
+    """Return the statements copying the writes to a table to its copy"""
+    table, new, mirror = _names(model)
+    columns = [field.column for field in model._meta.concrete_fields]
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in columns
+        if column not in ("id", "user_id")
+    )
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {mirror}() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {new} WHERE id = OLD.id AND user_id = OLD.user_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                -- The row may be in a backfill batch committed since.
+                INSERT INTO {new} SELECT (NEW).*
+                ON CONFLICT (id, user_id) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END $$
+        """,
+        f"DROP TRIGGER IF EXISTS {mirror} ON {table}",
+        f"CREATE TRIGGER {mirror} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {mirror}()",
+    ]
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def prepare(connection, model, partitions=PARTITIONS):
+    """Create the partitioned copy of a table and start mirroring the writes"""
+    _, new, _ = _names(model)
+    with transaction.atomic(using=connection.alias):
+        if not _table_exists(connection, new):
+            _execute(connection, create_sql(model, partitions))
+            _execute(connection, existing_indexes_sql(connection, model))
+        _execute(connection, mirror_sql(model))
+
+
+def backfill(connection, model, batch_size=BATCH_SIZE, log=None):
+    """Copy the rows of a table to its copy, a transaction per batch.
+
+    Rows written from now on are mirrored by the trigger, so the copy stops
+    at the highest id seen when it starts. The rows of a batch are locked
+    until it commits, so the trigger of a concurrent write sees the copy.
+    """
+    table, new, _ = _names(model)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        (last_id,) = cursor.fetchone()
+    copied = 0
+    start = 0
+    while start < last_id:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                # Ids are sparse on the shards, batches go by rows.
+                cursor.execute(
+                    f"SELECT MAX(id) FROM (SELECT id FROM {table} "
+                    f"WHERE id > %s AND id <= %s ORDER BY id LIMIT %s) batch",
+                    [start, last_id, batch_size],
+                )
+                (end,) = cursor.fetchone()
+                if end is None:
+                    break
+                cursor.execute(
+                    f"INSERT INTO {new} SELECT * FROM {table} "
+                    f"WHERE id > %s AND id <= %s FOR SHARE ON CONFLICT DO NOTHING",
+                    [start, end],
+                )
+                copied += cursor.rowcount
+        if log:
+            log(f"{table}: copied ids up to {end} of {last_id}")
+        start = end
+    return copied
+
+
+def swap(connection, model):
+    """Replace a table with its partitioned copy under a short lock"""
+    table, new, mirror = _names(model)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = %s::regclass",
+            [table],
+        )
+        for referencing, constraint in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT "{constraint}"')
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        (sequence,) = cursor.fetchone()
+        cursor.execute(f"DROP TRIGGER {mirror} ON {table}")
+        cursor.execute(f"DROP FUNCTION {mirror}()")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        cursor.execute(f"ALTER TABLE {new} RENAME TO {table}")
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [table],
+        )
+        for (partition,) in cursor.fetchall():
+            suffix = partition.rsplit("_", 1)[1]
+            cursor.execute(f"ALTER TABLE {partition} RENAME TO {table}_p{suffix}")
+        if sequence:
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+
+def partition(
+    connection, model, partitions=PARTITIONS, batch_size=BATCH_SIZE, log=None
+):
+    """Partition a table by user, return the number of rows copied"""
+    table = model._meta.db_table
+    if is_partitioned(connection, table):
+        return 0
+    prepare(connection, model, partitions)
+    copied = backfill(connection, model, batch_size, log)
+    swap(connection, model)
+    logger.info("Partitioned %s in %d partitions", table, partitions)
+    return copied
+
+
+def drop_unpartitioned(connection, model):
+    """Drop the table left by swap(), return whether there was one"""
+    old = f"{model._meta.db_table}_unpartitioned"
+    if not _table_exists(connection, old):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {old}")
+    return True
+
+
+def partition_sizes(connection, model):
+    """Return the (partition, rows) of a partitioned table, estimated"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, child.reltuples::bigint FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass ORDER BY child.relname",
+            [model._meta.db_table],
+        )
+        return cursor.fetchall()
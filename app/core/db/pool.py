@@ -0,0 +1,206 @@
+"""
+Connection pool shared by the threads of a worker process.
+"""
+import collections
+import logging
+import statistics
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection frees up within the pool timeout"""
+
+
+class _Entry:
+    __slots__ = ("connection", "created", "released")
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.released = now
+
+
+class ConnectionPool:
+    """A bounded pool of DB-API connections.
+
+    Idle connections are reused most recently released first. They are
+    pinged before reuse when they sat idle longer than `ping_interval`,
+    and closed once older than `max_lifetime`. Callers wait up to
+    `timeout` seconds for a connection when `max_size` are in use.
+    """
+
+    def __init__(
+        self,
+        connect,
+        ping=None,
+        min_size=0,
+        max_size=10,
+        max_lifetime=1800,
+        ping_interval=1,
+        timeout=10,
+    ):
+        self.connect = connect
+        self.ping = ping
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self._idle = collections.deque()
+        self._entries = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self._waits = collections.deque(maxlen=1000)
+        self._counters = collections.Counter()
+
+    def _expired(self, entry, now):
+        return self.max_lifetime is not None and now - entry.created > self.max_lifetime
+
+    def _discard(self, entry):
+        """Close a connection the pool no longer counts"""
+        with self._condition:
+            self._entries.pop(id(entry.connection), None)
+            self._counters["closed"] += 1
+        try:
+            entry.connection.close()
+        except Exception:
+            logger.debug("Error closing a pooled connection", exc_info=True)
+
+    def _open(self):
+        """Open a connection for a slot already counted in the size"""
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        entry = _Entry(connection, time.monotonic())
+        with self._condition:
+            self._entries[id(connection)] = entry
+            self._counters["created"] += 1
+        return entry
+
+    def _healthy(self, entry, now):
+        if now - entry.released < self.ping_interval or self.ping is None:
+            return True
+        try:
+            self.ping(entry.connection)
+            return True
+        except Exception:
+            with self._condition:
+                self._counters["ping_failures"] += 1
+            return False
+
+    def fill(self):
+        """Open connections until the pool holds min_size"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            entry = self._open()
+            self.release(entry.connection)
+
+    def acquire(self):
+        """Return a connection, waiting for one when the pool is exhausted"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            entry = None
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No connection available within {self.timeout}s "
+                            f"({self.max_size} in use)."
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+            now = time.monotonic()
+            if entry is None:
+                entry = self._open()
+            elif self._expired(entry, now) or not self._healthy(entry, now):
+                with self._condition:
+                    self._size -= 1
+                self._discard(entry)
+                continue
+            with self._condition:
+                self._counters["acquired"] += 1
+                self._counters["waited"] += waited
+                self._waits.append(time.monotonic() - start)
+            return entry.connection
+
+    def release(self, connection, reset=None):
+        """Give a connection back, closing it when it is broken or too old"""
+        entry = self._entries.get(id(connection))
+        if entry is None:
+            connection.close()
+            return
+        now = time.monotonic()
+        broken = getattr(connection, "closed", False)
+        if not broken and reset is not None:
+            try:
+                reset(connection)
+            except Exception:
+                broken = True
+        with self._condition:
+            if broken or self._expired(entry, now):
+                self._size -= 1
+                self._condition.notify()
+            else:
+                entry.released = now
+                self._idle.append(entry)
+                self._condition.notify()
+                return
+        self._discard(entry)
+
+    def close(self):
+        """Close the idle connections, those in use close when released"""
+        with self._condition:
+            idle, self._idle = list(self._idle), collections.deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        """Return the pool size and the acquisition counters and wait times"""
+        with self._condition:
+            waits = sorted(self._waits)
+            stats = {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                **{
+                    name: self._counters[name]
+                    for name in (
+                        "acquired",
+                        "waited",
+                        "timeouts",
+                        "created",
+                        "closed",
+                        "ping_failures",
+                    )
+                },
+            }
+        if waits:
+            p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))]
+            stats.update(
+                wait_median_ms=round(statistics.median(waits) * 1000, 3),
+                wait_p99_ms=round(p99 * 1000, 3),
+                wait_max_ms=round(waits[-1] * 1000, 3),
+            )
+        return stats
@@ -0,0 +1,176 @@
+"""
+Route reads to the replicas and keep a user on the primary after a write.
+
+Views opt in with replica_reads() around safe requests. The router sends
+their reads to a replica unless the user wrote within REPLICA_STICKY_SECONDS
+or every replica lags more than REPLICA_MAX_LAG seconds behind.
+
+ShardRouter comes first and sends the recipe data of a user to their shard,
+see core.db.sharding. The replicas serve the users of the default database.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+from core.db import sharding
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+# alias -> (checked at, lag in seconds or None when unreachable)
+_lag = {}
+_lag_lock = threading.Lock()
+
+LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+def replica_aliases():
+    return [
+        alias
+        for alias, database in settings.DATABASES.items()
+        if database.get("REPLICA")
+    ]
+
+
+@contextmanager
+def replica_reads():
+    """Let the reads of the block go to a replica"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _sticky_key(user_id):
+    return f"db:sticky:{user_id}"
+
+
+def mark_written(user_id):
+    """Keep the reads of a user on the primary for the sticky window"""
+    caches[settings.REPLICA_STICKY_CACHE].set(
+        _sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def is_sticky(user_id):
+    """Whether a user wrote recently enough to read from the primary"""
+    return bool(caches[settings.REPLICA_STICKY_CACHE].get(_sticky_key(user_id)))
+
+
+def replica_lag(alias):
+    """Return how many seconds a replica is behind, 0 if it is not PostgreSQL"""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        (lag,) = cursor.fetchone()
+    return float(lag or 0)
+
+
+def _current_lag(alias):
+    """Return the lag of a replica, measured at most every check interval"""
+    now = time.monotonic()
+    checked = _lag.get(alias)
+    if checked is not None and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    with _lag_lock:
+        checked = _lag.get(alias)
+        if checked is None or now - checked[0] >= settings.REPLICA_LAG_CHECK_INTERVAL:
+            try:
+                lag = replica_lag(alias)
+            except DatabaseError:
+                logger.warning("Replica %s is unreachable", alias, exc_info=True)
+                lag = None
+            checked = _lag[alias] = (now, lag)
+    return checked[1]
+
+
+class ReplicaRouter:
+    """Send the reads allowed by replica_reads() to an up to date replica"""
+
+    @property
+    def replicas(self):
+        return replica_aliases()
+
+    def healthy_replicas(self):
+        healthy = []
+        for alias in self.replicas:
+            lag = _current_lag(alias)
+            if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+                healthy.append(alias)
+        return healthy
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return PRIMARY
+        healthy = self.healthy_replicas()
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in self.replicas
+
+
+class ShardRouter:
+    """Send the queries on the recipe data to the shard of its user.
+
+    The shard comes from the instance of the query, a user_id hint or the
+    shard of the request. Queries on the default database fall through to
+    the next router.
+    """
+
+    def _shard(self, model, hints):
+        if not sharding.is_sharded(model):
+            return None
+        instance = hints.get("instance")
+        if isinstance(instance, get_user_model()):
+            user_id = instance.pk
+        else:
+            user_id = getattr(instance, "user_id", None) or hints.get("user_id")
+        if user_id:
+            alias = sharding.shard_for(user_id)
+        elif instance is not None and instance._state.db:
+            # Through rows and documents go with their recipe.
+            alias = instance._state.db
+        else:
+            alias = sharding.current_shard()
+        return alias if alias != PRIMARY else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding.is_sharded(type(obj1)) and sharding.is_sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards hold the whole schema, their rows point to a copy of the user.
+        return None
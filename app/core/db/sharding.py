@@ -0,0 +1,311 @@
+"""
+Spread the recipes, tags and ingredients of the users over several databases.
+
+A user gets a shard from a consistent hash ring the first time their data is
+used. The assignment is kept in ShardAssignment on the default database, so
+adding a shard only changes where new users go; move_user_shard moves the
+existing ones. Views run a request in use_shard() and ShardRouter sends the
+queries on the sharded models to that shard.
+
+The change log of a user lives on their shard too, so a change commits with
+the data it records. It is not moved: the sync tokens name the shard they
+were made on and clients sync in full after a move.
+"""
+import bisect
+import contextvars
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError, connections, transaction
+
+from core import deletion, models
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+
+# Points of each shard on the ring, more points spread the users more evenly.
+RING_POINTS = 128
+
+BATCH_SIZE = 1000
+
+# The ids of each shard start at its index shifted by this many bits, so the
+# rows of a user keep their ids when moved.
+ID_SHIFT = 40
+
+# The rows of these models live on the shard of their user.
+SHARDED_MODELS = {
+    "core.recipe",
+    "core.tag",
+    "core.ingredient",
+    "core.recipedocument",
+    "core.recipetag",
+    "core.recipeingredient",
+    "core.userrecipestats",
+    "core.change",
+}
+
+# Copied in order, the rows a model points to before the model.
+USER_DATA = [models.Tag, models.Ingredient, models.Recipe]
+
+_current_shard = contextvars.ContextVar("current_shard", default=None)
+
+
+class HashRing:
+    """Consistent hash ring, a new node only takes keys from its neighbours"""
+
+    def __init__(self, nodes, points=RING_POINTS):
+        ring = sorted(
+            (self.hash(f"{node}#{index}"), node)
+            for node in nodes
+            for index in range(points)
+        )
+        self._hashes = [point for point, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    @staticmethod
+    def hash(key):
+        return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], "big")
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, self.hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+@lru_cache(maxsize=8)
+def _ring(shards):
+    return HashRing(shards)
+
+
+def shard_aliases():
+    return list(settings.SHARDS)
+
+
+def is_sharded(model):
+    # Built from its parts, the entries of the database cache only have those.
+    opts = model._meta
+    return f"{opts.app_label}.{opts.model_name}" in SHARDED_MODELS
+
+
+@contextmanager
+def use_shard(alias):
+    """Send the queries of the block on the sharded models to a shard"""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+def offset_sequences(alias):
+    """Move the id sequences of a shard to its own range, PostgreSQL only"""
+    connection = connections[alias]
+    if connection.vendor != "postgresql" or alias not in shard_aliases():
+        return
+    start = shard_aliases().index(alias) << ID_SHIFT
+    if not start:
+        return
+    with connection.cursor() as cursor:
+        for model in USER_DATA:
+            cursor.execute(
+                "SELECT pg_get_serial_sequence(%s, %s)",
+                [model._meta.db_table, model._meta.pk.column],
+            )
+            (sequence,) = cursor.fetchone()
+            cursor.execute(f"SELECT last_value FROM {sequence}")
+            (last,) = cursor.fetchone()
+            if last < start:
+                cursor.execute("SELECT setval(%s, %s)", [sequence, start])
+
+
+def sequences_migrated(sender, using, **kwargs):
+    offset_sequences(using)
+
+
+def _directory_key(user_id):
+    return f"db:shard:{user_id}"
+
+
+def _directory_cache():
+    return caches[settings.SHARD_DIRECTORY_CACHE]
+
+
+def invalidate(user_id):
+    _directory_cache().delete(_directory_key(user_id))
+
+
+def _has_data(alias, user_id):
+    return any(
+        model.objects.using(alias).filter(user_id=user_id).exists()
+        for model in USER_DATA
+    )
+
+
+def copy_user(user_id, alias):
+    """Copy the user row the foreign keys of a shard point to"""
+    User = get_user_model()
+    if User.objects.using(alias).filter(id=user_id).exists():
+        return
+    user = User.objects.using(PRIMARY).get(id=user_id)
+    try:
+        with transaction.atomic(using=alias):
+            User.objects.using(alias).bulk_create([user])
+    except IntegrityError:
+        # Copied by a concurrent request.
+        pass
+
+
+def assign(user_id):
+    """Assign a shard to a user from the ring, return the assignment.
+
+    Users who already have data on the default database, from before it
+    was sharded, stay there.
+    """
+    shards = shard_aliases()
+    if _has_data(PRIMARY, user_id):
+        shard = PRIMARY
+    else:
+        shard = _ring(tuple(shards)).node_for(user_id)
+    if shard != PRIMARY:
+        copy_user(user_id, shard)
+    assignment, _ = models.ShardAssignment.objects.using(PRIMARY).get_or_create(
+        user_id=user_id, defaults={"shard": shard}
+    )
+    return assignment
+
+
+def lookup(user_id):
+    """Return the shard of a user and whether it is being moved"""
+    shards = shard_aliases()
+    if len(shards) == 1:
+        return shards[0], False
+    cache = _directory_cache()
+    cached = cache.get(_directory_key(user_id))
+    if cached is not None:
+        return tuple(cached)
+    assignment = (
+        models.ShardAssignment.objects.using(PRIMARY).filter(user_id=user_id).first()
+    )
+    if assignment is None:
+        assignment = assign(user_id)
+    value = (assignment.shard, assignment.moving)
+    cache.set(_directory_key(user_id), value, settings.SHARD_DIRECTORY_SECONDS)
+    return value
+
+
+def shard_for(user_id):
+    return lookup(user_id)[0]
+
+
+def _copy(user_id, source, target, batch_size):
+    """Copy the rows of a user from one shard to another, keeping their ids"""
+    copied = {}
+    for model in USER_DATA:
+        queryset = model.objects.using(source).filter(user_id=user_id).order_by("pk")
+        last = 0
+        count = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last)[:batch_size])
+            if not rows:
+                break
+            model.objects.using(target).bulk_create(rows)
+            last = rows[-1].pk
+            count += len(rows)
+        copied[model._meta.label_lower] = count
+
+    for through in [models.RecipeTag, models.RecipeIngredient]:
+        # Through rows get new ids on the target, nothing points to them.
+        links = []
+        for link in through.objects.using(source).filter(user_id=user_id).iterator():
+            link.pk = None
+            links.append(link)
+        through.objects.using(target).bulk_create(links, batch_size=batch_size)
+        copied[through._meta.label_lower] = len(links)
+
+    documents = models.RecipeDocument.objects.using(source).filter(
+        recipe__user_id=user_id
+    )
+    models.RecipeDocument.objects.using(target).bulk_create(
+        documents.iterator(), batch_size=batch_size
+    )
+    models.UserRecipeStats.objects.using(target).bulk_create(
+        models.UserRecipeStats.objects.using(source).filter(user_id=user_id)
+    )
+    return copied
+
+
+def delete_user_data(user_id, alias, batch_size=BATCH_SIZE):
+    """Delete the recipe data of a user from a shard, return the rows deleted"""
+    deleted = 0
+    for model in reversed(USER_DATA):
+        while True:
+            count = deletion.delete_batch(model, user_id, batch_size, using=alias)
+            if not count:
+                break
+            deleted += count
+    while True:
+        count = deletion.delete_batch(models.Change, user_id, batch_size, using=alias)
+        if not count:
+            break
+        deleted += count
+    count, _ = (
+        models.UserRecipeStats.objects.using(alias).filter(user_id=user_id).delete()
+    )
+    return deleted + count
+
+
+def _set_moving(user_id, shard, moving):
+    models.ShardAssignment.objects.using(PRIMARY).filter(user_id=user_id).update(
+        shard=shard, moving=moving
+    )
+    invalidate(user_id)
+
+
+def move_user(user_id, target, batch_size=BATCH_SIZE, wait=None, log=None):
+    """Move the recipe data of a user to another shard, while online.
+
+    Writes of the user are refused while moving, reads are served by the
+    source shard until the directory points to the target. The process
+    waits for the cached directory entries to expire before copying and
+    again before deleting the data from the source.
+    """
+    log = log or logger.info
+    if target not in shard_aliases():
+        raise ValueError(f"Unknown shard {target}")
+    wait = settings.SHARD_DIRECTORY_SECONDS if wait is None else wait
+    source = shard_for(user_id)
+    if source == target:
+        return {}
+
+    _set_moving(user_id, source, True)
+    try:
+        log(f"Moving user {user_id} from {source} to {target}, waiting {wait}s")
+        time.sleep(wait)
+        if target != PRIMARY:
+            copy_user(user_id, target)
+        with transaction.atomic(using=target):
+            # Leftovers of an interrupted move.
+            delete_user_data(user_id, target, batch_size)
+            copied = _copy(user_id, source, target, batch_size)
+    except BaseException:
+        _set_moving(user_id, source, False)
+        raise
+    _set_moving(user_id, target, False)
+    log(f"User {user_id} is on {target}, copied {copied}")
+
+    time.sleep(wait)
+    deleted = delete_user_data(user_id, source, batch_size)
+    if source != PRIMARY:
+        get_user_model().objects.using(source).filter(id=user_id).delete()
+    log(f"Deleted {deleted} rows from {source}")
+    return copied
@@ -0,0 +1,43 @@
+"""
+Order the change log by commit rather than by id, on PostgreSQL.
+
+Ids are taken from the sequence when the rows are written, so a reader can
+see id N + 1 while the transaction holding id N has yet to commit. Each
+change records the id of the transaction that wrote it, and readers only
+go past the transactions below the xmin of their snapshot: those are all
+finished. The other databases commit one transaction at a time, their
+rows record 0 and are read in id order.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+XMIN_SQL = "txid_snapshot_xmin(txid_current_snapshot())"
+
+
+def _is_postgresql(using):
+    return connections[using].vendor == "postgresql"
+
+
+def current(using):
+    """Return the id of the current transaction, 0 when not on PostgreSQL"""
+    if not _is_postgresql(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT txid_current()")
+        return cursor.fetchone()[0]
+
+
+def xmin(using):
+    """Return the id below which every transaction is finished, or None"""
+    if not _is_postgresql(using):
+        return None
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT {XMIN_SQL}")
+        return cursor.fetchone()[0]
+
+
+def finished(queryset):
+    """Filter a change queryset to the rows of finished transactions"""
+    if not _is_postgresql(queryset.db):
+        return queryset
+    return queryset.filter(txid__lt=RawSQL(XMIN_SQL, []))
@@ -0,0 +1,138 @@
+"""
+Deferred deletion of user accounts in bounded batches
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connections,
+    models as db_models,
+    router,
+    transaction,
+)
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import models
+
+BATCH_SIZE = 1000
+
+# A running deletion not saved for this long is taken over by another worker,
+# every batch saves its progress.
+LEASE_SECONDS = 300
+
+# Deleted in order, the rows of each model before the models they point to.
+USER_DATA = [models.Recipe, models.Tag, models.Ingredient, models.Change]
+
+
+def schedule_deletion(user):
+    """Deactivate a user at once and queue the deletion of their data"""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        Token.objects.filter(user=user).delete()
+        deletion, _ = models.AccountDeletion.objects.get_or_create(
+            user_id=user.id, defaults={"email": user.email}
+        )
+    return deletion
+
+
+def claim(deletion, lease=LEASE_SECONDS):
+    """Mark a deletion as running for the caller, False if another worker has it.
+
+    Pending deletions are claimed, and running ones whose worker stopped
+    saving progress for lease seconds.
+    """
+    now = timezone.now()
+    claimed = (
+        models.AccountDeletion.objects.filter(pk=deletion.pk)
+        .filter(
+            Q(status=models.AccountDeletion.PENDING)
+            | Q(
+                status=models.AccountDeletion.RUNNING,
+                updated__lt=now - timedelta(seconds=lease),
+            )
+        )
+        .update(status=models.AccountDeletion.RUNNING, updated=now)
+    )
+    if claimed:
+        deletion.refresh_from_db()
+    return bool(claimed)
+
+
+def _dependent_tables(model):
+    """Return the (table, column) pairs of the rows cascading from a model"""
+    tables = []
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        tables.append((through._meta.db_table, field.m2m_column_name()))
+    for rel in model._meta.related_objects:
+        if rel.many_to_many:
+            through = rel.through
+            tables.append((through._meta.db_table, rel.field.m2m_reverse_name()))
+        elif rel.on_delete is db_models.CASCADE:
+            tables.append((rel.related_model._meta.db_table, rel.field.column))
+    return tables
+
+
+def _delete_rows(table, column, ids, using=DEFAULT_DB_ALIAS):
+    """Delete the rows of a table whose column is in ids"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {qn(table)} WHERE {qn(column)} IN ({placeholders})", ids
+        )
+        return cursor.rowcount
+
+
+def delete_batch(model, user_id, batch_size=BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+    """Delete one batch of a user's rows of a model, return the rows deleted"""
+    with transaction.atomic(using=using):
+        ids = list(
+            model.objects.using(using)
+            .filter(user_id=user_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        for table, column in _dependent_tables(model):
+            _delete_rows(table, column, ids, using)
+        return _delete_rows(model._meta.db_table, model._meta.pk.column, ids, using)
+
+
+def run_deletion(deletion, batch_size=BATCH_SIZE):
+    """Delete the data of an account batch by batch, then the account.
+
+    Progress is saved after every batch so an interrupted deletion resumes
+    where it stopped when it is run again.
+    """
+    deletion.status = models.AccountDeletion.RUNNING
+    deletion.save(update_fields=["status", "updated"])
+    for model in USER_DATA:
+        label = model._meta.label_lower
+        # The shard of the user for the recipe data, see core.db.sharding.
+        using = router.db_for_write(model, user_id=deletion.user_id)
+        while True:
+            deleted = delete_batch(model, deletion.user_id, batch_size, using)
+            if not deleted:
+                break
+            deletion.progress[label] = deletion.progress.get(label, 0) + deleted
+            deletion.save(update_fields=["progress", "updated"])
+
+    shard = router.db_for_write(models.Recipe, user_id=deletion.user_id)
+    if shard != DEFAULT_DB_ALIAS:
+        # The copy of the user row the shard's foreign keys point to.
+        get_user_model().objects.using(shard).filter(id=deletion.user_id).delete()
+    with transaction.atomic():
+        # Only small relations such as group memberships remain.
+        get_user_model().objects.filter(id=deletion.user_id).delete()
+        models.ShardAssignment.objects.filter(user_id=deletion.user_id).delete()
+        deletion.status = models.AccountDeletion.DONE
+        deletion.finished = timezone.now()
+        deletion.save(update_fields=["status", "finished", "updated"])
+    return deletion
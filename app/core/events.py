@@ -0,0 +1,164 @@
+"""
+Pub/sub of change notifications for the event stream
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW = {"type": "overflow"}
+
+
+class Subscription:
+    """Queue of the events published to one user on one event loop"""
+
+    def __init__(self, user_id, max_queued):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def deliver(self, event):
+        """Queue an event, must run on the subscription event loop"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client misses events, tell it to resync instead.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process broker, publishers and subscribers share the process"""
+
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Subscribe the running event loop to the events of a user"""
+        subscription = Subscription(user_id, self.max_queued)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def publish(self, user_id, event):
+        """Publish an event to the subscribers of a user from any thread"""
+        self.dispatch(user_id, event)
+
+    def dispatch(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+
+class PostgresBroker(LocalBroker):
+    """Broker fanning events out to every process through LISTEN/NOTIFY.
+
+    Each process holds a single listening connection, opened by the first
+    subscriber, whatever the number of connected clients.
+    """
+
+    CHANNEL = "recipe_events"
+    # NOTIFY payloads must be shorter than 8000 bytes.
+    MAX_PAYLOAD = 7999
+
+    def __init__(self, max_queued=100):
+        super().__init__(max_queued)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="events-listener", daemon=True
+                )
+                self._listener.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        payload = json.dumps({"user_id": user_id, "event": event})
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            # Too many ids, the client resyncs the kind instead.
+            event = {"type": event["type"], "kind": event.get("kind"), "resync": True}
+            payload = json.dumps({"user_id": user_id, "event": event})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.CHANNEL, payload])
+
+    def _listen(self):
+        while True:
+            try:
+                conn = psycopg2.connect(**connection.get_connection_params())
+                try:
+                    self._dispatch_notifies(conn)
+                finally:
+                    conn.close()
+            except Exception:
+                logger.exception("Event listener failed, reconnecting")
+                threading.Event().wait(1)
+
+    def _dispatch_notifies(self, conn):
+        conn.set_isolation_level(0)  # autocommit
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.CHANNEL}")
+        while True:
+            if select.select([conn], [], [], 60) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                message = json.loads(conn.notifies.pop(0).payload)
+                self.dispatch(message["user_id"], message["event"])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the broker configured by the EVENTS_BROKER setting"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTS_BROKER)(
+                max_queued=settings.EVENTS_MAX_QUEUED
+            )
+        return _broker
+
+
+def publish_on_commit(user_id, event, using=None):
+    """Publish an event once the transaction of a database commits.
+
+    The write has committed by then, a failure to publish is only logged.
+    """
+
+    def publish():
+        try:
+            get_broker().publish(user_id, event)
+        except Exception:
+            logger.exception("Publishing an event to user %s failed", user_id)
+
+    transaction.on_commit(publish, using=using)
@@ -0,0 +1,43 @@
+"""
+Django command to build the missing recipe documents.
+"""
+from django.core.management.base import BaseCommand
+
+from core import models
+from core.db import sharding
+from recipe import documents
+
+
+class Command(BaseCommand):
+    """Django command to build the documents of the recipes without one"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=documents.BATCH_SIZE)
+        parser.add_argument(
+            "--database",
+            choices=sharding.shard_aliases(),
+            help="Shard to build on, by default all of them",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        database = options["database"]
+        for alias in [database] if database else sharding.shard_aliases():
+            with sharding.use_shard(alias):
+                built = self.build(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Built {built} documents on {alias}"))
+
+    def build(self, batch_size):
+        """Build the missing documents of a shard, return how many"""
+        missing = models.Recipe.objects.filter(document__isnull=True).order_by("id")
+        built = 0
+        last = 0
+        while True:
+            batch = list(
+                missing.filter(id__gt=last).values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            built += len(documents.rebuild(batch, batch_size))
+            last = batch[-1]
+        return built
@@ -0,0 +1,23 @@
+"""
+Django command to build the OpenAPI schema artifact served by the API.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to render the schema once, at deploy time"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", default=settings.SCHEMA_ARTIFACT_DIR)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        manifest = schema.build(options["directory"])
+        for fmt, entry in manifest["files"].items():
+            self.stdout.write(f"{entry['file']}: {entry['size']} bytes {entry['etag']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Built schema version {manifest['version']}")
+        )
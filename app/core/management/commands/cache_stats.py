@@ -0,0 +1,24 @@
+"""
+Django command to report the hit, miss and eviction counts of the cache.
+"""
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Django command to print the statistics of a shared memory cache"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alias", default="default")
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        cache = caches[options["alias"]]
+        if not hasattr(cache, "stats"):
+            raise CommandError(f"The {options['alias']} cache has no statistics.")
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / lookups if lookups else 0
+        for name, value in stats.items():
+            self.stdout.write(f"{name}: {value}")
+        self.stdout.write(f"hit ratio: {ratio:.2%}")
@@ -0,0 +1,65 @@
+"""
+Django command to check the recipe documents against the live serializers.
+"""
+from django.core.management.base import BaseCommand
+
+from core import models
+from core.db import sharding
+from recipe import documents
+
+
+class Command(BaseCommand):
+    """Django command to report, and optionally rebuild, drifted documents"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Rebuild the drifted documents"
+        )
+        parser.add_argument("--batch-size", type=int, default=documents.BATCH_SIZE)
+        parser.add_argument(
+            "--database",
+            choices=sharding.shard_aliases(),
+            help="Shard to check, by default all of them",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        database = options["database"]
+        for alias in [database] if database else sharding.shard_aliases():
+            with sharding.use_shard(alias):
+                self.check(alias, options["batch_size"], options["fix"])
+
+    def check(self, alias, batch_size, fix):
+        """Check the documents of a shard"""
+        recipe_ids = list(
+            models.RecipeDocument.objects.order_by("recipe_id").values_list(
+                "recipe_id", flat=True
+            )
+        )
+        drifted = []
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start : start + batch_size]
+            stored = models.RecipeDocument.objects.in_bulk(batch)
+            for recipe in documents.recipes_for(batch):
+                live = documents.render(recipe)
+                document = stored[recipe.id]
+                if (document.detail, document.summary, document.has_image) != (
+                    live.detail,
+                    live.summary,
+                    live.has_image,
+                ):
+                    drifted.append(recipe.id)
+
+        for recipe_id in drifted:
+            self.stdout.write(f"Recipe {recipe_id} document drifted")
+        if drifted and fix:
+            documents.rebuild(drifted, batch_size)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt {len(drifted)} drifted documents on {alias}"
+                )
+            )
+        elif not drifted:
+            self.stdout.write(
+                self.style.SUCCESS(f"Checked {len(recipe_ids)} documents on {alias}")
+            )
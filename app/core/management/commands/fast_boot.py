@@ -0,0 +1,72 @@
+"""
+Django command to prepare a container for serving in as little time as possible.
+"""
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core import boot
+
+
+class Command(BaseCommand):
+    """Django command running the startup steps that have work to do.
+
+    The databases are probed instead of running the system checks, static
+    files are collected only when their content changed, migrate only runs
+    on the databases, default and shards, with unapplied migrations and the
+    database cache tables are only created when missing. The time of each
+    phase is reported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--timeout", type=float, default=60)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        self.timings = []
+        with self.phase("wait_for_db"):
+            call_command(
+                "wait_for_db",
+                probe=True,
+                timeout=options["timeout"],
+                stdout=self.stdout,
+            )
+
+        with self.phase("collectstatic") as outcome:
+            current = boot.static_hash()
+            if current == boot.collected_hash():
+                outcome.append("unchanged, skipped")
+            else:
+                call_command("collectstatic", interactive=False, verbosity=0)
+                boot.record_hash(current)
+                outcome.append("collected")
+
+        with self.phase("migrate") as outcome:
+            pending = boot.unapplied_migrations()
+            for alias, migrations in pending.items():
+                call_command(
+                    "migrate", database=alias, interactive=False, stdout=self.stdout
+                )
+                outcome.append(f"applied {len(migrations)} on {alias}")
+            if boot.missing_cache_tables():
+                call_command("createcachetable")
+                outcome.append("created the cache tables")
+            if not outcome:
+                outcome.append("up to date, skipped")
+
+        self.stdout.write("Startup phases:")
+        for name, seconds, outcome in self.timings:
+            self.stdout.write(f"  {name:<14} {seconds * 1000:8.1f} ms  {outcome}")
+        total = sum(seconds for _, seconds, _ in self.timings)
+        self.stdout.write(self.style.SUCCESS(f"Ready in {total * 1000:.1f} ms"))
+
+    @contextmanager
+    def phase(self, name):
+        """Time a startup phase and record it with its outcome"""
+        outcome = []
+        start = time.perf_counter()
+        yield outcome
+        seconds = time.perf_counter() - start
+        self.timings.append((name, seconds, ", ".join(outcome) or "done"))
@@ -0,0 +1,21 @@
+"""
+Django command to migrate the default database and every shard, and create
+the cache tables.
+"""
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core import boot
+
+
+class Command(BaseCommand):
+    """Django command running migrate on each database holding the schema"""
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        for alias in boot.migrated_databases():
+            self.stdout.write(f"Migrating {alias}")
+            call_command(
+                "migrate", database=alias, interactive=False, stdout=self.stdout
+            )
+        call_command("createcachetable", database="default")
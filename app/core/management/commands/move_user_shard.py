@@ -0,0 +1,66 @@
+"""
+Django command to move the recipe data of users between shards.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import models
+from core.db import sharding
+
+
+class Command(BaseCommand):
+    """Django command to move users to a shard, or to their shard on the ring"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--to", help="Target shard, by default the shard of the user on the ring"
+        )
+        parser.add_argument(
+            "--rebalance",
+            action="store_true",
+            help="Move every user who is not on their shard on the ring",
+        )
+        parser.add_argument("--limit", type=int, help="Move at most this many users")
+        parser.add_argument("--batch-size", type=int, default=sharding.BATCH_SIZE)
+        parser.add_argument(
+            "--wait",
+            type=float,
+            help="Seconds to wait for the cached assignments to expire",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        shards = sharding.shard_aliases()
+        if options["to"] and options["to"] not in shards:
+            raise CommandError(f"Unknown shard {options['to']}, use {shards}")
+        ring = sharding.HashRing(shards)
+        if options["rebalance"]:
+            moves = [
+                (assignment.user_id, ring.node_for(assignment.user_id))
+                for assignment in models.ShardAssignment.objects.order_by("user_id")
+                if assignment.shard != ring.node_for(assignment.user_id)
+            ]
+        elif options["user_ids"]:
+            moves = [
+                (user_id, options["to"] or ring.node_for(user_id))
+                for user_id in options["user_ids"]
+            ]
+        else:
+            raise CommandError("Give user ids or --rebalance")
+        if options["limit"] is not None:
+            moves = moves[: options["limit"]]
+
+        moved = 0
+        for user_id, target in moves:
+            if sharding.shard_for(user_id) == target:
+                self.stdout.write(f"User {user_id} is already on {target}")
+                continue
+            sharding.move_user(
+                user_id,
+                target,
+                batch_size=options["batch_size"],
+                wait=options["wait"],
+                log=self.stdout.write,
+            )
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} users"))
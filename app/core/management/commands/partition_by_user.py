@@ -0,0 +1,53 @@
+"""
+Django command to hash partition the recipe tables by user, online.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db import partitioning
+
+
+class Command(BaseCommand):
+    """Django command to partition the recipes and their through tables"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--partitions", type=int, default=partitioning.PARTITIONS)
+        parser.add_argument("--batch-size", type=int, default=partitioning.BATCH_SIZE)
+        parser.add_argument(
+            "--drop-old",
+            action="store_true",
+            help="Drop the tables left unpartitioned by a previous run",
+        )
+        parser.add_argument(
+            "--status", action="store_true", help="Show the partitions and exit"
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning needs PostgreSQL")
+
+        for model in partitioning.PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if options["status"]:
+                sizes = partitioning.partition_sizes(connection, model)
+                if not sizes:
+                    self.stdout.write(f"{table}: not partitioned")
+                for name, rows in sizes:
+                    self.stdout.write(f"{name}: ~{max(rows, 0)} rows")
+            elif options["drop_old"]:
+                if partitioning.drop_unpartitioned(connection, model):
+                    self.stdout.write(f"Dropped {table}_unpartitioned")
+            else:
+                copied = partitioning.partition(
+                    connection,
+                    model,
+                    partitions=options["partitions"],
+                    batch_size=options["batch_size"],
+                    log=self.stdout.write,
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(f"{table} is partitioned, copied {copied} rows")
+                )
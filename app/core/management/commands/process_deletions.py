@@ -0,0 +1,48 @@
+"""
+Django command to run the pending account deletions.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import deletion, models
+
+
+class Command(BaseCommand):
+    """Django command to delete deactivated accounts in batches"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=deletion.BATCH_SIZE)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll for new deletions",
+        )
+        parser.add_argument("--interval", type=float, default=5)
+        parser.add_argument(
+            "--lease",
+            type=float,
+            default=deletion.LEASE_SECONDS,
+            help="Seconds before a stalled running deletion is taken over",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        while True:
+            # Interrupted deletions are still running and resume from there
+            # once their lease expires.
+            pending = models.AccountDeletion.objects.exclude(
+                status=models.AccountDeletion.DONE
+            ).order_by("requested")
+            for account in pending:
+                if not deletion.claim(account, options["lease"]):
+                    # Run by another worker.
+                    continue
+                self.stdout.write(f"Deleting account {account.user_id}...")
+                deletion.run_deletion(account, options["batch_size"])
+                self.stdout.write(
+                    self.style.SUCCESS(f"Deleted account {account.user_id}")
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
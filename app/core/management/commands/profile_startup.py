@@ -0,0 +1,90 @@
+"""
+Django command to report the import cost of starting the project.
+"""
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, the current one already imported everything.
+STARTUP = """
+import django
+django.setup()
+if {urls}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+"""
+
+
+def parse_importtime(output):
+    """Return (module, self us, cumulative us) of each -X importtime line"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+def owner(module, apps):
+    """Return the installed app of a module, else its top-level package"""
+    for app in apps:
+        if module == app or module.startswith(f"{app}."):
+            return app
+    return module.split(".")[0]
+
+
+class Command(BaseCommand):
+    """Django command to profile the imports of django.setup() per app"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-urls",
+            action="store_true",
+            help="Stop after django.setup(), without loading the URLconf",
+        )
+        parser.add_argument("--limit", type=int, default=15)
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        code = STARTUP.format(urls=not options["no_urls"])
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+
+        # Longest names first so django.contrib.admin wins over django.
+        apps = sorted(settings.INSTALLED_APPS, key=len, reverse=True)
+        per_app = defaultdict(int)
+        for module, own, _ in modules:
+            per_app[owner(module, apps)] += own
+        total = sum(per_app.values())
+
+        self.stdout.write(
+            f"Settings {settings.SETTINGS_MODULE}, {len(modules)} modules"
+        )
+        self.stdout.write("\nSelf time per app or package:")
+        ranked = sorted(per_app.items(), key=lambda item: item[1], reverse=True)
+        for name, own in ranked[: options["limit"]]:
+            share = own / total if total else 0
+            self.stdout.write(f"  {own / 1000:9.1f} ms  {share:6.1%}  {name}")
+
+        self.stdout.write("\nSlowest modules, cumulative:")
+        slowest = sorted(modules, key=lambda module: module[2], reverse=True)
+        for name, own, cumulative in slowest[: options["limit"]]:
+            self.stdout.write(
+                f"  {cumulative / 1000:9.1f} ms  {own / 1000:9.1f} ms self  {name}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Total import time {total / 1000:.1f} ms")
+        )
@@ -0,0 +1,36 @@
+"""
+Django command to prune the tombstones that sync tokens can no longer reach.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import models
+from core.db import sharding
+
+
+class Command(BaseCommand):
+    """Django command to prune old change log tombstones"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            choices=sharding.shard_aliases(),
+            help="Shard to prune, by default all of them",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        cutoff = timezone.now() - timedelta(seconds=settings.SYNC_TOKEN_MAX_AGE)
+        database = options["database"]
+        for alias in [database] if database else sharding.shard_aliases():
+            deleted, _ = (
+                models.Change.objects.using(alias)
+                .filter(deleted=True, created__lt=cutoff)
+                .delete()
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Pruned {deleted} tombstones on {alias}")
+            )
@@ -0,0 +1,64 @@
+"""
+Django command to recompute the recipe stats of users from their data.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import router
+
+from core import models
+from core.db import sharding
+from recipe import stats
+
+COMPARED = [
+    "recipes",
+    "tags",
+    "ingredients",
+    "time_minutes_total",
+    "price_total",
+    "time_minutes_sketch",
+    "price_sketch",
+]
+
+
+class Command(BaseCommand):
+    """Django command to reconcile the incrementally maintained recipe stats"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids", nargs="*", type=int, help="Users to recompute, by default all"
+        )
+        parser.add_argument(
+            "--database",
+            choices=sharding.shard_aliases(),
+            help="Only recompute the users of this shard, by default all of them",
+        )
+
+    def _values(self, row):
+        return [getattr(row, name) for name in COMPARED] if row else None
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        user_ids = options["user_ids"] or (
+            get_user_model().objects.order_by("id").values_list("id", flat=True)
+        )
+        count = 0
+        drifted = 0
+        for user_id in user_ids:
+            using = router.db_for_write(models.UserRecipeStats, user_id=user_id)
+            if options["database"] and using != options["database"]:
+                continue
+            stored = (
+                models.UserRecipeStats.objects.using(using)
+                .filter(user_id=user_id)
+                .first()
+            )
+            recomputed = stats.recompute(user_id)
+            if stored is not None and self._values(stored) != self._values(recomputed):
+                drifted += 1
+                self.stdout.write(f"User {user_id} stats drifted")
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recomputed the stats of {count} users, {drifted} drifted"
+            )
+        )
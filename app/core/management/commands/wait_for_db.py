@@ -6,13 +6,35 @@ from django.core.management.base import BaseCommand
 from psycopg2 import OperationalError as Psycopg2Error
 from django.db.utils import OperationalError
 
+from core import boot
+
 
 class Command(BaseCommand):
     """Django command to wait for database"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--probe",
+            action="store_true",
+            help="Only run a query, retrying with a jittered backoff",
+        )
+        parser.add_argument("--timeout", type=float, default=60)
+
     def handle(self, *args, **options):
         """Entry point for command"""
         self.stdout.write("Waiting for database...")
+        if options["probe"]:
+            for alias in boot.migrated_databases():
+                boot.wait_for_database(
+                    alias,
+                    timeout=options["timeout"],
+                    on_retry=lambda attempt: self.stdout.write(
+                        "Database unavaliable, retrying"
+                    ),
+                )
+            self.stdout.write(self.style.SUCCESS("Database avaliable!"))
+            return
+
         db_up = False
         while db_up is False:
             try:
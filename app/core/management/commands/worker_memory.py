@@ -0,0 +1,64 @@
+"""
+Django command to report the memory the uWSGI processes share and own.
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import preload
+
+
+def processes(name):
+    """Return the (pid, ppid) of the processes with a command name"""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may hold spaces.
+        comm = stat[stat.index("(") + 1 : stat.rindex(")")]
+        if comm == name:
+            ppid = int(stat[stat.rindex(")") + 2 :].split()[1])
+            found.append((int(entry), ppid))
+    return found
+
+
+class Command(BaseCommand):
+    """Django command printing the RSS, PSS and unique RSS of each worker"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--name", default="uwsgi", help="Process name to report")
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        found = processes(options["name"])
+        if not found:
+            raise CommandError(f"No {options['name']} process is running.")
+        pids = {pid for pid, _ in found}
+        workers = []
+        self.stdout.write(
+            f"{'pid':>8} {'role':>7} {'rss kB':>9} {'pss kB':>9} {'uss kB':>9}"
+        )
+        for pid, ppid in sorted(found):
+            try:
+                usage = preload.memory_usage(pid)
+            except OSError:
+                continue
+            role = "worker" if ppid in pids else "master"
+            if role == "worker":
+                workers.append(usage)
+            self.stdout.write(
+                f"{pid:>8} {role:>7} {usage['rss']:>9} {usage['pss']:>9} {usage['uss']:>9}"
+            )
+        if workers:
+            uss = sum(usage["uss"] for usage in workers) / len(workers)
+            rss = sum(usage["rss"] for usage in workers) / len(workers)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{len(workers)} workers, mean unique {uss:.0f} kB of {rss:.0f} kB"
+                )
+            )
@@ -0,0 +1,47 @@
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 10000
+
+
+def fill_users(apps, schema_editor):
+    """Copy the user of the recipes to their through rows, batch by batch.
+
+    Each batch commits on its own, the through tables are only locked for
+    the rows of the batch being updated.
+    """
+    alias = schema_editor.connection.alias
+    Recipe = apps.get_model("core", "Recipe")
+    for through_name in ["RecipeTag", "RecipeIngredient"]:
+        through = apps.get_model("core", through_name)
+        last = 0
+        while True:
+            with transaction.atomic(using=alias):
+                ids = list(
+                    through.objects.using(alias)
+                    .filter(id__gt=last, user__isnull=True)
+                    .order_by("id")
+                    .values_list("id", flat=True)[:BATCH_SIZE]
+                )
+                if not ids:
+                    break
+                through.objects.using(alias).filter(id__in=ids).update(
+                    user_id=models.Subquery(
+                        Recipe.objects.filter(id=models.OuterRef("recipe_id")).values(
+                            "user_id"
+                        )[:1]
+                    )
+                )
+            last = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_recipe_through_models'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_users, migrations.RunPython.noop),
+    ]
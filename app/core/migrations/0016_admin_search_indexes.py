@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# The admin searches match the start of these columns with UPPER(col) LIKE.
+INDEXES = [
+    ("core_recipe_title_upper", "core_recipe", "title"),
+    ("core_tag_name_upper", "core_tag", "name"),
+    ("core_ingredient_name_upper", "core_ingredient", "name"),
+    ("core_customuser_email_upper", "core_customuser", "email"),
+]
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for name, table, column in INDEXES:
+            cursor.execute(
+                "SELECT relkind = 'p' FROM pg_class WHERE relname = %s", [table]
+            )
+            # Partitioned tables can not be indexed concurrently.
+            concurrently = "" if cursor.fetchone()[0] else "CONCURRENTLY"
+            cursor.execute(
+                f"CREATE INDEX {concurrently} IF NOT EXISTS {name} "
+                f"ON {table} (UPPER({column}::text) text_pattern_ops)"
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name, _, _ in INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0015_through_users_not_null'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -10,6 +10,8 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 from django.db import models
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor
+from django.utils.functional import cached_property
 
 
 def recipe_image_file_path(instance, filename):
@@ -19,6 +21,69 @@ def recipe_image_file_path(instance, filename):
     return os.path.join("uploads", "recipe", filename)  # os agnostic code.
 
 
+class UserManyToManyDescriptor(ManyToManyDescriptor):
+    """Many-to-many accessor filling the user of the through rows it adds"""
+
+    @cached_property
+    def related_manager_cls(self):
+        manager_class = super().related_manager_cls
+
+        class UserRelatedManager(manager_class):
+            def _with_user(self, through_defaults):
+                return {"user_id": self.instance.user_id, **(through_defaults or {})}
+
+            def add(self, *objs, through_defaults=None):
+                super().add(*objs, through_defaults=self._with_user(through_defaults))
+
+            def set(self, objs, *, clear=False, through_defaults=None):
+                super().set(
+                    objs,
+                    clear=clear,
+                    through_defaults=self._with_user(through_defaults),
+                )
+
+            def create(self, *, through_defaults=None, **kwargs):
+                return super().create(
+                    through_defaults=self._with_user(through_defaults), **kwargs
+                )
+
+            def get_or_create(self, *, through_defaults=None, **kwargs):
+                return super().get_or_create(
+                    through_defaults=self._with_user(through_defaults), **kwargs
+                )
+
+            def update_or_create(self, *, through_defaults=None, **kwargs):
+                return super().update_or_create(
+                    through_defaults=self._with_user(through_defaults), **kwargs
+                )
+
+        return UserRelatedManager
+
+
+class UserManyToManyField(models.ManyToManyField):
+    """Many-to-many between two models of a user, through a model with a user.
+
+    The through rows carry the user of both sides so the through table can be
+    partitioned by user, see the partition_by_user command.
+    """
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name, UserManyToManyDescriptor(self.remote_field))
+
+    def contribute_to_related_class(self, cls, related):
+        super().contribute_to_related_class(cls, related)
+        if (
+            not self.remote_field.is_hidden()
+            and not related.related_model._meta.swapped
+        ):
+            setattr(
+                cls._meta.concrete_model,
+                related.get_accessor_name(),
+                UserManyToManyDescriptor(self.remote_field, reverse=True),
+            )
+
+
 class CustomUserManager(BaseUserManager):
     """Use to manage the custom user model"""
 
@@ -70,8 +135,8 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
-    tags = models.ManyToManyField("Tag")
-    ingredients = models.ManyToManyField("Ingredient")
+    tags = UserManyToManyField("Tag", through="RecipeTag")
+    ingredients = UserManyToManyField("Ingredient", through="RecipeIngredient")
     image = models.ImageField(
         null=True, upload_to=recipe_image_file_path
     )  # making a reference to our function recipe upload image file path.
@@ -86,6 +151,10 @@ class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        # The order recipes list them in, prefetched or not.
+        ordering = ["id"]
+
     def __str__(self):
         return self.name
 
@@ -96,10 +165,175 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        # The order recipes list them in, prefetched or not.
+        ordering = ["id"]
+
     def __str__(self):
         return self.name
 
 
+class RecipeTag(models.Model):
+    """A tag of a recipe, with their user to partition the table by"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "core_recipe_tags"
+        unique_together = [("recipe", "tag")]
+
+    def __str__(self):
+        return f"{self.recipe_id} tagged {self.tag_id}"
+
+
+class RecipeIngredient(models.Model):
+    """An ingredient of a recipe, with their user to partition the table by"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "core_recipe_ingredients"
+        unique_together = [("recipe", "ingredient")]
+
+    def __str__(self):
+        return f"{self.recipe_id} uses {self.ingredient_id}"
+
+
+class RecipeDocument(models.Model):
+    """Prerendered JSON representations of a recipe.
+
+    They are rebuilt with every write to the recipe, its tags or its
+    ingredients and served as they are by the recipe endpoints.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name="document"
+    )
+    detail = models.TextField()
+    summary = models.TextField()
+    # Image URLs depend on the request, those documents are not served.
+    has_image = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Document of recipe {self.recipe_id}"
+
+
+class UserRecipeStats(models.Model):
+    """Aggregates of the recipes of a user, updated with every write.
+
+    Sums are kept instead of averages so that a write is an increment. The
+    sketches count prices and times in logarithmic buckets, see recipe.stats.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recipe_stats",
+    )
+    recipes = models.IntegerField(default=0)
+    tags = models.IntegerField(default=0)
+    ingredients = models.IntegerField(default=0)
+    time_minutes_total = models.BigIntegerField(default=0)
+    price_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    time_minutes_sketch = models.JSONField(default=dict)
+    price_sketch = models.JSONField(default=dict)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recipe stats of user {self.user_id}"
+
+
+class Change(models.Model):
+    """Change log entry used by clients to sync incrementally.
+
+    The auto incrementing id is the change sequence. Only the latest entry
+    of each object is kept, so a deleted object leaves a single tombstone.
+    """
+
+    RECIPE = "recipe"
+    TAG = "tag"
+    INGREDIENT = "ingredient"
+    KIND_CHOICES = [
+        (RECIPE, "Recipe"),
+        (TAG, "Tag"),
+        (INGREDIENT, "Ingredient"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="changes"
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+    # Transaction that wrote the entry, syncs follow commits, see core.db.txids.
+    txid = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"]),
+            models.Index(fields=["kind", "object_id"]),
+            models.Index(fields=["user", "txid", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+class AccountDeletion(models.Model):
+    """Deferred deletion of a user account and all of its data.
+
+    The user id is not a foreign key, the record outlives the account to
+    keep track of the completed deletions.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+    ]
+
+    user_id = models.BigIntegerField(unique=True)
+    email = models.EmailField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.JSONField(default=dict)
+    requested = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.email} ({self.status})"
+
+
+class ShardAssignment(models.Model):
+    """The database holding the recipes, tags and ingredients of a user.
+
+    Kept on the default database. A user is assigned by the hash ring on
+    first use and stays on that shard until moved.
+    """
+
+    user_id = models.BigIntegerField(primary_key=True)
+    shard = models.CharField(max_length=64)
+    moving = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} on {self.shard}"
+
+
 # Minimalistic Way of Doing This.
 # class UserManager(BaseUserManager):
 #     """Manages User Model"""
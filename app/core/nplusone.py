@@ -0,0 +1,154 @@
+"""
+Detection of N+1 queries: the same query run over and over in one request
+
+The SQL of a request is fingerprinted with the parameters left out, a
+fingerprint seen THRESHOLD times is reported along with the serializer
+field or the code that ran it. Only a sample of the requests is watched.
+"""
+import logging
+import random
+import re
+import sys
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.module_loading import import_string
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+LOG = "log"
+RAISE = "raise"
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+class NPlusOneError(Exception):
+    """Raised by the raise action, meant for tests"""
+
+
+class Detection:
+    """A query shape repeated in a request"""
+
+    def __init__(self, fingerprint, count, origin, view=None):
+        self.fingerprint = fingerprint
+        self.count = count
+        self.origin = origin
+        self.view = view
+
+    def __str__(self):
+        return (
+            f"{self.count} queries in {self.view or 'unknown view'} "
+            f"from {self.origin}: {self.fingerprint}"
+        )
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Return the SQL with its literals and IN lists replaced by placeholders"""
+    sql = _IN_LIST.sub("(%s...)", sql)
+    sql = _STRING.sub("%s", sql)
+    return _NUMBER.sub("%s", sql)
+
+
+def _origin(frame):
+    """Return the serializer field, or else the project code, running a query"""
+    code = None
+    while frame is not None:
+        if frame.f_code.co_name == "to_representation":
+            serializer = frame.f_locals.get("self")
+            field = frame.f_locals.get("field")
+            if isinstance(serializer, Serializer) and field is not None:
+                return f"{type(serializer).__name__}.{field.field_name}"
+        filename = frame.f_code.co_filename
+        if (
+            code is None
+            and filename.startswith(str(settings.BASE_DIR))
+            and filename != __file__
+        ):
+            code = f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return code or "unknown"
+
+
+class Detector:
+    """Database execute wrapper counting the queries of each shape"""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.counts = {}
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count == self.threshold:
+            # The stack is only walked once per repeated shape.
+            self.origins[key] = _origin(sys._getframe(1))
+        return execute(sql, params, many, context)
+
+    def detections(self, view=None):
+        return [
+            Detection(key, self.counts[key], origin, view)
+            for key, origin in self.origins.items()
+        ]
+
+
+@contextmanager
+def detect(threshold=None):
+    """Count the queries of the block on every database, yield the detector"""
+    detector = Detector(threshold)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+
+
+def report(detections, request=None):
+    """Hand detections to the configured action"""
+    if not detections:
+        return
+    action = settings.NPLUSONE_ACTION
+    if action == LOG:
+        for detection in detections:
+            logger.warning("N+1 queries: %s", detection)
+    elif action == RAISE:
+        raise NPlusOneError("\n".join(str(detection) for detection in detections))
+    else:
+        import_string(action)(detections, request)
+
+
+class NPlusOneMiddleware:
+    """Watch a sample of the requests for N+1 queries.
+
+    Views setting detect_n_plus_one to False are not watched. Unused
+    unless NPLUSONE_SAMPLE_RATE is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.NPLUSONE_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with detect() as detector:
+            request._n_plus_one_detector = detector
+            response = self.get_response(request)
+        if request._n_plus_one_detector is not None:
+            match = request.resolver_match
+            report(detector.detections(match.view_name if match else None), request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, "cls", view_func)
+        if getattr(view, "detect_n_plus_one", True) is False:
+            request._n_plus_one_detector = None
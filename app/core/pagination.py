@@ -0,0 +1,52 @@
+"""
+Paginators for tables too large to count
+"""
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Planner estimate of the rows of a table, partitions included.
+RELTUPLES_SQL = """
+SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0)::bigint FROM pg_class
+WHERE oid = %s::regclass
+    OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+"""
+
+
+def estimate_count(queryset):
+    """Return the planner's estimate of the rows of a queryset, or None.
+
+    Unfiltered querysets use the table statistics, the others the row
+    estimate of their plan. Only PostgreSQL keeps either.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    if not queryset.query.where:
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(RELTUPLES_SQL, [table, table])
+            return cursor.fetchone()[0]
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting exactly only when the estimate is small.
+
+    COUNT(*) reads the whole table or index on PostgreSQL. Past the
+    threshold the estimate is shown instead, the last pages may be empty.
+    """
+
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, "query"):
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,20 @@
+"""
+Parsers for the API requests
+"""
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class MessagePackParser(BaseParser):
+    """Parser of MessagePack request bodies"""
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse the incoming bytestream as MessagePack"""
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (TypeError, ValueError, msgpack.UnpackException) as exc:
+            # TypeError: unhashable map keys, such as arrays.
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -0,0 +1,95 @@
+"""
+Warm the shared state of the project in a process that forks workers.
+
+Everything loaded before the fork is shared copy-on-write by the workers,
+gc.freeze() then keeps the collector from writing to those objects.
+"""
+import gc
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core.db.backends.pooled_postgresql.base import close_pools
+
+logger = logging.getLogger(__name__)
+
+
+def _patterns(resolver):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _patterns(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def _serializer_classes(resolver):
+    """Return the serializer classes of the DRF views of every route"""
+    classes = set()
+    for pattern in _patterns(resolver):
+        view_class = getattr(pattern.callback, "cls", None)
+        if view_class is None or not hasattr(view_class, "get_serializer_class"):
+            continue
+        actions = getattr(pattern.callback, "actions", None) or {"get": None}
+        for action in actions.values():
+            view = view_class()
+            view.action = action
+            view.request = None
+            view.format_kwarg = None
+            try:
+                classes.add(view.get_serializer_class())
+            except AssertionError:
+                # Views building their serializer from the request.
+                continue
+    return classes
+
+
+def warm():
+    """Load the URL resolvers, serializer fields, list plans and schema"""
+    from recipe import fastpath
+
+    resolver = get_resolver()
+    # Compiles the pattern of every route and builds the reverse lookups.
+    resolver.reverse_dict
+    serializer_classes = _serializer_classes(resolver)
+    for serializer_class in serializer_classes:
+        # Fills the model _meta caches the serializers introspect.
+        serializer_class().fields
+        try:
+            fastpath.compile_plan(serializer_class)
+        except fastpath.UnsupportedSerializer:
+            pass
+
+    if "drf_spectacular" in settings.INSTALLED_APPS:
+        from core import schema
+
+        for fmt in schema.RENDERERS:
+            schema.get_artifact(fmt)
+
+    # Database connections must not be shared by the workers.
+    connections.close_all()
+    close_pools()
+    logger.info("Preloaded %d serializers", len(serializer_classes))
+
+
+def freeze():
+    """Collect once, then move every object out of reach of the collector"""
+    gc.collect()
+    gc.freeze()
+
+
+def memory_usage(pid="self"):
+    """Return the RSS, PSS and USS of a process in kB, from smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                fields[name] = int(parts[0])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
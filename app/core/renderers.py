@@ -0,0 +1,115 @@
+"""
+Renderers for the API responses
+"""
+import datetime
+import decimal
+import uuid
+
+import msgpack
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def _default(obj):
+    """Encode the types orjson does not support natively, like DRF does"""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        # Serializers coerce decimals to strings, this only sees raw values.
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__getitem__"):
+        return list(obj) if isinstance(obj, (list, tuple)) else dict(obj)
+    if hasattr(obj, "__iter__"):
+        return tuple(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer encoding straight to bytes with orjson.
+
+    Dates, datetimes, times and UUIDs are encoded natively, in the same
+    format as DRF's JSONRenderer.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into JSON bytes"""
+        if data is None:
+            return b""
+        options = self.options
+        if accepted_media_type and "indent=" in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
+
+
+class PrerenderedJSONResponse(Response):
+    """Response whose JSON rendering is known in advance.
+
+    The JSON body is sent as it is, other renderers and callers reading
+    `data` get it parsed back.
+    """
+
+    def __init__(self, body, **kwargs):
+        self.body = body
+        super().__init__(None, **kwargs)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = orjson.loads(self.body)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, "accepted_renderer", None)
+        accepted_media_type = getattr(self, "accepted_media_type", None) or ""
+        if isinstance(renderer, ORJSONRenderer) and "indent=" not in accepted_media_type:
+            self["Content-Type"] = self.content_type or renderer.media_type
+            return self.body
+        return super().rendered_content
+
+
+def _msgpack_default(obj):
+    """Encode the types MessagePack does not support like the JSON encoder"""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time, uuid.UUID)):
+        return JSONEncoder().default(obj)
+    return _default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer of the compact MessagePack binary format.
+
+    The representation is the JSON one, only its encoding differs.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into MessagePack bytes"""
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
@@ -0,0 +1,137 @@
+"""
+OpenAPI schema built once and served from bytes.
+
+The build_schema command writes the rendered schema of each format, its
+gzipped copy and a manifest of their ETags to SCHEMA_ARTIFACT_DIR at deploy
+time. Without the artifact, the schema is generated on the first request
+and kept in memory by the process.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+MANIFEST = "manifest.json"
+RENDERERS = {"json": OpenApiJsonRenderer, "yaml": OpenApiYamlRenderer}
+
+_generated = {}
+_generated_lock = threading.Lock()
+
+
+class Artifact:
+    """A rendered schema, its gzipped copy and their ETag"""
+
+    def __init__(self, body, compressed=None, etag=None):
+        self.body = body
+        self.compressed = (
+            compressed if compressed is not None else gzip.compress(body, mtime=0)
+        )
+        self.etag = etag or f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def generate():
+    """Return the public schema of the API"""
+    return SchemaGenerator().get_schema(request=None, public=True)
+
+
+def render(schema, fmt):
+    return RENDERERS[fmt]().render(schema, renderer_context={})
+
+
+def _write(path, content):
+    """Write a file atomically so readers never see a partial artifact"""
+    directory = os.path.dirname(path)
+    fd, temporary = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "wb") as file:
+        file.write(content)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def build(directory):
+    """Write the artifact of each format and their manifest, return it"""
+    os.makedirs(directory, exist_ok=True)
+    schema = generate()
+    files = {}
+    for fmt in RENDERERS:
+        artifact = Artifact(render(schema, fmt))
+        name = f"schema.{fmt}"
+        _write(os.path.join(directory, name), artifact.body)
+        _write(os.path.join(directory, f"{name}.gz"), artifact.compressed)
+        files[fmt] = {"file": name, "etag": artifact.etag, "size": len(artifact.body)}
+    version = hashlib.sha256(
+        "".join(files[fmt]["etag"] for fmt in sorted(files)).encode()
+    ).hexdigest()[:12]
+    manifest = {"version": version, "files": files}
+    # The manifest goes last, it marks the artifact as complete.
+    _write(os.path.join(directory, MANIFEST), json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def load(fmt, directory=None):
+    """Return the built artifact of a format, or None if there is none"""
+    directory = directory or settings.SCHEMA_ARTIFACT_DIR
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            entry = json.load(file)["files"][fmt]
+        path = os.path.join(directory, entry["file"])
+        with open(path, "rb") as file:
+            body = file.read()
+        with open(f"{path}.gz", "rb") as file:
+            compressed = file.read()
+    except (OSError, ValueError, KeyError):
+        return None
+    return Artifact(body, compressed, entry["etag"])
+
+
+def get_artifact(fmt):
+    """Return the artifact of a format, built or generated on first use"""
+    artifact = _generated.get(fmt)
+    if artifact is None:
+        with _generated_lock:
+            artifact = _generated.get(fmt)
+            if artifact is None:
+                artifact = load(fmt) or Artifact(render(generate(), fmt))
+                _generated[fmt] = artifact
+    return artifact
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """Serve the prebuilt schema with an ETag, gzipped when accepted"""
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("lang") or request.GET.get("version"):
+            return super().get(request, *args, **kwargs)
+
+        artifact = get_artifact(request.accepted_renderer.format)
+        body, etag = artifact.body, artifact.etag
+        compress = "gzip" in request.headers.get("Accept-Encoding", "")
+        if compress:
+            # Each encoding of the schema is a representation with its own tag.
+            body, etag = artifact.compressed, f'{etag[:-1]}-gzip"'
+
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in etags or "*" in etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=request.accepted_media_type)
+            response["Content-Disposition"] = (
+                f'inline; filename="{self._get_filename(request, None)}"'
+            )
+            if compress:
+                response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept", "Accept-Encoding"])
+        return response
@@ -0,0 +1,46 @@
+"""
+Serializers for the core API
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from core import batch
+
+METHODS = batch.SAFE_METHODS + ("POST", "PUT", "PATCH", "DELETE")
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for one request of a batch"""
+
+    method = serializers.ChoiceField(choices=METHODS, default="GET")
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of requests"""
+
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than "
+                f"{settings.BATCH_MAX_REQUESTS} requests."
+            )
+        return value
+
+
+class SubResponseSerializer(serializers.Serializer):
+    """Serializer for one response of a batch"""
+
+    status = serializers.IntegerField()
+    headers = serializers.DictField(child=serializers.CharField())
+    body = serializers.JSONField()
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    """Serializer for the responses of a batch, in the order of the requests"""
+
+    responses = SubResponseSerializer(many=True)
@@ -0,0 +1,152 @@
+"""
+Signal handlers keeping the change log up to date
+"""
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core import models
+from core.db import txids
+from core.events import publish_on_commit
+
+# Users being deleted, their cascaded rows must not write new change entries.
+_deleting = threading.local()
+
+
+def _is_deleting(user_id):
+    return user_id in getattr(_deleting, "user_ids", set())
+
+
+def record_changes(user_id, kind, object_ids, deleted=False, using=None):
+    """Record that objects of a kind changed for a user.
+
+    Older entries for the same objects are removed first so the log only
+    keeps the latest state of each object. The entries are written to the
+    database of the objects, using, and the event is published when it
+    commits.
+    """
+    object_ids = set(object_ids)
+    if not object_ids or _is_deleting(user_id):
+        return
+    using = using or router.db_for_write(models.Change, user_id=user_id)
+    changes = models.Change.objects.using(using)
+    # One transaction, so the entries carry the id of the one writing them.
+    with transaction.atomic(using=using):
+        txid = txids.current(using)
+        changes.filter(kind=kind, object_id__in=object_ids).delete()
+        changes.bulk_create(
+            models.Change(
+                user_id=user_id,
+                kind=kind,
+                object_id=object_id,
+                deleted=deleted,
+                txid=txid,
+            )
+            for object_id in sorted(object_ids)
+        )
+    publish_on_commit(
+        user_id,
+        {
+            "type": "change",
+            "kind": kind,
+            "ids": sorted(object_ids),
+            "deleted": deleted,
+        },
+        using=using,
+    )
+
+
+def _recipe_ids_for(instance):
+    """Return the ids of the recipes using a tag or an ingredient"""
+    return list(instance.recipe_set.values_list("id", flat=True))
+
+
+def _attr_kind(sender):
+    return models.Change.TAG if sender is models.Tag else models.Change.INGREDIENT
+
+
+@receiver(pre_delete, sender=get_user_model())
+def user_pre_delete(sender, instance, **kwargs):
+    if not hasattr(_deleting, "user_ids"):
+        _deleting.user_ids = set()
+    _deleting.user_ids.add(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_post_delete(sender, instance, **kwargs):
+    _deleting.user_ids.discard(instance.pk)
+
+
+@receiver(post_save, sender=models.Recipe)
+def recipe_saved(sender, instance, using, **kwargs):
+    record_changes(instance.user_id, models.Change.RECIPE, [instance.pk], using=using)
+
+
+@receiver(post_delete, sender=models.Recipe)
+def recipe_deleted(sender, instance, using, **kwargs):
+    record_changes(
+        instance.user_id, models.Change.RECIPE, [instance.pk], deleted=True, using=using
+    )
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_save, sender=models.Ingredient)
+def attr_saved(sender, instance, created, using, **kwargs):
+    record_changes(instance.user_id, _attr_kind(sender), [instance.pk], using=using)
+    if not created:
+        # Recipes embed the name of their tags and ingredients.
+        record_changes(
+            instance.user_id,
+            models.Change.RECIPE,
+            _recipe_ids_for(instance),
+            using=using,
+        )
+
+
+@receiver(pre_delete, sender=models.Tag)
+@receiver(pre_delete, sender=models.Ingredient)
+def attr_pre_delete(sender, instance, **kwargs):
+    # The through-table rows are gone once post_delete is sent.
+    instance._changed_recipe_ids = _recipe_ids_for(instance)
+
+
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_delete, sender=models.Ingredient)
+def attr_deleted(sender, instance, using, **kwargs):
+    record_changes(
+        instance.user_id, _attr_kind(sender), [instance.pk], deleted=True, using=using
+    )
+    record_changes(
+        instance.user_id,
+        models.Change.RECIPE,
+        getattr(instance, "_changed_recipe_ids", []),
+        using=using,
+    )
+
+
+@receiver(m2m_changed, sender=models.Recipe.tags.through)
+@receiver(m2m_changed, sender=models.Recipe.ingredients.through)
+def recipe_relations_changed(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            record_changes(
+                instance.user_id, models.Change.RECIPE, [instance.pk], using=using
+            )
+        return
+    # The instance is a tag or an ingredient and pk_set holds recipe ids.
+    if action == "pre_clear":
+        instance._changed_recipe_ids = _recipe_ids_for(instance)
+    elif action in ("post_add", "post_remove"):
+        record_changes(instance.user_id, models.Change.RECIPE, pk_set, using=using)
+    elif action == "post_clear":
+        record_changes(
+            instance.user_id,
+            models.Change.RECIPE,
+            getattr(instance, "_changed_recipe_ids", []),
+            using=using,
+        )
@@ -0,0 +1,125 @@
+"""
+Server-sent event stream of the changes of the authenticated user
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+
+from core.events import get_broker
+
+
+def _authenticate(key):
+    """Return the id of the active user owning a token, or None"""
+    try:
+        token = Token.objects.select_related("user").get(key=key)
+    except Token.DoesNotExist:
+        return None
+    finally:
+        # Streams are long lived, they must not keep a database connection.
+        close_old_connections()
+    return token.user_id if token.user.is_active else None
+
+
+def _token_from_scope(scope):
+    """Read the token from the Authorization header or the token parameter.
+
+    Browsers cannot set headers on an EventSource, so the query string is
+    accepted as well.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            keyword, _, key = value.decode("latin-1").partition(" ")
+            if keyword == "Token" and key:
+                return key.strip()
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("token", [None])[0]
+
+
+def _format(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def _send_response(send, status, body):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+async def change_stream(scope, receive, send):
+    """ASGI application streaming the change notifications of a user"""
+    if scope["method"] != "GET":
+        return await _send_response(send, 405, {"detail": "Method not allowed."})
+    key = _token_from_scope(scope)
+    user_id = await sync_to_async(_authenticate)(key) if key else None
+    if user_id is None:
+        return await _send_response(
+            send, 401, {"detail": "Authentication credentials were not provided."}
+        )
+
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        }
+    )
+    await send(
+        {"type": "http.response.body", "body": b": connected\n\n", "more_body": True}
+    )
+
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if next_event in done:
+                body = _format(next_event.result())
+            else:
+                next_event.cancel()
+                if disconnected in done:
+                    break
+                body = b": keep-alive\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+class EventStreamRouter:
+    """Serve the change stream path and hand every other request to Django"""
+
+    def __init__(self, application, path="/api/recipe/events/"):
+        self.application = application
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path:
+            return await change_stream(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -1,10 +1,16 @@
 """ Tests for Django Admin Modifications """
+from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed
 from django.urls import reverse
 from django.test import Client
 
+from core import models
+from core.pagination import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django Admin"""
@@ -44,3 +50,140 @@ class AdminSiteTests(TestCase):
         url = reverse("admin:core_customuser_add")
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+
+class RecipeAdminTests(TestCase):
+    """Tests for the recipe, tag and ingredient admin pages"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email="admin@example.com", name="Admin", password="password123"  # noqa
+        )
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="password123"  # noqa
+        )
+        self.tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        self.recipe = models.Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+        self.recipe.tags.add(self.tag)
+
+    def test_changelists(self):
+        for name in ["recipe", "tag", "ingredient"]:
+            res = self.client.get(reverse(f"admin:core_{name}_changelist"))
+            self.assertEqual(res.status_code, 200)
+
+    def test_search_recipes(self):
+        url = reverse("admin:core_recipe_changelist")
+        res = self.client.get(url, {"q": "sou"})
+
+        self.assertContains(res, "Soup")
+
+    def test_change_page_does_not_list_all_tags(self):
+        """Test the tags are picked with an autocomplete widget"""
+        models.Tag.objects.create(user=self.user, name="Unrelated")
+        url = reverse("admin:core_recipe_change", args=[self.recipe.id])
+        res = self.client.get(url)
+
+        self.assertContains(res, "admin-autocomplete")
+        self.assertContains(res, "Vegan")
+        self.assertNotContains(res, "Unrelated")
+
+    def test_autocomplete_tags(self):
+        models.Tag.objects.create(user=self.user, name="Quick")
+        res = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "term": "qu",
+                "app_label": "core",
+                "model_name": "recipetag",
+                "field_name": "tag",
+            },
+        )
+
+        self.assertEqual([item["text"] for item in res.json()["results"]], ["Quick"])
+
+    def post_tags(self, *tags, delete_first=False):
+        """Post the change page with the tags of the recipe"""
+        # The form requires an image, keep the current one.
+        self.recipe.image = "uploads/recipe/soup.jpg"
+        self.recipe.save()
+        url = reverse("admin:core_recipe_change", args=[self.recipe.id])
+        link = models.RecipeTag.objects.get()
+        payload = {
+            "user": self.user.id,
+            "title": "Soup",
+            "time_minutes": 5,
+            "price": "1.00",
+            "recipetag_set-TOTAL_FORMS": 1 + len(tags),
+            "recipetag_set-INITIAL_FORMS": 1,
+            "recipetag_set-0-id": link.id,
+            "recipetag_set-0-recipe": self.recipe.id,
+            "recipetag_set-0-tag": self.tag.id,
+            "recipeingredient_set-TOTAL_FORMS": 0,
+            "recipeingredient_set-INITIAL_FORMS": 0,
+        }
+        if delete_first:
+            payload["recipetag_set-0-DELETE"] = "on"
+        for index, tag in enumerate(tags, start=1):
+            payload[f"recipetag_set-{index}-recipe"] = self.recipe.id
+            payload[f"recipetag_set-{index}-tag"] = tag.id
+        return self.client.post(url, payload)
+
+    def test_inline_tags_get_recipe_user(self):
+        tag = models.Tag.objects.create(user=self.user, name="Quick")
+
+        res = self.post_tags(tag)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(
+            set(models.RecipeTag.objects.values_list("tag_id", "user_id")),
+            {(self.tag.id, self.user.id), (tag.id, self.user.id)},
+        )
+
+    def test_inline_tags_send_m2m_changed(self):
+        """Test the inline edits reach the change log, events and documents"""
+        tag = models.Tag.objects.create(user=self.user, name="Quick")
+        actions = []
+
+        def receiver(sender, action, pk_set, **kwargs):
+            if action in ("post_add", "post_remove"):
+                actions.append((action, pk_set))
+
+        m2m_changed.connect(receiver, sender=models.RecipeTag)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=models.RecipeTag)
+
+        res = self.post_tags(tag, delete_first=True)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(list(self.recipe.tags.all()), [tag])
+        self.assertEqual(
+            actions, [("post_remove", {self.tag.id}), ("post_add", {tag.id})]
+        )
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Tests for counting the rows of large tables"""
+
+    def test_exact_below_threshold(self):
+        queryset = models.Tag.objects.order_by("id")
+        with patch("core.pagination.estimate_count", return_value=10):
+            paginator = EstimatedCountPaginator(queryset, 10)
+
+            self.assertEqual(paginator.count, 0)
+
+    def test_estimate_above_threshold(self):
+        queryset = models.Tag.objects.order_by("id")
+        with patch("core.pagination.estimate_count", return_value=5_000_000):
+            paginator = EstimatedCountPaginator(queryset, 100)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 5_000_000)
+            self.assertEqual(paginator.num_pages, 50_000)
+
+    def test_no_estimate_without_postgresql(self):
+        paginator = EstimatedCountPaginator(models.Tag.objects.order_by("id"), 10)
+
+        self.assertEqual(paginator.count, 0)
@@ -0,0 +1,195 @@
+"""Tests for the batch endpoint"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import models
+
+BATCH_URL = reverse("batch")
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+RECIPE = {
+    "title": "Curry",
+    "time_minutes": 30,
+    "price": "5.50",
+    "tags": [{"name": "Dinner"}],
+}
+
+
+def create_user(email="user@example.com"):
+    return get_user_model().objects.create_user(email=email, password="testpass123")
+
+
+class PublicBatchApiTests(TestCase):
+    """Test unauthenticated batches"""
+
+    def test_auth_required(self):
+        res = APIClient().post(
+            BATCH_URL, {"requests": [{"path": TAGS_URL}]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BatchApiTests(TestCase):
+    """Test batches of an authenticated user"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}"
+        )
+
+    def batch(self, *requests, **kwargs):
+        return self.client.post(
+            BATCH_URL, {"requests": list(requests), **kwargs}, format="json"
+        )
+
+    def test_responses_in_order(self):
+        """Test a write is visible to the reads after it"""
+        models.Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.batch(
+            {"path": TAGS_URL},
+            {"method": "POST", "path": RECIPES_URL, "body": RECIPE},
+            {"path": TAGS_URL},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first, created, second = res.json()["responses"]
+        self.assertEqual(first["status"], 200)
+        self.assertEqual([tag["name"] for tag in first["body"]], ["Vegan"])
+        self.assertEqual(created["status"], 201)
+        self.assertEqual(created["body"]["title"], "Curry")
+        self.assertEqual(
+            sorted(tag["name"] for tag in second["body"]), ["Dinner", "Vegan"]
+        )
+        self.assertTrue(
+            models.Recipe.objects.filter(user=self.user, title="Curry").exists()
+        )
+
+    def test_sub_requests_authenticated_as_batch_user(self):
+        other = create_user("other@example.com")
+        models.Tag.objects.create(user=other, name="Other")
+
+        res = self.batch({"path": TAGS_URL})
+
+        self.assertEqual(res.json()["responses"][0]["body"], [])
+
+    def test_errors_are_per_request(self):
+        recipe = models.Recipe.objects.create(
+            user=create_user("other@example.com"),
+            title="Soup",
+            time_minutes=5,
+            price=Decimal("1.00"),
+        )
+
+        res = self.batch(
+            {"path": reverse("recipe:recipe-detail", args=[recipe.id])},
+            {"path": "/api/missing/"},
+            {"method": "POST", "path": RECIPES_URL, "body": {}},
+            {"path": TAGS_URL},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        statuses = [response["status"] for response in res.json()["responses"]]
+        self.assertEqual(statuses, [404, 404, 400, 200])
+
+    def test_query_string_passed(self):
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        models.Tag.objects.create(user=self.user, name="Dinner")
+        recipe = models.Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=5, price=Decimal("1.00")
+        )
+        recipe.tags.add(tag)
+
+        res = self.batch({"path": f"{TAGS_URL}?assigned_only=1"})
+
+        body = res.json()["responses"][0]["body"]
+        self.assertEqual([tag["name"] for tag in body], ["Vegan"])
+
+    def test_schema_not_compressed(self):
+        """Test the schema is embedded as JSON whatever the batch accepts"""
+        res = self.client.post(
+            BATCH_URL,
+            {"requests": [{"path": reverse("api-schema")}]},
+            format="json",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH="*",
+        )
+
+        response = res.json()["responses"][0]
+        self.assertEqual(response["status"], 200)
+        self.assertIn("/api/batch/", response["body"]["paths"])
+
+    def test_only_api_paths(self):
+        res = self.batch({"path": "/admin/"}, {"path": "http://example.com/api/"})
+
+        statuses = [response["status"] for response in res.json()["responses"]]
+        self.assertEqual(statuses, [400, 400])
+
+    def test_nested_batch_rejected(self):
+        res = self.batch(
+            {"method": "POST", "path": BATCH_URL, "body": {"requests": []}}
+        )
+
+        self.assertEqual(res.json()["responses"][0]["status"], 400)
+
+    def test_unknown_method_rejected(self):
+        res = self.batch({"method": "TRACE", "path": TAGS_URL})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_request_limit(self):
+        res = self.batch(*[{"path": TAGS_URL}] * 3)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_batch_rejected(self):
+        res = self.batch()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+    """Test batches running their reads concurrently"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_parallel_keeps_order(self):
+        models.Tag.objects.create(user=self.user, name="Vegan")
+        models.Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+
+        res = self.client.post(
+            BATCH_URL,
+            {
+                "requests": [
+                    {"path": TAGS_URL},
+                    {"path": RECIPES_URL},
+                    {"method": "POST", "path": RECIPES_URL, "body": RECIPE},
+                    {"path": TAGS_URL},
+                    {"path": RECIPES_URL},
+                ],
+                "parallel": True,
+            },
+            format="json",
+        )
+
+        responses = res.json()["responses"]
+        self.assertEqual([r["status"] for r in responses], [200, 200, 201, 200, 200])
+        self.assertEqual([tag["name"] for tag in responses[0]["body"]], ["Vegan"])
+        self.assertEqual([r["title"] for r in responses[1]["body"]], ["Soup"])
+        self.assertEqual(len(responses[3]["body"]), 2)
+        self.assertEqual(len(responses[4]["body"]), 2)
@@ -0,0 +1,166 @@
+"""Tests for the shared memory cache backend"""
+import multiprocessing
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import SharedMemoryCache, _regions
+
+
+def set_in_child(location, options):
+    SharedMemoryCache(location, {"OPTIONS": options}).set("shared", "from child")
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    """Test the cache backend"""
+
+    OPTIONS = {"SIZE": 64 * 1024, "SLOT_SIZE": 256, "WAYS": 4, "STRIPES": 4}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, "cache")
+        self.cache = self.make_cache(self.OPTIONS)
+
+    def make_cache(self, options):
+        self.addCleanup(lambda: _regions.pop(self.location, None))
+        return SharedMemoryCache(self.location, {"OPTIONS": options})
+
+    def test_set_get_delete(self):
+        """Test storing, reading and deleting entries."""
+        self.cache.set("key", {"a": 1})
+
+        self.assertEqual(self.cache.get("key"), {"a": 1})
+        self.assertTrue(self.cache.delete("key"))
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.get("key", "default"), "default")
+
+    def test_add_only_new_keys(self):
+        """Test add does not overwrite a live entry."""
+        self.assertTrue(self.cache.add("key", 1))
+        self.assertFalse(self.cache.add("key", 2))
+
+        self.assertEqual(self.cache.get("key"), 1)
+
+    def test_expiry(self):
+        """Test expired entries are misses and a zero timeout is not stored."""
+        self.cache.set("key", 1, timeout=0.05)
+        self.cache.set("zero", 1, timeout=0)
+        time.sleep(0.06)
+
+        self.assertFalse(self.cache.has_key("key"))
+        self.assertIsNone(self.cache.get("zero"))
+
+    def test_touch_and_incr(self):
+        self.cache.set("counter", 1, timeout=0.05)
+
+        self.assertTrue(self.cache.touch("counter", None))
+        time.sleep(0.06)
+        self.assertEqual(self.cache.incr("counter", 2), 3)
+        self.assertEqual(self.cache.get("counter"), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_value_too_large(self):
+        """Test entries larger than a slot are not cached."""
+        self.cache.set("key", "small")
+        self.cache.set("key", "x" * 1000)
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_lru_eviction(self):
+        """Test a full set evicts its least recently used entry."""
+        cache = self.cache
+        region = cache._region
+        # Keys of a single set, one more than it has ways.
+        keys = []
+        target = None
+        for index in range(10000):
+            key = f"key-{index}"
+            offset = cache._locate(cache.make_key(key))[1]
+            target = target or offset
+            if offset == target:
+                keys.append(key)
+            if len(keys) == region.ways + 1:
+                break
+        for key in keys[:-1]:
+            cache.set(key, key)
+        cache.get(keys[0])
+
+        cache.set(keys[-1], keys[-1])
+
+        self.assertEqual(cache.get(keys[0]), keys[0])
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_stats(self):
+        """Test hits, misses and sets are counted."""
+        self.cache.set("key", 1)
+        self.cache.get("key")
+        self.cache.get("missing")
+
+        self.assertEqual(
+            self.cache.stats(), {"hits": 1, "misses": 1, "evictions": 0, "sets": 1}
+        )
+
+    def test_clear(self):
+        self.cache.set_many({"a": 1, "b": 2})
+
+        self.cache.clear()
+
+        self.assertEqual(self.cache.get_many(["a", "b"]), {})
+
+    def test_shared_between_processes(self):
+        """Test an entry set by another process is visible."""
+        self.cache.get("warm")  # Maps the file before forking.
+        process = multiprocessing.get_context("fork").Process(
+            target=set_in_child, args=(self.location, self.OPTIONS)
+        )
+        process.start()
+        process.join()
+
+        self.assertEqual(self.cache.get("shared"), "from child")
+
+    def test_geometry_mismatch(self):
+        """Test a file created with another geometry is replaced."""
+        self.cache.set("key", "old")
+        old = _regions.pop(self.location)
+        self.addCleanup(old.close)
+
+        cache = self.make_cache({**self.OPTIONS, "WAYS": 2})
+        cache.set("other", "new")
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get("other"), "new")
+        self.assertEqual(old.ways, 4)
+        self.assertEqual(os.fstat(old.fd).st_nlink, 0)
+
+    def test_region_reserved_up_front(self):
+        """Test a region that does not fit is an error, not a SIGBUS later."""
+        with patch("os.posix_fallocate", side_effect=OSError(28, "No space")):
+            with self.assertRaises(ImproperlyConfigured):
+                self.cache.get("key")
+
+    def test_cache_stats_command(self):
+        """Test the command prints the statistics of the cache."""
+        caches = {
+            "default": {
+                "BACKEND": "core.cache.SharedMemoryCache",
+                "LOCATION": self.location,
+                "OPTIONS": self.OPTIONS,
+            }
+        }
+        self.cache.get("missing")
+        out = StringIO()
+
+        with override_settings(CACHES=caches):
+            call_command("cache_stats", stdout=out)
+
+        self.assertIn("misses: 1", out.getvalue())
+        self.assertIn("hit ratio: 0.00%", out.getvalue())
@@ -1,12 +1,14 @@
 """ Test custom Django management commands """
 
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, override_settings
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -29,3 +31,132 @@ class CommandTest(SimpleTestCase):
         call_command("wait_for_db")
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+
+class FastBootTests(SimpleTestCase):
+    """Test the fast boot steps"""
+
+    databases = ["default"]
+
+    @patch("time.sleep")
+    @patch("core.boot.probe")
+    def test_wait_for_db_probe(self, patched_probe, patched_sleep):
+        """Test the probe mode retries with a bounded jittered delay"""
+        patched_probe.side_effect = [OperationalError] * 3 + [None]
+
+        call_command("wait_for_db", probe=True, stdout=StringIO())
+
+        self.assertEqual(patched_probe.call_count, 4)
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+        for attempt, delay in enumerate(delays):
+            self.assertLessEqual(delay, 0.1 * 2**attempt)
+
+    @patch("time.sleep")
+    @patch("core.boot.probe", side_effect=OperationalError)
+    def test_wait_for_db_probe_timeout(self, patched_probe, patched_sleep):
+        """Test the probe mode gives up after the timeout"""
+        with self.assertRaises(OperationalError):
+            call_command("wait_for_db", probe=True, timeout=0, stdout=StringIO())
+
+    @patch("core.management.commands.fast_boot.call_command")
+    def test_fast_boot_skips_unchanged_steps(self, patched_call):
+        """Test collectstatic and migrate only run when they have work"""
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATIC_ROOT=static_root
+        ):
+            out = StringIO()
+            call_command("fast_boot", stdout=out)
+            commands = [call.args[0] for call in patched_call.call_args_list]
+            self.assertEqual(commands, ["wait_for_db", "collectstatic"])
+
+            patched_call.reset_mock()
+            call_command("fast_boot", stdout=out)
+            commands = [call.args[0] for call in patched_call.call_args_list]
+            self.assertEqual(commands, ["wait_for_db"])
+
+        self.assertIn("unchanged, skipped", out.getvalue())
+        self.assertIn("up to date, skipped", out.getvalue())
+        self.assertIn("Ready in", out.getvalue())
+
+    @patch(
+        "core.boot.unapplied_migrations",
+        return_value={"default": ["core.0011"], "shard_1": ["core.0011"]},
+    )
+    @patch("core.management.commands.fast_boot.call_command")
+    def test_fast_boot_migrates_pending(self, patched_call, patched_pending):
+        """Test migrate runs when migrations are unapplied"""
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATIC_ROOT=static_root
+        ):
+            out = StringIO()
+            call_command("fast_boot", stdout=out)
+
+        commands = [call.args[0] for call in patched_call.call_args_list]
+        self.assertEqual(
+            commands, ["wait_for_db", "collectstatic", "migrate", "migrate"]
+        )
+        databases = [call.kwargs.get("database") for call in patched_call.mock_calls]
+        self.assertEqual(databases[-2:], ["default", "shard_1"])
+        self.assertIn("applied 1 on shard_1", out.getvalue())
+
+    @patch("core.boot.missing_cache_tables", return_value=["shared_cache"])
+    @patch("core.boot.unapplied_migrations", return_value={})
+    @patch("core.management.commands.fast_boot.call_command")
+    def test_fast_boot_creates_cache_tables(self, patched_call, *patched):
+        """Test createcachetable runs when a cache table is missing"""
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATIC_ROOT=static_root
+        ):
+            out = StringIO()
+            call_command("fast_boot", stdout=out)
+
+        commands = [call.args[0] for call in patched_call.call_args_list]
+        self.assertEqual(commands[-1], "createcachetable")
+        self.assertIn("created the cache tables", out.getvalue())
+
+    @override_settings(SHARDS=["default", "shard_1"])
+    @patch("core.management.commands.migrate_shards.call_command")
+    def test_migrate_shards(self, patched_call):
+        """Test migrate runs on the default database and every shard"""
+        call_command("migrate_shards", stdout=StringIO())
+
+        commands = [
+            (call.args[0], call.kwargs["database"])
+            for call in patched_call.call_args_list
+        ]
+        self.assertEqual(
+            commands,
+            [
+                ("migrate", "default"),
+                ("migrate", "shard_1"),
+                ("createcachetable", "default"),
+            ],
+        )
+
+
+class ProfileStartupTests(SimpleTestCase):
+    """Test the startup profiler"""
+
+    IMPORTTIME = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   django.utils\n"
+        "import time:       300 |        900 |   django.contrib.admin.sites\n"
+        "import time:        50 |        500 | yaml\n"
+    )
+
+    @patch("subprocess.run")
+    def test_profile_startup_per_app(self, patched_run):
+        """Test the import time is attributed to the installed apps"""
+        patched_run.return_value.returncode = 0
+        patched_run.return_value.stderr = self.IMPORTTIME
+        out = StringIO()
+
+        call_command("profile_startup", stdout=out)
+
+        self.assertIn("-X", patched_run.call_args.args[0])
+        output = out.getvalue()
+        self.assertIn("0.3 ms   66.7%  django.contrib.admin", output)
+        self.assertIn("0.1 ms   22.2%  django\n", output)
+        self.assertIn("yaml", output)
+        self.assertIn("Total import time 0.5 ms", output)
@@ -0,0 +1,182 @@
+"""Tests for the database connection pool"""
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from core.db.backends.pooled_postgresql import base
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """DB-API connection stand-in"""
+
+    def __init__(self):
+        self.closed = 0
+        self.healthy = True
+
+    def close(self):
+        self.closed = 1
+
+
+def fake_ping(connection):
+    if not connection.healthy:
+        raise RuntimeError("server closed the connection")
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the pool with fake connections"""
+
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            connection = FakeConnection()
+            self.opened.append(connection)
+            return connection
+
+        kwargs.setdefault("ping", fake_ping)
+        return ConnectionPool(connect, **kwargs)
+
+    def test_reuses_released_connection(self):
+        """Test a released connection is handed out again"""
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_fill_min_size(self):
+        pool = self.make_pool(min_size=3)
+
+        pool.fill()
+
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()["idle"], 3)
+
+    def test_timeout_when_exhausted(self):
+        """Test acquiring waits at most the timeout when all are in use"""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread gets the connection released by another"""
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+
+        pool.release(connection)
+        waiter.join()
+
+        self.assertEqual(acquired, [connection])
+        stats = pool.stats()
+        self.assertEqual(stats["waited"], 1)
+        self.assertGreaterEqual(stats["wait_max_ms"], 40)
+
+    def test_max_lifetime(self):
+        """Test connections older than the max lifetime are replaced"""
+        pool = self.make_pool(max_lifetime=0.01)
+        connection = pool.acquire()
+        pool.release(connection)
+        time.sleep(0.02)
+
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+
+    def test_pre_ping_replaces_dead_connection(self):
+        """Test an idle connection failing its ping is replaced"""
+        pool = self.make_pool(ping_interval=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+
+        replacement = pool.acquire()
+
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(pool.stats()["ping_failures"], 1)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_release_broken_connection(self):
+        """Test closed connections and failed resets free their slot"""
+        pool = self.make_pool(max_size=2)
+        first, second = pool.acquire(), pool.acquire()
+        first.closed = 1
+
+        pool.release(first)
+        pool.release(second, reset=self.fail_reset)
+
+        self.assertEqual(pool.stats()["size"], 0)
+        self.assertTrue(second.closed)
+
+    def fail_reset(self, connection):
+        raise RuntimeError("cannot roll back")
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool(self.fail_connect, max_size=1)
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                pool.acquire()
+
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def fail_connect(self):
+        raise RuntimeError("connection refused")
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Test the pools of the backend"""
+
+    def setUp(self):
+        base._pools.clear()
+        self.addCleanup(base._pools.clear)
+
+    def test_pool_per_process(self):
+        """Test a forked process does not reuse the pool of its parent"""
+        pool = base.get_pool("default", FakeConnection, {"MAX_SIZE": 3})
+
+        self.assertIs(base.get_pool("default", FakeConnection, {}), pool)
+        self.assertEqual(pool.max_size, 3)
+        with patch("os.getpid", return_value=-1):
+            self.assertIsNot(base.get_pool("default", FakeConnection, {}), pool)
+
+    def test_pool_stats(self):
+        pool = base.get_pool("default", FakeConnection, {})
+        pool.release(pool.acquire())
+
+        stats = base.pool_stats()
+
+        self.assertEqual(stats["default"]["acquired"], 1)
+        self.assertEqual(stats["default"]["idle"], 1)
+
+    @patch("core.db.backends.pooled_postgresql.base.connect")
+    def test_close_returns_connection(self, patched_connect):
+        """Test closing the Django connection gives it back to the pool"""
+        patched_connect.side_effect = lambda *args: MagicMock(closed=0)
+        settings_dict = {
+            **connections["default"].settings_dict,
+            "ENGINE": "core.db.backends.pooled_postgresql",
+            "NAME": "recipes",
+            "POOL": {"MAX_SIZE": 1},
+        }
+        wrapper = base.DatabaseWrapper(settings_dict, "pooled")
+
+        wrapper.ensure_connection()
+        first = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+
+        self.assertIs(wrapper.connection, first)
+        first.close.assert_not_called()
+        self.assertEqual(patched_connect.call_count, 1)
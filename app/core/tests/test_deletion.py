@@ -0,0 +1,99 @@
+"""Tests for the deferred account deletion"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from core import deletion, models
+
+
+def create_user_data(user, recipes=3):
+    """Create recipes with tags and ingredients for a user"""
+    tag = models.Tag.objects.create(user=user, name="Dinner")
+    ingredient = models.Ingredient.objects.create(user=user, name="Rice")
+    for i in range(recipes):
+        recipe = models.Recipe.objects.create(
+            user=user, title=f"Recipe {i}", time_minutes=5, price=Decimal("1.00")
+        )
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+
+class AccountDeletionTests(TestCase):
+    """Test deleting accounts in batches"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        create_user_data(self.user)
+        create_user_data(self.other_user)
+
+    def test_schedule_deletion_deactivates_user(self):
+        """Test scheduling a deletion deactivates the user and revokes tokens"""
+        Token.objects.create(user=self.user)
+
+        account = deletion.schedule_deletion(self.user)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(account.status, models.AccountDeletion.PENDING)
+        self.assertEqual(models.Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_run_deletion_deletes_user_data(self):
+        """Test running a deletion removes all the data of the user only"""
+        account = deletion.schedule_deletion(self.user)
+
+        deletion.run_deletion(account, batch_size=2)
+
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(models.Recipe.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(models.Tag.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(models.Change.objects.filter(user_id=self.user.id).exists())
+        self.assertEqual(models.Recipe.tags.through.objects.count(), 3)
+        self.assertEqual(models.Recipe.objects.count(), 3)
+        self.assertEqual(account.status, models.AccountDeletion.DONE)
+        self.assertEqual(account.progress["core.recipe"], 3)
+        self.assertEqual(account.progress["core.tag"], 1)
+
+    def test_interrupted_deletion_resumes(self):
+        """Test a deletion stopped after a batch resumes with the command"""
+        account = deletion.schedule_deletion(self.user)
+        deletion.delete_batch(models.Recipe, self.user.id, batch_size=2)
+        account.status = models.AccountDeletion.RUNNING
+        account.save()
+
+        # Its worker stopped, the lease expires at once.
+        call_command("process_deletions", lease=0, stdout=StringIO())
+
+        account.refresh_from_db()
+        self.assertEqual(account.status, models.AccountDeletion.DONE)
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertEqual(models.Recipe.objects.count(), 3)
+
+    def test_claimed_once(self):
+        """Test two workers can not run the same deletion"""
+        account = deletion.schedule_deletion(self.user)
+        other = models.AccountDeletion.objects.get(pk=account.pk)
+
+        self.assertTrue(deletion.claim(account))
+        self.assertFalse(deletion.claim(other))
+        self.assertEqual(account.status, models.AccountDeletion.RUNNING)
+
+    def test_running_deletion_skipped(self):
+        """Test the command leaves a deletion run by another worker alone"""
+        account = deletion.schedule_deletion(self.user)
+        deletion.claim(account)
+
+        call_command("process_deletions", stdout=StringIO())
+
+        account.refresh_from_db()
+        self.assertEqual(account.status, models.AccountDeletion.RUNNING)
+        self.assertTrue(get_user_model().objects.filter(id=self.user.id).exists())
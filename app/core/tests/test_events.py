@@ -0,0 +1,279 @@
+""" Tests for the change event broker and stream """
+import asyncio
+import json
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.authtoken.models import Token
+
+from core import events, models, streams
+
+STREAM_PATH = "/api/recipe/events/"
+
+
+def stream_scope(token=None, method="GET"):
+    """Return the ASGI scope of a change stream request"""
+    headers = [(b"authorization", f"Token {token}".encode())] if token else []
+    return {
+        "type": "http",
+        "method": method,
+        "path": STREAM_PATH,
+        "headers": headers,
+        "query_string": b"",
+    }
+
+
+class BrokerTests(SimpleTestCase):
+    """Test the in-process broker"""
+
+    def test_publish_reaches_user_subscribers_only(self):
+        """Test events are delivered to the subscribers of their user"""
+        broker = events.LocalBroker()
+
+        async def run():
+            mine = broker.subscribe(1)
+            other = broker.subscribe(2)
+            broker.publish(1, {"type": "change"})
+            event = await asyncio.wait_for(mine.get(), 1)
+            self.assertEqual(event, {"type": "change"})
+            self.assertTrue(other.queue.empty())
+            broker.unsubscribe(mine)
+            broker.unsubscribe(other)
+
+        asyncio.run(run())
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_slow_subscriber_gets_overflow(self):
+        """Test a full queue is replaced by an overflow event"""
+        broker = events.LocalBroker(max_queued=2)
+
+        async def run():
+            subscription = broker.subscribe(1)
+            for _ in range(3):
+                broker.publish(1, {"type": "change"})
+            await asyncio.sleep(0)
+            self.assertEqual(await subscription.get(), events.OVERFLOW)
+
+        asyncio.run(run())
+
+    def test_ten_thousand_idle_subscribers(self):
+        """Benchmark publishing while 10k idle subscribers are connected"""
+        broker = events.LocalBroker()
+
+        async def run():
+            subscriptions = [broker.subscribe(user_id) for user_id in range(10000)]
+            start = time.perf_counter()
+            for user_id in range(0, 10000, 100):
+                broker.publish(user_id, {"type": "change"})
+            await asyncio.sleep(0)
+            elapsed = time.perf_counter() - start
+            delivered = sum(not s.queue.empty() for s in subscriptions)
+            self.assertEqual(delivered, 100)
+            self.assertLess(elapsed, 1)
+            for subscription in subscriptions:
+                broker.unsubscribe(subscription)
+
+        asyncio.run(run())
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+    @patch("core.streams._authenticate", side_effect=lambda key: int(key))
+    def test_ten_thousand_idle_streams(self, patched_authenticate):
+        """Benchmark publishing while 10k idle clients are streaming"""
+        broker = events.LocalBroker()
+        count = 10000
+
+        async def run():
+            connected = asyncio.Event()
+            delivered = asyncio.Event()
+            disconnect = asyncio.Event()
+            counts = {"connected": 0, "delivered": 0}
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                body = message.get("body", b"")
+                if body.startswith(b": connected"):
+                    counts["connected"] += 1
+                    if counts["connected"] == count:
+                        connected.set()
+                elif body.startswith(b"event: change"):
+                    counts["delivered"] += 1
+                    if counts["delivered"] == count // 100:
+                        delivered.set()
+
+            clients = [
+                asyncio.ensure_future(
+                    streams.change_stream(stream_scope(str(user_id)), receive, send)
+                )
+                for user_id in range(1, count + 1)
+            ]
+            await asyncio.wait_for(connected.wait(), 60)
+            start = time.perf_counter()
+            for user_id in range(1, count + 1, 100):
+                broker.publish(user_id, {"type": "change"})
+            await asyncio.wait_for(delivered.wait(), 5)
+            elapsed = time.perf_counter() - start
+            self.assertLess(elapsed, 1)
+
+            disconnect.set()
+            await asyncio.wait_for(asyncio.gather(*clients), 30)
+            self.assertEqual(counts["delivered"], count // 100)
+
+        with patch("core.streams.get_broker", return_value=broker):
+            asyncio.run(run())
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class ListenerTests(SimpleTestCase):
+    """Test the LISTEN connection of the PostgreSQL broker"""
+
+    @patch("core.events.psycopg2.connect")
+    def test_connection_closed_on_error(self, patched_connect):
+        """Test a failing listener closes its connection before reconnecting"""
+        broker = events.PostgresBroker()
+        conn = patched_connect.return_value
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.execute.side_effect = OSError("connection lost")
+
+        class Stop(Exception):
+            pass
+
+        with patch("core.events.threading") as patched_threading, self.assertLogs(
+            "core.events", "ERROR"
+        ):
+            patched_threading.Event.return_value.wait.side_effect = Stop
+            with self.assertRaises(Stop):
+                broker._listen()
+
+        conn.close.assert_called_once_with()
+
+
+class ChangeStreamTests(TestCase):
+    """Test the server-sent event stream"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def run_stream(self, scope, on_message):
+        """Run the stream until on_message returns True, return the messages"""
+        messages = []
+
+        async def run():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                if on_message(message):
+                    disconnect.set()
+
+            await asyncio.wait_for(streams.change_stream(scope, receive, send), 5)
+
+        async_to_sync(run)()
+        return messages
+
+    def test_stream_requires_token(self):
+        """Test the stream rejects unauthenticated requests"""
+        messages = self.run_stream(stream_scope("invalid"), lambda m: False)
+
+        self.assertEqual(messages[0]["status"], 401)
+
+    def test_stream_sends_published_changes(self):
+        """Test published changes are streamed to the user"""
+        broker = events.get_broker()
+
+        def on_message(message):
+            if message.get("body", b"").startswith(b": connected"):
+                broker.publish(self.user.id, {"type": "change", "kind": "recipe"})
+            return message.get("body", b"").startswith(b"event: change")
+
+        messages = self.run_stream(stream_scope(self.token.key), on_message)
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertIn(b'"kind": "recipe"', messages[-1]["body"])
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_router_passes_other_paths_to_django(self):
+        """Test the router only serves the stream path"""
+        calls = []
+
+        async def django_app(scope, receive, send):
+            calls.append(scope["path"])
+
+        router = streams.EventStreamRouter(django_app)
+        scope = dict(stream_scope(), path="/api/recipe/recipes/")
+        async_to_sync(router)(scope, None, None)
+
+        self.assertEqual(calls, ["/api/recipe/recipes/"])
+
+    @patch("core.events.LocalBroker.publish")
+    def test_changes_published_on_commit(self, patched_publish):
+        """Test recording a change publishes an event after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = models.Recipe.objects.create(
+                user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+            )
+
+        patched_publish.assert_called_with(
+            self.user.id,
+            {"type": "change", "kind": "recipe", "ids": [recipe.id], "deleted": False},
+        )
+
+    @patch("core.events.get_broker")
+    def test_publish_failure_is_logged(self, patched_get_broker):
+        """Test a failure to publish after commit does not fail the write"""
+        patched_get_broker.return_value.publish.side_effect = RuntimeError
+
+        with self.assertLogs("core.events", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                events.publish_on_commit(self.user.id, {"type": "change"})
+
+    @patch("core.events.transaction.on_commit")
+    def test_publish_on_commit_of_database(self, patched_on_commit):
+        """Test events are published when the database written to commits"""
+        events.publish_on_commit(self.user.id, {"type": "change"}, using="other")
+
+        self.assertEqual(patched_on_commit.call_args.kwargs, {"using": "other"})
+
+
+class PostgresBrokerTests(SimpleTestCase):
+    """Test the LISTEN/NOTIFY broker payloads"""
+
+    def published(self, event):
+        """Return the event sent to pg_notify"""
+        with patch("core.events.connection") as patched_connection:
+            events.PostgresBroker().publish(1, event)
+        cursor = patched_connection.cursor.return_value.__enter__.return_value
+        return json.loads(cursor.execute.call_args.args[1][1])["event"]
+
+    def test_small_payload_sent_as_is(self):
+        """Test events under the NOTIFY limit are sent with their ids"""
+        event = {"type": "change", "kind": "recipe", "ids": [1, 2], "deleted": False}
+
+        self.assertEqual(self.published(event), event)
+
+    def test_large_payload_sent_as_resync(self):
+        """Test events over the NOTIFY limit ask for a resync of their kind"""
+        event = {
+            "type": "change",
+            "kind": "recipe",
+            "ids": list(range(100000, 102000)),
+            "deleted": False,
+        }
+
+        self.assertEqual(
+            self.published(event), {"type": "change", "kind": "recipe", "resync": True}
+        )
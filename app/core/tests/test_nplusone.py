@@ -0,0 +1,153 @@
+"""Tests for the N+1 query detector"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import models, nplusone
+from recipe import serializers
+
+reported = []
+
+
+def collect(detections, request):
+    reported.extend(detections)
+
+
+def create_recipes(user, count):
+    tag = models.Tag.objects.create(user=user, name="Vegan")
+    for index in range(count):
+        recipe = models.Recipe.objects.create(
+            user=user, title=f"Recipe {index}", time_minutes=5, price=Decimal("1.00")
+        )
+        recipe.tags.add(tag)
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test queries differing only in parameters share a fingerprint"""
+
+    def test_parameters_ignored(self):
+        self.assertEqual(
+            nplusone.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            nplusone.fingerprint("SELECT * FROM t WHERE id IN (%s)"),
+        )
+        self.assertEqual(
+            nplusone.fingerprint("SELECT * FROM t WHERE a = 1 AND b = 'x'"),
+            nplusone.fingerprint("SELECT * FROM t WHERE a = 22 AND b = 'it''s'"),
+        )
+
+    def test_shapes_differ(self):
+        self.assertNotEqual(
+            nplusone.fingerprint("SELECT * FROM t WHERE a = %s"),
+            nplusone.fingerprint("SELECT * FROM t WHERE b = %s"),
+        )
+
+    @override_settings(NPLUSONE_SAMPLE_RATE=0)
+    def test_middleware_unused_without_sample_rate(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            nplusone.NPlusOneMiddleware(lambda request: HttpResponse())
+
+
+@override_settings(NPLUSONE_THRESHOLD=3)
+class DetectorTests(TestCase):
+    """Test repeated queries are detected and attributed"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        create_recipes(self.user, 5)
+
+    def test_loop_attributed_to_code(self):
+        with nplusone.detect() as detector:
+            for recipe in models.Recipe.objects.all():
+                list(recipe.tags.all())
+
+        (detection,) = detector.detections()
+        self.assertEqual(detection.count, 5)
+        self.assertIn("test_nplusone.py", detection.origin)
+        self.assertIn("core_recipe_tags", detection.fingerprint)
+
+    def test_serializer_field_attributed(self):
+        with nplusone.detect() as detector:
+            serializers.RecipeSerializer(models.Recipe.objects.all(), many=True).data
+
+        origins = {detection.origin for detection in detector.detections()}
+        self.assertIn("RecipeSerializer.tags", origins)
+
+    def test_prefetched_not_detected(self):
+        with nplusone.detect() as detector:
+            recipes = models.Recipe.objects.prefetch_related("tags", "ingredients")
+            serializers.RecipeSerializer(recipes, many=True).data
+
+        self.assertEqual(detector.detections(), [])
+
+
+@override_settings(NPLUSONE_SAMPLE_RATE=1, NPLUSONE_THRESHOLD=3)
+class MiddlewareTests(TestCase):
+    """Test the middleware reports the N+1 queries of requests"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        create_recipes(self.user, 5)
+
+    def n_plus_one_view(self, request):
+        for recipe in models.Recipe.objects.all():
+            list(recipe.tags.all())
+        return HttpResponse()
+
+    @override_settings(NPLUSONE_ACTION=nplusone.RAISE)
+    def test_raise(self):
+        middleware = nplusone.NPlusOneMiddleware(self.n_plus_one_view)
+
+        with self.assertRaises(nplusone.NPlusOneError):
+            middleware(RequestFactory().get("/"))
+
+    @override_settings(NPLUSONE_ACTION=nplusone.LOG)
+    def test_log(self):
+        middleware = nplusone.NPlusOneMiddleware(self.n_plus_one_view)
+
+        with self.assertLogs("core.nplusone", "WARNING") as logs:
+            middleware(RequestFactory().get("/"))
+
+        self.assertIn("5 queries", logs.output[0])
+
+    @override_settings(NPLUSONE_ACTION=f"{__name__}.collect")
+    def test_callable(self):
+        reported.clear()
+        middleware = nplusone.NPlusOneMiddleware(self.n_plus_one_view)
+
+        middleware(RequestFactory().get("/"))
+
+        self.assertEqual([detection.count for detection in reported], [5])
+
+    @override_settings(NPLUSONE_SAMPLE_RATE=0.5, NPLUSONE_ACTION=nplusone.RAISE)
+    @patch("core.nplusone.random.random", return_value=0.7)
+    def test_unsampled_requests_not_watched(self, _):
+        middleware = nplusone.NPlusOneMiddleware(self.n_plus_one_view)
+
+        middleware(RequestFactory().get("/"))
+
+    @override_settings(NPLUSONE_ACTION=nplusone.RAISE)
+    def test_recipe_endpoints_clean(self):
+        """Test the recipe endpoints do not repeat queries per recipe"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = models.Recipe.objects.first()
+
+        for url in [
+            reverse("recipe:recipe-list"),
+            reverse("recipe:recipe-list") + "?fields=id,title,tags",
+            reverse("recipe:recipe-detail", args=[recipe.id]),
+            reverse("recipe:tag-list"),
+            reverse("recipe:changes"),
+            reverse("recipe:stats"),
+        ]:
+            client.get(url)
@@ -0,0 +1,168 @@
+"""Tests for the through models and partitioning the recipe tables by user"""
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core import models
+from core.db import partitioning
+
+
+class ThroughModelTests(TestCase):
+    """Test the through rows are given the user of the recipe"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.recipe = models.Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+
+    def test_add(self):
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        self.recipe.tags.add(tag)
+
+        link = models.RecipeTag.objects.get()
+        self.assertEqual(
+            (link.user, link.recipe, link.tag), (self.user, self.recipe, tag)
+        )
+
+    def test_reverse_add(self):
+        ingredient = models.Ingredient.objects.create(user=self.user, name="Salt")
+        ingredient.recipe_set.add(self.recipe)
+
+        self.assertEqual(models.RecipeIngredient.objects.get().user, self.user)
+
+    def test_set_and_create(self):
+        tags = [
+            models.Tag.objects.create(user=self.user, name=name)
+            for name in ["Vegan", "Quick"]
+        ]
+        self.recipe.tags.set(tags)
+        self.recipe.tags.create(user=self.user, name="Dinner")
+
+        users = set(models.RecipeTag.objects.values_list("user_id", flat=True))
+        self.assertEqual(users, {self.user.id})
+        self.assertEqual(self.recipe.tags.count(), 3)
+
+
+class PartitionSqlTests(SimpleTestCase):
+    """Test the statements creating the partitioned tables"""
+
+    def test_recipe(self):
+        statements = partitioning.create_sql(models.Recipe, partitions=4)
+
+        self.assertIn(
+            "CREATE TABLE core_recipe_partitioned (LIKE core_recipe INCLUDING "
+            "DEFAULTS) PARTITION BY HASH (user_id)",
+            statements,
+        )
+        self.assertIn(
+            "ALTER TABLE core_recipe_partitioned ADD PRIMARY KEY (id, user_id)",
+            statements,
+        )
+        self.assertIn(
+            "CREATE INDEX ON core_recipe_partitioned (user_id, id)", statements
+        )
+        partitions = [sql for sql in statements if "PARTITION OF" in sql]
+        self.assertEqual(len(partitions), 4)
+        self.assertTrue(partitions[3].endswith("(MODULUS 4, REMAINDER 3)"))
+
+    def test_through_unique_per_user(self):
+        statements = partitioning.create_sql(models.RecipeTag)
+
+        self.assertIn(
+            "ALTER TABLE core_recipe_tags_partitioned "
+            "ADD UNIQUE (user_id, recipe_id, tag_id)",
+            statements,
+        )
+        self.assertIn(
+            "CREATE INDEX ON core_recipe_tags_partitioned (user_id, tag_id)",
+            statements,
+        )
+
+    def test_mirror_upserts(self):
+        function = partitioning.mirror_sql(models.RecipeTag)[0]
+
+        self.assertIn("ON CONFLICT (id, user_id) DO UPDATE SET", function)
+        self.assertIn("recipe_id = EXCLUDED.recipe_id", function)
+        self.assertNotIn("user_id = EXCLUDED", function)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class PartitionTests(TransactionTestCase):
+    """Test partitioning a through table while it is written to"""
+
+    TABLE = models.RecipeIngredient._meta.db_table
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.recipes = [
+            models.Recipe.objects.create(
+                user=self.user, title=f"Soup {i}", time_minutes=5, price=Decimal("1.00")
+            )
+            for i in range(3)
+        ]
+        self.salt = models.Ingredient.objects.create(user=self.user, name="Salt")
+        self.pepper = models.Ingredient.objects.create(user=self.user, name="Pepper")
+        for recipe in self.recipes:
+            recipe.ingredients.add(self.salt)
+
+    def tearDown(self):
+        # Put the plain table back for the other tests.
+        with connection.cursor() as cursor:
+            if partitioning.is_partitioned(connection, self.TABLE):
+                cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self.TABLE])
+                (sequence,) = cursor.fetchone()
+                cursor.execute(
+                    f"ALTER SEQUENCE {sequence} OWNED BY {self.TABLE}_unpartitioned.id"
+                )
+                cursor.execute(f"DROP TABLE {self.TABLE}")
+                cursor.execute(
+                    f"ALTER TABLE {self.TABLE}_unpartitioned RENAME TO {self.TABLE}"
+                )
+        super().tearDown()
+
+    def test_prepare_backfill_swap(self):
+        model = models.RecipeIngredient
+        partitioning.prepare(connection, model, partitions=4)
+        # Written while the copy is being filled, through the trigger.
+        models.RecipeIngredient.objects.filter(recipe=self.recipes[0]).update(
+            ingredient=self.pepper
+        )
+        self.recipes[1].ingredients.clear()
+        self.recipes[2].ingredients.add(self.pepper)
+
+        partitioning.backfill(connection, model, batch_size=2)
+        partitioning.swap(connection, model)
+
+        self.assertTrue(partitioning.is_partitioned(connection, self.TABLE))
+        self.assertEqual(
+            sorted(
+                models.RecipeIngredient.objects.values_list(
+                    "recipe__title", "ingredient__name"
+                )
+            ),
+            [("Soup 0", "Pepper"), ("Soup 2", "Pepper"), ("Soup 2", "Salt")],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE tablename = %s", [self.TABLE]
+            )
+            indexes = [row[0] for row in cursor.fetchall()]
+        self.assertTrue(any("(user_id, id)" in index for index in indexes))
+        self.assertTrue(any("(user_id, ingredient_id)" in index for index in indexes))
+
+
+@unittest.skipIf(connection.vendor == "postgresql", "partitions the test database")
+class PartitionCommandTests(TestCase):
+    def test_needs_postgresql(self):
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("partition_by_user")
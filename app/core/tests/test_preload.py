@@ -0,0 +1,87 @@
+"""Tests for the preloaded worker model"""
+import gc
+import os
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from app import workers
+from core import preload
+from recipe import fastpath, serializers
+
+
+class PreloadTests(SimpleTestCase):
+    """Test warming the shared state"""
+
+    def test_warm_compiles_list_plans(self):
+        """Test warming compiles the fast path plans of the routed serializers"""
+        fastpath.compile_plan.cache_clear()
+
+        preload.warm()
+
+        plan = fastpath.compile_plan(serializers.RecipeSerializer)
+        self.assertEqual(fastpath.compile_plan.cache_info().hits, 1)
+        self.assertTrue(plan.steps)
+
+    def test_freeze(self):
+        """Test freezing moves the objects to the permanent generation"""
+        self.addCleanup(gc.unfreeze)
+
+        preload.freeze()
+
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/smaps_rollup"), "needs Linux")
+    def test_memory_usage(self):
+        usage = preload.memory_usage()
+
+        self.assertGreater(usage["rss"], 0)
+        self.assertLessEqual(usage["uss"], usage["rss"])
+
+    @patch("core.preload.memory_usage")
+    @patch("core.management.commands.worker_memory.processes")
+    def test_worker_memory_command(self, patched_processes, patched_usage):
+        """Test the command reports the unique memory of the workers"""
+        patched_processes.return_value = [(10, 1), (11, 10), (12, 10)]
+        patched_usage.side_effect = [
+            {"rss": 50000, "pss": 50000, "uss": 50000},
+            {"rss": 48000, "pss": 20000, "uss": 10000},
+            {"rss": 48000, "pss": 22000, "uss": 12000},
+        ]
+        out = StringIO()
+
+        call_command("worker_memory", stdout=out)
+
+        self.assertIn("master", out.getvalue())
+        self.assertIn("2 workers, mean unique 11000 kB of 48000 kB", out.getvalue())
+
+
+class WorkerSizingTests(SimpleTestCase):
+    """Test sizing the workers"""
+
+    MB = 1024 * 1024
+
+    def test_bound_by_cpus(self):
+        self.assertEqual(
+            workers.recommended_workers(2, 4096 * self.MB, 96 * self.MB, 256 * self.MB),
+            5,
+        )
+
+    def test_bound_by_memory(self):
+        self.assertEqual(
+            workers.recommended_workers(8, 512 * self.MB, 96 * self.MB, 256 * self.MB),
+            2,
+        )
+
+    def test_at_least_one_worker(self):
+        self.assertEqual(
+            workers.recommended_workers(1, 128 * self.MB, 96 * self.MB, 256 * self.MB),
+            1,
+        )
+
+    @patch.dict(os.environ, {"UWSGI_WORKERS": "7"})
+    def test_explicit_workers(self):
+        self.assertEqual(workers.workers(), 7)
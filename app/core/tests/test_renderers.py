@@ -0,0 +1,110 @@
+"""Tests for the API renderers"""
+import datetime
+import io
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+import msgpack
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import MessagePackParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer"""
+
+    def test_renders_like_drf_json_renderer(self):
+        """Test the output matches DRF's JSONRenderer"""
+        data = [
+            OrderedDict(
+                [
+                    ("title", "Jollof Rice ünïcödé"),
+                    ("price", "5.50"),
+                    ("time_minutes", 30),
+                    ("tags", [{"id": 1, "name": "Dinner"}]),
+                    ("link", None),
+                    ("ratio", 0.5),
+                    ("ok", True),
+                ]
+            )
+        ]
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renders_dates_uuids_and_decimals(self):
+        """Test native and fallback types are encoded like DRF"""
+        data = {
+            "created": datetime.datetime(
+                2022, 6, 16, 12, 35, 1, 123456, tzinfo=timezone.utc
+            ),
+            "day": datetime.date(2022, 6, 16),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "price": Decimal("5.50"),
+            "label": _("Dinner"),
+            "duration": datetime.timedelta(minutes=1),
+            "ids": {1},
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_string_keys(self):
+        """Test integer keys are rendered as strings"""
+        self.assertEqual(ORJSONRenderer().render({1: "a"}), b'{"1":"a"}')
+
+    def test_render_none(self):
+        """Test an empty body is rendered for no data"""
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_indent(self):
+        """Test the indent media type parameter"""
+        rendered = ORJSONRenderer().render({"a": 1}, "application/json; indent=2")
+
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+
+class MessagePackTests(SimpleTestCase):
+    """Test the MessagePack renderer and parser"""
+
+    def test_render_matches_json_representation(self):
+        """Test MessagePack carries the same representation as JSON"""
+        data = {
+            "title": "Jollof",
+            "price": "5.50",
+            "tags": [OrderedDict([("id", 1), ("name", "Dinner")])],
+            "created": datetime.datetime(2022, 6, 16, tzinfo=timezone.utc),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        }
+
+        rendered = MessagePackRenderer().render(data)
+
+        self.assertEqual(msgpack.unpackb(rendered), orjson_roundtrip(data))
+
+    def test_parse(self):
+        """Test parsing a MessagePack body"""
+        body = msgpack.packb({"title": "Soup", "tags": [{"name": "Dinner"}]})
+
+        data = MessagePackParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data, {"title": "Soup", "tags": [{"name": "Dinner"}]})
+
+    def test_parse_error(self):
+        """Test invalid bodies raise a parse error"""
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b"\xc1"))
+
+    def test_parse_error_unhashable_key(self):
+        """Test a map keyed by an array raises a parse error"""
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b"\x81\x91\x01\x01"))
+
+
+def orjson_roundtrip(data):
+    """Return data as parsed back from its JSON rendering"""
+    return json.loads(ORJSONRenderer().render(data))
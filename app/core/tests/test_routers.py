@@ -0,0 +1,88 @@
+"""Tests for the read replica router"""
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import models
+from core.db import routers
+
+
+@patch("core.db.routers.replica_aliases", return_value=["replica_1", "replica_2"])
+@override_settings(REPLICA_MAX_LAG=5, REPLICA_LAG_CHECK_INTERVAL=60)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing the queries"""
+
+    def setUp(self):
+        routers._lag.clear()
+        self.addCleanup(routers._lag.clear)
+        self.router = routers.ReplicaRouter()
+
+    @patch("core.db.routers.replica_lag", return_value=0)
+    def test_reads_go_to_primary_by_default(self, patched_lag, patched_aliases):
+        self.assertEqual(self.router.db_for_read(models.Recipe), "default")
+        patched_lag.assert_not_called()
+
+    @patch("core.db.routers.replica_lag", return_value=0)
+    def test_replica_reads(self, patched_lag, patched_aliases):
+        """Test reads in replica_reads() go to a replica"""
+        with routers.replica_reads():
+            alias = self.router.db_for_read(models.Recipe)
+
+        self.assertIn(alias, ["replica_1", "replica_2"])
+        self.assertEqual(self.router.db_for_read(models.Recipe), "default")
+
+    def test_lagging_replica_skipped(self, patched_aliases):
+        """Test replicas behind by more than the max lag are not read"""
+        lags = {"replica_1": 30, "replica_2": 1}
+        with patch("core.db.routers.replica_lag", side_effect=lags.get):
+            with routers.replica_reads():
+                aliases = {self.router.db_for_read(models.Recipe) for _ in range(10)}
+
+        self.assertEqual(aliases, {"replica_2"})
+
+    def test_unreachable_replicas_fall_back(self, patched_aliases):
+        """Test reads go to the primary when no replica is usable"""
+        with patch(
+            "core.db.routers.replica_lag", side_effect=OperationalError
+        ), self.assertLogs("core.db.routers", "WARNING"):
+            with routers.replica_reads():
+                alias = self.router.db_for_read(models.Recipe)
+
+        self.assertEqual(alias, "default")
+
+    @patch("core.db.routers.replica_lag", return_value=0)
+    def test_lag_checked_once_per_interval(self, patched_lag, patched_aliases):
+        with routers.replica_reads():
+            for _ in range(5):
+                self.router.db_for_read(models.Recipe)
+
+        self.assertEqual(patched_lag.call_count, 2)
+
+    def test_writes_and_migrations_on_primary(self, patched_aliases):
+        self.assertEqual(self.router.db_for_write(models.Recipe), "default")
+        self.assertTrue(self.router.allow_migrate("default", "core"))
+        self.assertFalse(self.router.allow_migrate("replica_1", "core"))
+
+
+class StickinessTests(TestCase):
+    """Test the users who wrote stay on the primary"""
+
+    def test_mark_written(self):
+        self.assertFalse(routers.is_sticky(42))
+
+        routers.mark_written(42)
+
+        self.assertTrue(routers.is_sticky(42))
+
+    def test_sticky_across_nodes(self):
+        """Test the mark is kept in the database every node reads"""
+        routers.mark_written(42)
+
+        table = caches[settings.REPLICA_STICKY_CACHE]._table
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT cache_key FROM {table}")
+            keys = [key for (key,) in cursor.fetchall()]
+        self.assertEqual(keys, [caches["shared"].make_key("db:sticky:42")])
@@ -0,0 +1,90 @@
+"""Tests for the OpenAPI schema"""
+import gzip
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import schema
+
+SCHEMA_URL = reverse("api-schema")
+
+
+class SchemaTests(TestCase):
+    """Test the OpenAPI schema endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        schema._generated.clear()
+        self.addCleanup(schema._generated.clear)
+
+    def test_schema_documents_msgpack(self):
+        """Test the schema documents the MessagePack content type"""
+        res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = res.json()["paths"]["/api/recipe/recipes/"]
+        self.assertIn(
+            "application/msgpack", recipes["get"]["responses"]["200"]["content"]
+        )
+        self.assertIn("application/msgpack", recipes["post"]["requestBody"]["content"])
+
+    def test_schema_generated_once(self):
+        """Test the schema is generated once without an artifact"""
+        with override_settings(SCHEMA_ARTIFACT_DIR="/nonexistent"), patch(
+            "core.schema.generate", wraps=schema.generate
+        ) as generate:
+            first = self.client.get(SCHEMA_URL, {"format": "json"})
+            second = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_schema_not_modified(self):
+        """Test a request with the current ETag gets a 304"""
+        res = self.client.get(SCHEMA_URL)
+        etag = res["ETag"]
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_schema_gzip(self):
+        """Test the schema is gzipped when the client accepts it"""
+        plain = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        res = self.client.get(
+            SCHEMA_URL, {"format": "json"}, HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res["ETag"], plain["ETag"])
+        self.assertIn("Accept-Encoding", res["Vary"])
+
+    def test_schema_served_from_artifact(self):
+        """Test the built artifact is served without generating the schema"""
+        with tempfile.TemporaryDirectory() as directory:
+            out = StringIO()
+            call_command("build_schema", directory=directory, stdout=out)
+            self.assertTrue(os.path.exists(os.path.join(directory, "schema.yaml.gz")))
+
+            with override_settings(SCHEMA_ARTIFACT_DIR=directory), patch(
+                "core.schema.generate"
+            ) as generate:
+                res = self.client.get(SCHEMA_URL)
+            with open(os.path.join(directory, "schema.yaml"), "rb") as file:
+                built = file.read()
+
+        generate.assert_not_called()
+        self.assertIn("Built schema version", out.getvalue())
+        self.assertEqual(res.content, built)
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi")
@@ -0,0 +1,50 @@
+"""Tests for the API-only settings profile"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app import settings_api
+
+
+@override_settings(
+    MIDDLEWARE=settings_api.MIDDLEWARE, REST_FRAMEWORK=settings_api.REST_FRAMEWORK
+)
+class APISettingsTests(TestCase):
+    """Test the API works with the lean middleware stack"""
+
+    def test_profile_excludes_unused_apps(self):
+        """Test the admin, schema and session machinery are left out"""
+        self.assertNotIn("django.contrib.admin", settings_api.INSTALLED_APPS)
+        self.assertNotIn("drf_spectacular", settings_api.INSTALLED_APPS)
+        self.assertNotIn(
+            "django.contrib.sessions.middleware.SessionMiddleware",
+            settings_api.MIDDLEWARE,
+        )
+        self.assertNotIn(
+            "django.middleware.csrf.CsrfViewMiddleware", settings_api.MIDDLEWARE
+        )
+
+    def test_token_authenticated_request(self):
+        """Test a token authenticated write works without sessions"""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        token = Token.objects.create(user=user)
+        client = APIClient(enforce_csrf_checks=True)
+
+        res = client.post(
+            reverse("recipe:recipe-list"),
+            {"title": "Soup", "time_minutes": 5, "price": "1.00"},
+            HTTP_AUTHORIZATION=f"Token {token.key}",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_unauthenticated_request(self):
+        res = APIClient().get(reverse("recipe:recipe-list"))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
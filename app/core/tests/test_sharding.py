@@ -0,0 +1,394 @@
+"""Tests for sharding the recipe data by user"""
+from collections import Counter
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import boot, deletion, models
+from core.db import routers, sharding
+from recipe import stats
+
+SHARD = "shard_1"
+RECIPES_URL = reverse("recipe:recipe-list")
+CHANGES_URL = reverse("recipe:changes")
+
+
+class HashRingTests(SimpleTestCase):
+    """Test the consistent hash ring"""
+
+    def test_keys_spread_over_nodes(self):
+        ring = sharding.HashRing(["a", "b", "c"])
+        counts = Counter(ring.node_for(key) for key in range(3000))
+
+        self.assertEqual(set(counts), {"a", "b", "c"})
+        for count in counts.values():
+            self.assertGreater(count, 700)
+
+    def test_new_node_only_takes_keys(self):
+        """Test adding a node moves keys to it and nowhere else"""
+        before = sharding.HashRing(["a", "b", "c"])
+        after = sharding.HashRing(["a", "b", "c", "d"])
+        moved = [
+            key for key in range(3000) if before.node_for(key) != after.node_for(key)
+        ]
+
+        self.assertTrue(all(after.node_for(key) == "d" for key in moved))
+        self.assertLess(len(moved), 1100)
+
+
+class SingleShardTests(TestCase):
+    """Test an unsharded deployment does not touch the directory"""
+
+    def test_lookup_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(sharding.lookup(1), ("default", False))
+
+    def test_router_falls_through(self):
+        router = routers.ShardRouter()
+        recipe = models.Recipe(user_id=1)
+
+        self.assertIsNone(router.db_for_write(models.Recipe, instance=recipe))
+        self.assertIsNone(router.db_for_read(models.Recipe))
+
+
+@override_settings(SHARDS=["default", SHARD], SHARD_DIRECTORY_SECONDS=60)
+class ShardTestCase(TestCase):
+    """Run the tests with a second, in-memory SQLite database as shard.
+
+    The shards of the settings mirror the default database in tests, this
+    one is added after the test databases are set up.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings[SHARD] = {
+            **connections.settings["default"],
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+            "OPTIONS": {},
+        }
+        call_command("migrate", database=SHARD, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[SHARD].close()
+        del connections[SHARD]
+        del connections.settings[SHARD]
+        super().tearDownClass()
+
+    def setUp(self):
+        shard_atomic = transaction.atomic(using=SHARD)
+        shard_atomic.__enter__()
+        self.addCleanup(shard_atomic.__exit__, None, None, None)
+        self.addCleanup(transaction.set_rollback, True, using=SHARD)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.directory = caches[settings.SHARD_DIRECTORY_CACHE]
+        self.directory.delete(f"db:shard:{self.user.id}")
+        self.addCleanup(self.directory.delete, f"db:shard:{self.user.id}")
+
+    def assign(self, shard):
+        with patch.object(sharding.HashRing, "node_for", return_value=shard):
+            return sharding.lookup(self.user.id)
+
+    def create_recipe(self, **params):
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        recipe = models.Recipe.objects.create(
+            user=self.user,
+            title="Soup",
+            time_minutes=5,
+            price=Decimal("1.00"),
+            **params,
+        )
+        recipe.tags.add(tag)
+        return recipe
+
+
+class MigrationTests(ShardTestCase):
+    """Test the boot steps migrate the shards"""
+
+    def test_unapplied_migrations_of_every_shard(self):
+        self.assertEqual(boot.migrated_databases(), ["default", SHARD])
+        self.assertEqual(boot.unapplied_migrations(), {})
+
+        _, latest = MigrationLoader(None).graph.leaf_nodes("core")[0]
+        MigrationRecorder(connections[SHARD]).record_unapplied("core", latest)
+
+        pending = boot.unapplied_migrations()
+        self.assertEqual(list(pending), [SHARD])
+        self.assertEqual([migration.name for migration in pending[SHARD]], [latest])
+
+
+class DirectoryTests(ShardTestCase):
+    """Test assigning the users to shards"""
+
+    def test_new_user_assigned_from_ring(self):
+        """Test a user without data goes to their shard on the ring"""
+        self.assertEqual(self.assign(SHARD), (SHARD, False))
+
+        assignment = models.ShardAssignment.objects.get(user_id=self.user.id)
+        self.assertEqual(assignment.shard, SHARD)
+        # The rows of the shard point to a copy of the user.
+        copy = get_user_model().objects.using(SHARD).get(id=self.user.id)
+        self.assertEqual(copy.email, self.user.email)
+
+    def test_existing_data_stays_on_default(self):
+        """Test users from before the sharding stay on the default database"""
+        self.create_recipe()
+
+        self.assertEqual(self.assign(SHARD), ("default", False))
+
+    def test_assignment_cached(self):
+        self.assign(SHARD)
+
+        with self.assertNumQueries(0, using="default"):
+            self.assertEqual(sharding.shard_for(self.user.id), SHARD)
+
+    def test_router_uses_instance_user(self):
+        self.assign(SHARD)
+        router = routers.ShardRouter()
+        recipe = models.Recipe(user=self.user)
+
+        self.assertEqual(router.db_for_write(models.Recipe, instance=recipe), SHARD)
+        self.assertEqual(router.db_for_read(models.Tag, user_id=self.user.id), SHARD)
+        self.assertEqual(router.db_for_read(models.Change, user_id=self.user.id), SHARD)
+
+    def test_use_shard(self):
+        router = routers.ShardRouter()
+        with sharding.use_shard(SHARD):
+            self.assertEqual(router.db_for_read(models.Recipe), SHARD)
+            self.assertIsNone(router.db_for_read(get_user_model()))
+        self.assertIsNone(router.db_for_read(models.Recipe))
+
+
+class ShardedApiTests(ShardTestCase):
+    """Test the recipe endpoints read and write the shard of the user"""
+
+    def setUp(self):
+        super().setUp()
+        self.assign(SHARD)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_and_read_on_shard(self):
+        payload = {
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": "5.50",
+            "tags": [{"name": "Thai"}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(models.Recipe.objects.using("default").exists())
+        recipe = models.Recipe.objects.using(SHARD).get(title="Curry")
+        self.assertEqual(recipe.tags.get().name, "Thai")
+        self.assertTrue(
+            models.RecipeDocument.objects.using(SHARD).filter(recipe=recipe).exists()
+        )
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual([item["title"] for item in res.data], ["Curry"])
+        res = self.client.get(reverse("recipe:recipe-detail", args=[recipe.id]))
+        self.assertEqual(res.data["tags"][0]["name"], "Thai")
+
+    def test_writes_refused_while_moving(self):
+        """Test a moving user can read but not write"""
+        models.ShardAssignment.objects.filter(user_id=self.user.id).update(moving=True)
+        sharding.invalidate(self.user.id)
+
+        res = self.client.post(
+            RECIPES_URL, {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_stats_on_shard(self):
+        self.client.post(
+            RECIPES_URL, {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        )
+
+        res = self.client.get(reverse("recipe:stats"))
+
+        self.assertEqual(res.data["recipes"], 1)
+        self.assertTrue(models.UserRecipeStats.objects.using(SHARD).exists())
+        self.assertFalse(models.UserRecipeStats.objects.using("default").exists())
+
+    def test_stats_not_stored_while_moving(self):
+        """Test reading the stats of a moving user writes nothing"""
+        models.ShardAssignment.objects.filter(user_id=self.user.id).update(moving=True)
+        sharding.invalidate(self.user.id)
+
+        res = self.client.get(reverse("recipe:stats"))
+
+        self.assertEqual(res.data["recipes"], 0)
+        self.assertFalse(models.UserRecipeStats.objects.using(SHARD).exists())
+
+    def test_changes_on_shard(self):
+        """Test the change log is written and read with the data"""
+        token = self.client.get(CHANGES_URL).data["next"]
+        self.client.post(
+            RECIPES_URL, {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        )
+
+        self.assertFalse(models.Change.objects.using("default").exists())
+        self.assertEqual(models.Change.objects.using(SHARD).get().kind, "recipe")
+        res = self.client.get(CHANGES_URL, {"since": token})
+        self.assertFalse(res.data["reset"])
+        self.assertEqual([recipe["title"] for recipe in res.data["recipes"]], ["Soup"])
+
+
+class ShardedAdminTests(ShardTestCase):
+    """Test the admin pages read the shard of the objects"""
+
+    def setUp(self):
+        super().setUp()
+        self.assign(SHARD)
+        with sharding.use_shard(SHARD):
+            self.recipe = self.create_recipe()
+        admin_user = get_user_model().objects.create_superuser(
+            email="admin@example.com", name="Admin", password="testpass123"
+        )
+        self.client.force_login(admin_user)
+
+    def test_changelist_per_shard(self):
+        url = reverse("admin:core_recipe_changelist")
+
+        self.assertNotContains(self.client.get(url), "Soup")
+        self.assertContains(self.client.get(url, {"shard": SHARD}), "Soup")
+
+    def test_change_page_on_shard(self):
+        url = reverse("admin:core_recipe_change", args=[self.recipe.id])
+        res = self.client.get(url)
+
+        self.assertContains(res, "Soup")
+        self.assertContains(res, "Vegan")
+
+
+class MoveUserTests(ShardTestCase):
+    """Test moving the data of a user between shards"""
+
+    def test_move_user(self):
+        """Test the rows keep their ids and leave the source shard"""
+        self.assign(SHARD)
+        with sharding.use_shard(SHARD):
+            recipe = self.create_recipe()
+
+        stats.get(self.user.id)
+
+        copied = sharding.move_user(self.user.id, "default", wait=0, log=str)
+
+        self.assertEqual(copied["core.recipe"], 1)
+        self.assertEqual(
+            models.UserRecipeStats.objects.using("default").get().recipes, 1
+        )
+        self.assertFalse(models.UserRecipeStats.objects.using(SHARD).exists())
+        self.assertEqual(sharding.lookup(self.user.id), ("default", False))
+        moved = models.Recipe.objects.using("default").get(id=recipe.id)
+        self.assertEqual(moved.tags.get().name, "Vegan")
+        self.assertFalse(models.Recipe.objects.using(SHARD).exists())
+        self.assertFalse(models.Tag.objects.using(SHARD).exists())
+        self.assertFalse(
+            get_user_model().objects.using(SHARD).filter(id=self.user.id).exists()
+        )
+
+    @patch("core.db.sharding.time.sleep")
+    def test_move_waits_for_directory_entries(self, patched_sleep):
+        """Test moving outlasts the entries cached by the other nodes"""
+        self.assign(SHARD)
+
+        sharding.move_user(self.user.id, "default", log=str)
+
+        self.assertEqual(
+            [call.args[0] for call in patched_sleep.call_args_list], [60, 60]
+        )
+
+    def test_sync_resets_after_move(self):
+        """Test a token of the source shard asks for a full sync"""
+        self.assign(SHARD)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post(RECIPES_URL, {"title": "Soup", "time_minutes": 5, "price": "1"})
+        token = client.get(CHANGES_URL).data["next"]
+
+        sharding.move_user(self.user.id, "default", wait=0, log=str)
+
+        self.assertFalse(models.Change.objects.using(SHARD).exists())
+        res = client.get(CHANGES_URL, {"since": token})
+        self.assertTrue(res.data["reset"])
+        self.assertEqual([recipe["title"] for recipe in res.data["recipes"]], ["Soup"])
+
+    def test_commands_per_shard(self):
+        """Test the document commands run on every shard or the one given"""
+        self.assign(SHARD)
+        with sharding.use_shard(SHARD):
+            recipe = self.create_recipe()
+        models.RecipeDocument.objects.using(SHARD).all().delete()
+
+        out = StringIO()
+        call_command("build_recipe_documents", "--database=default", stdout=out)
+        self.assertIn("Built 0 documents on default", out.getvalue())
+        call_command("build_recipe_documents", stdout=out)
+        self.assertIn(f"Built 1 documents on {SHARD}", out.getvalue())
+        self.assertTrue(
+            models.RecipeDocument.objects.using(SHARD).filter(recipe=recipe).exists()
+        )
+        call_command("check_recipe_documents", stdout=out)
+        self.assertIn(f"Checked 1 documents on {SHARD}", out.getvalue())
+
+    @override_settings(SYNC_TOKEN_MAX_AGE=-1)
+    def test_prune_changes_on_every_shard(self):
+        """Test the tombstones of the shards are pruned"""
+        self.assign(SHARD)
+        with sharding.use_shard(SHARD):
+            kept = self.create_recipe()
+            self.create_recipe().delete()
+
+        out = StringIO()
+        call_command("prune_changes", stdout=out)
+
+        self.assertIn(f"Pruned 1 tombstones on {SHARD}", out.getvalue())
+        self.assertFalse(models.Change.objects.using(SHARD).filter(deleted=True))
+        self.assertTrue(
+            models.Change.objects.using(SHARD).filter(object_id=kept.id).exists()
+        )
+
+    def test_command_moves_to_ring_shard(self):
+        self.assign("default")
+        self.create_recipe()
+
+        with patch.object(sharding.HashRing, "node_for", return_value=SHARD):
+            call_command(
+                "move_user_shard", "--rebalance", "--wait=0", stdout=StringIO()
+            )
+
+        self.assertEqual(sharding.shard_for(self.user.id), SHARD)
+        self.assertEqual(models.Recipe.objects.using(SHARD).count(), 1)
+        self.assertFalse(models.Recipe.objects.using("default").exists())
+
+    def test_deletion_clears_shard(self):
+        self.assign(SHARD)
+        with sharding.use_shard(SHARD):
+            self.create_recipe()
+        account = deletion.schedule_deletion(self.user)
+
+        deletion.run_deletion(account)
+
+        self.assertFalse(models.Recipe.objects.using(SHARD).exists())
+        self.assertFalse(get_user_model().objects.using(SHARD).exists())
+        self.assertFalse(models.ShardAssignment.objects.exists())
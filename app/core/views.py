@@ -1,12 +1,45 @@
 """
 Core Views for App
 """
-
+from drf_spectacular.utils import extend_schema
+from rest_framework import authentication, permissions
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import batch
+from core.db.backends.pooled_postgresql.base import pool_stats
+from core.renderers import PrerenderedJSONResponse
+from core.serializers import BatchResponseSerializer, BatchSerializer
 
 
 @api_view(["GET"])
 def health_check(request):
     """Returns successful response"""
-    return Response({"healthy": True})
+    data = {"healthy": True}
+    pools = pool_stats()
+    if pools:
+        data["db_pool"] = pools
+    return Response(data)
+
+
+class BatchView(APIView):
+    """Run several API requests in one round trip"""
+
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    # Sub-requests for the same path repeat their queries by design.
+    detect_n_plus_one = False
+
+    @extend_schema(request=BatchSerializer, responses=BatchResponseSerializer)
+    def post(self, request):
+        """Run the requests in order and return all their responses"""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = batch.run(
+            request,
+            serializer.validated_data["requests"],
+            parallel=serializer.validated_data["parallel"],
+            excluded=(BatchView,),
+        )
+        return PrerenderedJSONResponse(batch.render(results))
@@ -0,0 +1,82 @@
+"""
+Prerendered recipe documents served by the recipe endpoints
+"""
+from django.db import router, transaction
+
+from core import models
+from core.renderers import ORJSONRenderer
+from recipe import fastpath, serializers
+
+BATCH_SIZE = 500
+
+_renderer = ORJSONRenderer()
+
+
+def render(recipe):
+    """Return the detail and summary JSON of a recipe with prefetched relations"""
+    detail = serializers.RecipeDetailSerializer(recipe).data
+    summary = serializers.RecipeSerializer(recipe).data
+    return models.RecipeDocument(
+        recipe_id=recipe.id,
+        detail=_renderer.render(detail).decode(),
+        summary=_renderer.render(summary).decode(),
+        has_image=bool(recipe.image),
+    )
+
+
+def render_summaries(recipe_ids):
+    """Return the summary JSON of recipes by id, without the detail"""
+    queryset = models.Recipe.objects.filter(id__in=recipe_ids)
+    try:
+        summaries = fastpath.serialize_by_id(queryset, serializers.RecipeSerializer)
+    except fastpath.UnsupportedSerializer:
+        summaries = {
+            recipe.id: serializers.RecipeSerializer(recipe).data
+            for recipe in recipes_for(recipe_ids)
+        }
+    return {
+        recipe_id: _renderer.render(summary).decode()
+        for recipe_id, summary in summaries.items()
+    }
+
+
+def recipes_for(recipe_ids):
+    return models.Recipe.objects.filter(id__in=recipe_ids).prefetch_related(
+        "tags", "ingredients"
+    )
+
+
+def rebuild(recipe_ids, batch_size=BATCH_SIZE):
+    """Rebuild the documents of recipes in batches, return them by recipe id.
+
+    The recipe rows are locked first, so concurrent rebuilds of a recipe run
+    one after the other and the last one renders the latest data.
+    """
+    recipe_ids = list(recipe_ids)
+    documents = {}
+    with transaction.atomic(using=router.db_for_write(models.RecipeDocument)):
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start : start + batch_size]
+            list(
+                models.Recipe.objects.filter(id__in=batch)
+                .order_by("id")
+                .select_for_update()
+                .values_list("id", flat=True)
+            )
+            rendered = [render(recipe) for recipe in recipes_for(batch)]
+            models.RecipeDocument.objects.filter(recipe_id__in=batch).delete()
+            models.RecipeDocument.objects.bulk_create(rendered)
+            documents.update((document.recipe_id, document) for document in rendered)
+    return documents
+
+
+def rebuild_for(instance, batch_size=BATCH_SIZE):
+    """Rebuild the documents of the recipes using a tag or an ingredient"""
+    return rebuild(
+        instance.recipe_set.values_list("id", flat=True).order_by("id"), batch_size
+    )
+
+
+def invalidate(recipe_ids):
+    """Drop documents, they are rebuilt when they are next read"""
+    models.RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
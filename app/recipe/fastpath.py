@@ -0,0 +1,165 @@
+"""
+Fast read-only serialization of the recipe, tag and ingredient lists.
+
+The output matches the DRF serializers but is built from values() rows and
+a map of the related rows, following a field plan compiled once per
+serializer class and field selection.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields
+from rest_framework import serializers as drf_serializers
+
+
+class UnsupportedSerializer(Exception):
+    """Raised when a serializer has fields the fast path cannot render"""
+
+
+# The values() of these fields already are their representation.
+IDENTITY_FIELDS = (drf_fields.CharField, drf_fields.IntegerField)
+UNSUPPORTED_FIELDS = (
+    drf_fields.FileField,
+    drf_fields.SerializerMethodField,
+    drf_fields.HiddenField,
+    drf_serializers.RelatedField,
+    drf_serializers.ManyRelatedField,
+)
+
+
+def _converter(field):
+    """Return the function rendering a column value, None for identity"""
+    if isinstance(field, UNSUPPORTED_FIELDS) or field.source == "*":
+        raise UnsupportedSerializer(field.field_name)
+    if "." in field.source:
+        raise UnsupportedSerializer(field.field_name)
+    if isinstance(field, IDENTITY_FIELDS) and not isinstance(
+        field, drf_fields.DecimalField
+    ):
+        return None
+    return field.to_representation
+
+
+def _scalars(serializer):
+    """Compile the (name, column, converter) triples of the scalar fields"""
+    scalars = []
+    for name, field in serializer.fields.items():
+        if field.write_only or isinstance(field, drf_serializers.BaseSerializer):
+            continue
+        scalars.append((name, field.source, _converter(field)))
+    return tuple(scalars)
+
+
+class Plan:
+    """Precompiled rendering plan of a serializer.
+
+    `steps` holds a (name, column, converter, relation) tuple per rendered
+    field in serializer order, relation being the index of the related map
+    for nested fields and None for columns.
+    """
+
+    def __init__(self, serializer):
+        if not isinstance(serializer, drf_serializers.ModelSerializer):
+            raise UnsupportedSerializer(type(serializer).__name__)
+        model = serializer.Meta.model
+        steps = []
+        self.relations = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if not isinstance(field, drf_serializers.BaseSerializer):
+                steps.append((name, field.source, _converter(field), None))
+                continue
+            if not isinstance(field, drf_serializers.ListSerializer):
+                raise UnsupportedSerializer(name)
+            try:
+                m2m = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise UnsupportedSerializer(name)
+            if not m2m.many_to_many or m2m.model is not model:
+                raise UnsupportedSerializer(name)
+            steps.append((name, None, None, len(self.relations)))
+            self.relations.append((m2m, _scalars(field.child)))
+        self.steps = tuple(steps)
+        self.columns = tuple(
+            dict.fromkeys(["pk"] + [step[1] for step in steps if step[3] is None])
+        )
+
+
+@lru_cache(maxsize=None)
+def compile_plan(serializer_class, fields=None):
+    """Return the plan of a serializer class, trimmed to fields if given"""
+    kwargs = {"fields": list(fields)} if fields is not None else {}
+    return Plan(serializer_class(**kwargs))
+
+
+def _related(m2m, scalars, ids):
+    """Return the rendered related objects of each id"""
+    related = {object_id: [] for object_id in ids}
+    if not ids:
+        return related
+    # Same query shape and order as prefetch_related().
+    owner = m2m.related_query_name()
+    rows = (
+        m2m.related_model.objects.filter(**{f"{owner}__in": ids})
+        .order_by("id")
+        .values(owner, *[column for _, column, _ in scalars])
+    )
+    for row in rows:
+        item = {}
+        for name, column, convert in scalars:
+            value = row[column]
+            item[name] = value if convert is None or value is None else convert(value)
+        related[row[owner]].append(item)
+    return related
+
+
+def _serialize(queryset, serializer_class, fields, normalized):
+    plan = compile_plan(serializer_class, tuple(fields) if fields else None)
+    rows = list(queryset.prefetch_related(None).values(*plan.columns))
+    ids = [row["pk"] for row in rows]
+    related = [_related(m2m, scalars, ids) for m2m, scalars in plan.relations]
+    vocabularies = []
+    if normalized:
+        for objects in related:
+            vocabulary = {}
+            for object_id, items in objects.items():
+                if items and "id" not in items[0]:
+                    raise UnsupportedSerializer("id")
+                for item in items:
+                    vocabulary[item["id"]] = item
+                objects[object_id] = [item["id"] for item in items]
+            vocabularies.append(vocabulary)
+
+    data = []
+    for row in rows:
+        item = {}
+        for name, column, convert, relation in plan.steps:
+            if relation is not None:
+                item[name] = related[relation][row["pk"]]
+                continue
+            value = row[column]
+            item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    names = [name for name, _, _, relation in plan.steps if relation is not None]
+    return data, dict(zip(names, vocabularies)), ids
+
+
+def serialize(queryset, serializer_class, fields=None):
+    """Render a queryset like serializer_class(queryset, many=True).data"""
+    return _serialize(queryset, serializer_class, fields, normalized=False)[0]
+
+
+def serialize_by_id(queryset, serializer_class, fields=None):
+    """Render a queryset like serialize(), keyed by primary key"""
+    data, _, ids = _serialize(queryset, serializer_class, fields, normalized=False)
+    return dict(zip(ids, data))
+
+
+def serialize_normalized(queryset, serializer_class, fields=None):
+    """Render nested objects as id lists and return them in dictionaries.
+
+    Returns the rendered objects and, for each nested field, a dictionary
+    of the referenced objects keyed by id.
+    """
+    return _serialize(queryset, serializer_class, fields, normalized=True)[:2]
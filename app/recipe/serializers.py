@@ -4,6 +4,17 @@ from rest_framework import serializers
 from core import models
 
 
+class SparseFieldsMixin:
+    """Render only the fields passed in the `fields` keyword argument"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredients"""
 
@@ -22,7 +33,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipe"""
 
     # This is a nested serializer. And by default it is readonly
@@ -102,6 +113,59 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ["description", "image"]
 
 
+class RecipeSyncSerializer(RecipeDetailSerializer):
+    """Serializer for recipes sent to syncing clients"""
+
+    class Meta(RecipeDetailSerializer.Meta):
+        fields = ["id"] + RecipeDetailSerializer.Meta.fields
+
+
+class ChangedIdsSerializer(serializers.Serializer):
+    """Serializer for the ids of the objects of each kind"""
+
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class ChangesSerializer(serializers.Serializer):
+    """Serializer for a page of the change log sync"""
+
+    reset = serializers.BooleanField(
+        help_text="The objects are the full data set, drop the local copy"
+    )
+    recipes = RecipeSyncSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = ChangedIdsSerializer(help_text="Ids of the deleted objects")
+    next = serializers.CharField(help_text="Token of the next sync")
+    more = serializers.BooleanField(help_text="More changes are waiting")
+
+
+class RecipeCoverageSerializer(serializers.ModelSerializer):
+    """Serializer for recipes ranked by pantry ingredient coverage"""
+
+    coverage = serializers.FloatField(read_only=True)
+    matched = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    # `missing` is attached to each recipe by the view, it is not a model field.
+    missing = IngredientSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Recipe
+        fields = [
+            "id",
+            "title",
+            "time_minutes",
+            "price",
+            "coverage",
+            "matched",
+            "total",
+            "missing",
+        ]
+        read_only_fields = fields
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
 
@@ -116,3 +180,44 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ["id", "image"]
         read_only_fields = ["id"]
         extra_kwargs = {"image": {"required": True}}
+
+
+class RecipeCloneSerializer(serializers.Serializer):
+    """Serializer for the options of cloning a recipe"""
+
+    title = serializers.CharField(max_length=255, required=False)
+    share_image = serializers.BooleanField(
+        default=False,
+        help_text="Point the clone to the image of the recipe instead of a copy",
+    )
+
+
+class TimeDistributionSerializer(serializers.Serializer):
+    """Serializer for the average and percentiles of the recipe times"""
+
+    average = serializers.FloatField(allow_null=True)
+    p50 = serializers.FloatField(allow_null=True)
+    p90 = serializers.FloatField(allow_null=True)
+    p99 = serializers.FloatField(allow_null=True)
+
+
+class PriceDistributionSerializer(serializers.Serializer):
+    """Serializer for the average and percentiles of the recipe prices"""
+
+    average = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+    p50 = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+    p90 = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+    p99 = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Serializer for the statistics of the recipes of a user.
+
+    Percentiles are estimates within 1% of the actual value.
+    """
+
+    recipes = serializers.IntegerField()
+    tags = serializers.IntegerField()
+    ingredients = serializers.IntegerField()
+    time_minutes = TimeDistributionSerializer()
+    price = PriceDistributionSerializer()
@@ -0,0 +1,108 @@
+"""
+Signal handlers invalidating the recipe documents and updating the stats.
+
+The API write paths rebuild the documents themselves, these handlers make
+sure writes made anywhere else never leave a stale document behind.
+"""
+from decimal import Decimal
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core import models
+from recipe import documents, stats
+
+
+@receiver(post_save, sender=models.Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if not created:
+        documents.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_save, sender=models.Ingredient)
+def attr_saved(sender, instance, created, **kwargs):
+    if not created:
+        documents.invalidate(instance.recipe_set.values("id"))
+
+
+@receiver(pre_delete, sender=models.Tag)
+@receiver(pre_delete, sender=models.Ingredient)
+def attr_deleted(sender, instance, **kwargs):
+    documents.invalidate(instance.recipe_set.values("id"))
+
+
+@receiver(m2m_changed, sender=models.Recipe.tags.through)
+@receiver(m2m_changed, sender=models.Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_") and action != "pre_clear":
+        return
+    if not reverse:
+        documents.invalidate([instance.pk])
+    elif action == "pre_clear":
+        documents.invalidate(instance.recipe_set.values("id"))
+    else:
+        documents.invalidate(pk_set or [])
+
+
+def _stats_values(recipe):
+    return (Decimal(str(recipe.price)), recipe.time_minutes)
+
+
+def _stats_field(sender):
+    return "tags" if sender is models.Tag else "ingredients"
+
+
+@receiver(pre_save, sender=models.Recipe)
+def recipe_pre_save(sender, instance, raw, using, **kwargs):
+    if raw or instance.pk is None:
+        return
+    # The owner and the values counted in the stats, replaced by the saved ones.
+    instance._stats_previous = (
+        models.Recipe.objects.using(using)
+        .filter(pk=instance.pk)
+        .values_list("user_id", "price", "time_minutes")
+        .first()
+    )
+
+
+@receiver(post_save, sender=models.Recipe)
+def recipe_stats_saved(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop("_stats_previous", None)
+    added = [_stats_values(instance)]
+    if previous is None:
+        stats.apply(instance.user_id, using, recipes=int(created), added=added)
+        return
+    user_id, removed = previous[0], [previous[1:]]
+    if user_id != instance.user_id:
+        # Moved to another user, the recipe leaves the stats of the first one.
+        stats.apply(user_id, using, recipes=-1, removed=removed)
+        stats.apply(instance.user_id, using, recipes=1, added=added)
+    elif removed != added:
+        stats.apply(instance.user_id, using, added=added, removed=removed)
+
+
+@receiver(post_delete, sender=models.Recipe)
+def recipe_stats_deleted(sender, instance, using, **kwargs):
+    stats.apply(instance.user_id, using, recipes=-1, removed=[_stats_values(instance)])
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_save, sender=models.Ingredient)
+def attr_stats_saved(sender, instance, created, raw, using, **kwargs):
+    if created and not raw:
+        stats.apply(instance.user_id, using, **{_stats_field(sender): 1})
+
+
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_delete, sender=models.Ingredient)
+def attr_stats_deleted(sender, instance, using, **kwargs):
+    stats.apply(instance.user_id, using, **{_stats_field(sender): -1})
@@ -0,0 +1,184 @@
+"""
+Per-user recipe statistics, kept up to date by the recipe write paths
+
+The percentiles come from sketches counting the values in logarithmic
+buckets: every value of a bucket is within ALPHA of the value reported for
+it. Unlike sampling sketches, removing a value is exact, so updates and
+deletions are increments too.
+"""
+import math
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import Count, Sum
+
+from core import models
+from core.db import sharding
+
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+PERCENTILES = (50, 90, 99)
+
+# Bucket of zero and negative values, logarithms only cover positive ones.
+ZERO = "z"
+
+
+def bucket(value):
+    """Return the sketch bucket of a value"""
+    value = float(value)
+    if value <= 0:
+        return ZERO
+    return str(math.ceil(math.log(value, GAMMA)))
+
+
+def _bucket_value(key):
+    if key == ZERO:
+        return 0.0
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+
+def add(sketch, value, count=1):
+    """Count a value in a sketch, a negative count removes it"""
+    key = bucket(value)
+    total = sketch.get(key, 0) + count
+    if total > 0:
+        sketch[key] = total
+    else:
+        sketch.pop(key, None)
+
+
+def percentile(sketch, p):
+    """Return the estimated p-th percentile of the values of a sketch"""
+    buckets = sorted(sketch.items(), key=lambda item: _bucket_value(item[0]))
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    rank = p / 100 * (total - 1)
+    seen = 0
+    for key, count in buckets:
+        seen += count
+        if seen > rank:
+            return _bucket_value(key)
+    return _bucket_value(buckets[-1][0])
+
+
+def _distribution(total, count, sketch):
+    summary = {"average": total / count if count else None}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = percentile(sketch, p)
+    return summary
+
+
+def summary(stats):
+    """Return the counts, averages and percentiles of a stats row"""
+    return {
+        "recipes": stats.recipes,
+        "tags": stats.tags,
+        "ingredients": stats.ingredients,
+        "time_minutes": _distribution(
+            stats.time_minutes_total, stats.recipes, stats.time_minutes_sketch
+        ),
+        "price": _distribution(stats.price_total, stats.recipes, stats.price_sketch),
+    }
+
+
+def _lock(user_id, using):
+    """Lock the stats of a user, return their row or None if there is none.
+
+    The user row is locked rather than the stats row, which may not exist
+    yet: a write applied while the row is computed waits for it to be
+    stored. NO KEY UPDATE still lets the user's rows reference it.
+    """
+    list(
+        get_user_model()
+        .objects.using(using)
+        .select_for_update(no_key=True)
+        .filter(id=user_id)
+        .values_list("id", flat=True)
+    )
+    return (
+        models.UserRecipeStats.objects.using(using)
+        .select_for_update()
+        .filter(user_id=user_id)
+        .first()
+    )
+
+
+def apply(user_id, using, recipes=0, tags=0, ingredients=0, added=(), removed=()):
+    """Apply a change of the data of a user to their stats.
+
+    added and removed hold the (price, time_minutes) of the recipes written.
+    Users without a stats row yet are left alone, the row is computed in
+    full when it is first read.
+    """
+    with transaction.atomic(using=using):
+        stats = _lock(user_id, using)
+        if stats is None:
+            return
+        stats.recipes += recipes
+        stats.tags += tags
+        stats.ingredients += ingredients
+        for values, sign in ((added, 1), (removed, -1)):
+            for price, time_minutes in values:
+                stats.price_total += sign * price
+                stats.time_minutes_total += sign * time_minutes
+                add(stats.price_sketch, price, sign)
+                add(stats.time_minutes_sketch, time_minutes, sign)
+        stats.save(using=using)
+
+
+def compute(user_id, using):
+    """Return an unsaved stats row computed from all the data of a user"""
+    stats = models.UserRecipeStats(user_id=user_id)
+    recipes = models.Recipe.objects.using(using).filter(user_id=user_id)
+    totals = recipes.aggregate(
+        count=Count("id"), price=Sum("price"), time_minutes=Sum("time_minutes")
+    )
+    stats.recipes = totals["count"]
+    stats.price_total = totals["price"] or 0
+    stats.time_minutes_total = totals["time_minutes"] or 0
+    for price, time_minutes in recipes.values_list("price", "time_minutes").iterator():
+        add(stats.price_sketch, price)
+        add(stats.time_minutes_sketch, time_minutes)
+    stats.tags = models.Tag.objects.using(using).filter(user_id=user_id).count()
+    stats.ingredients = (
+        models.Ingredient.objects.using(using).filter(user_id=user_id).count()
+    )
+    return stats
+
+
+def recompute(user_id):
+    """Compute the stats of a user in full and store them, return the row.
+
+    Writes applied meanwhile wait for the stored row, none is overwritten.
+    """
+    using = router.db_for_write(models.UserRecipeStats, user_id=user_id)
+    with transaction.atomic(using=using):
+        _lock(user_id, using)
+        stats = compute(user_id, using)
+        stats.save(using=using)
+    return stats
+
+
+def get(user_id):
+    """Return the stats row of a user, computing it the first time.
+
+    The row is computed under the lock of the writes, so every write is
+    either counted by the computation or applied to the stored row. It is
+    not stored while the user is moved to another shard, the copy may
+    already be done.
+    """
+    using = router.db_for_write(models.UserRecipeStats, user_id=user_id)
+    stats = models.UserRecipeStats.objects.using(using).filter(user_id=user_id).first()
+    if stats is not None:
+        return stats
+    if sharding.lookup(user_id)[1]:
+        return compute(user_id, using)
+    with transaction.atomic(using=using):
+        stored = _lock(user_id, using)
+        if stored is not None:
+            # Computed by a concurrent request.
+            return stored
+        stats = compute(user_id, using)
+        stats.save(using=using, force_insert=True)
+    return stats
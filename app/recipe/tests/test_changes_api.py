@@ -0,0 +1,210 @@
+""" Tests for the incremental sync API """
+import threading
+import unittest
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from recipe import views
+
+CHANGES_URL = reverse("recipe:changes")
+RECIPE_URL = reverse("recipe:recipe-list")
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class PublicChangesAPITests(TestCase):
+    """Test unauthenticated sync requests"""
+
+    def test_auth_required(self):
+        """Test auth is required to sync"""
+        res = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateChangesAPITests(TestCase):
+    """Test authenticated sync requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_full_sync_without_token(self):
+        """Test a sync without a token returns every object"""
+        recipe = create_recipe(user=self.user)
+        tag = models.Tag.objects.create(user=self.user, name="Dinner")
+        recipe.tags.add(tag)
+        other_user = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        create_recipe(user=other_user)
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data["reset"])
+        self.assertEqual([r["id"] for r in res.data["recipes"]], [recipe.id])
+        self.assertEqual(res.data["recipes"][0]["tags"][0]["name"], "Dinner")
+        self.assertEqual(res.data["tags"], [{"id": tag.id, "name": "Dinner"}])
+        self.assertIn("next", res.data)
+
+    def test_unchanged_sync_is_a_single_query(self):
+        """Test syncing an unchanged account costs one query"""
+        create_recipe(user=self.user)
+        token = self.client.get(CHANGES_URL).data["next"]
+
+        with self.assertNumQueries(1):
+            res = self.client.get(CHANGES_URL, {"since": token})
+
+        self.assertFalse(res.data["reset"])
+        self.assertEqual(res.data["recipes"], [])
+        self.assertEqual(res.data["next"], token)
+
+    def test_delta_sync_returns_changes_and_tombstones(self):
+        """Test a delta sync returns modified rows and deleted ids"""
+        unchanged = create_recipe(user=self.user, title="Unchanged")
+        recipe = create_recipe(user=self.user)
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipe.tags.add(tag)
+        deleted = create_recipe(user=self.user)
+        token = self.client.get(CHANGES_URL).data["next"]
+
+        deleted_id, tag_id = deleted.id, tag.id
+        deleted.delete()
+        tag.delete()
+        self.client.post(
+            RECIPE_URL,
+            {"title": "New", "time_minutes": 5, "price": "1.00"},
+            format="json",
+        )
+        res = self.client.get(CHANGES_URL, {"since": token})
+
+        self.assertFalse(res.data["reset"])
+        recipe_ids = [r["id"] for r in res.data["recipes"]]
+        self.assertIn(recipe.id, recipe_ids)
+        self.assertNotIn(unchanged.id, recipe_ids)
+        self.assertEqual(len(recipe_ids), 2)
+        self.assertEqual(res.data["deleted"]["recipes"], [deleted_id])
+        self.assertEqual(res.data["deleted"]["tags"], [tag_id])
+
+        res = self.client.get(CHANGES_URL, {"since": res.data["next"]})
+        self.assertEqual(res.data["recipes"], [])
+
+    def test_renaming_tag_marks_recipes_changed(self):
+        """Test renaming a tag sends the recipes using it again"""
+        recipe = create_recipe(user=self.user)
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipe.tags.add(tag)
+        token = self.client.get(CHANGES_URL).data["next"]
+
+        tag.name = "Brunch"
+        tag.save()
+        res = self.client.get(CHANGES_URL, {"since": token})
+
+        self.assertEqual(res.data["tags"], [{"id": tag.id, "name": "Brunch"}])
+        self.assertEqual(res.data["recipes"][0]["tags"][0]["name"], "Brunch")
+
+    def test_expired_token_triggers_full_resync(self):
+        """Test an expired or invalid token returns a full resync"""
+        create_recipe(user=self.user)
+        token = self.client.get(CHANGES_URL).data["next"]
+
+        with override_settings(SYNC_TOKEN_MAX_AGE=-1):
+            res = self.client.get(CHANGES_URL, {"since": token})
+        self.assertTrue(res.data["reset"])
+        self.assertEqual(len(res.data["recipes"]), 1)
+
+        res = self.client.get(CHANGES_URL, {"since": "not-a-token"})
+        self.assertTrue(res.data["reset"])
+
+    def test_token_without_transaction_triggers_full_resync(self):
+        """Test a token from before the commit ordering gets a full sync"""
+        token = signing.dumps(["default", 0], salt=views.ChangesView.TOKEN_SALT)
+
+        res = self.client.get(CHANGES_URL, {"since": token})
+
+        self.assertTrue(res.data["reset"])
+
+    def test_deleting_user_leaves_no_changes(self):
+        """Test deleting a user cascades without writing change entries"""
+        create_recipe(user=self.user)
+        self.user.delete()
+
+        self.assertFalse(models.Change.objects.exists())
+
+    @override_settings(SYNC_TOKEN_MAX_AGE=-1)
+    def test_prune_changes_removes_old_tombstones(self):
+        """Test the prune command only removes tombstones"""
+        kept = create_recipe(user=self.user)
+        create_recipe(user=self.user).delete()
+
+        call_command("prune_changes", stdout=StringIO())
+
+        self.assertEqual(
+            list(models.Change.objects.values_list("object_id", flat=True)),
+            [kept.id],
+        )
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class CommitOrderChangesAPITests(TransactionTestCase):
+    """Test syncs follow the commit order rather than the id order"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_running_transaction_holds_later_ids_back(self):
+        """Test a change committed after a later id is still synced"""
+        token = self.client.get(CHANGES_URL).data["next"]
+        writing = threading.Event()
+        commit = threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    models.Tag.objects.create(user=self.user, name="First")
+                    writing.set()
+                    commit.wait(5)
+            finally:
+                connections.close_all()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait(5)
+        models.Tag.objects.create(user=self.user, name="Second")
+
+        res = self.client.get(CHANGES_URL, {"since": token})
+        self.assertEqual(res.data["tags"], [])
+
+        commit.set()
+        writer.join()
+        res = self.client.get(CHANGES_URL, {"since": res.data["next"]})
+        self.assertEqual(
+            sorted(tag["name"] for tag in res.data["tags"]), ["First", "Second"]
+        )
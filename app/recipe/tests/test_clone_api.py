@@ -0,0 +1,146 @@
+"""Tests for cloning recipes"""
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+
+
+def clone_url(recipe_id):
+    return reverse("recipe:recipe-clone", args=[recipe_id])
+
+
+class CloneApiTests(TestCase):
+    """Test the clone action"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title="Curry",
+            time_minutes=30,
+            price=Decimal("5.50"),
+            description="Spicy",
+        )
+        self.tags = [
+            models.Tag.objects.create(user=self.user, name=name)
+            for name in ["Thai", "Dinner"]
+        ]
+        self.recipe.tags.set(self.tags)
+        self.recipe.ingredients.create(user=self.user, name="Rice")
+
+    def test_clone(self):
+        """Test the copy has the fields, tags and ingredients of the recipe"""
+        res = self.client.post(clone_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        copy = models.Recipe.objects.get(id=res.data["id"])
+        self.assertNotEqual(copy.id, self.recipe.id)
+        self.assertEqual(
+            (copy.title, copy.description, copy.price),
+            ("Curry", "Spicy", Decimal("5.50")),
+        )
+        self.assertEqual(set(copy.tags.all()), set(self.tags))
+        self.assertEqual([i.name for i in copy.ingredients.all()], ["Rice"])
+        self.assertEqual(
+            set(models.RecipeTag.objects.values_list("user_id", flat=True)),
+            {self.user.id},
+        )
+        self.assertEqual(len(res.data["tags"]), 2)
+        # The original keeps its links.
+        self.assertEqual(self.recipe.tags.count(), 2)
+
+    def test_clone_with_title(self):
+        res = self.client.post(clone_url(self.recipe.id), {"title": "Green curry"})
+
+        self.assertEqual(res.data["title"], "Green curry")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url)
+        return len(queries)
+
+    def test_clone_queries_independent_of_links(self):
+        """Test the links are copied in one statement per through table"""
+        url = clone_url(self.recipe.id)
+        few = self.count_queries(url)
+        for index in range(20):
+            self.recipe.tags.create(user=self.user, name=f"Tag {index}")
+
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_clone_records_change_and_document(self):
+        res = self.client.post(clone_url(self.recipe.id))
+
+        copy_id = res.data["id"]
+        self.assertTrue(
+            models.Change.objects.filter(
+                kind=models.Change.RECIPE, object_id=copy_id
+            ).exists()
+        )
+        self.assertTrue(
+            models.RecipeDocument.objects.filter(recipe_id=copy_id).exists()
+        )
+
+    def test_clone_other_users_recipe_not_found(self):
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        recipe = models.Recipe.objects.create(
+            user=other, title="Soup", time_minutes=5, price=Decimal("1.00")
+        )
+
+        res = self.client.post(clone_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(models.Recipe.objects.count(), 2)
+
+
+class CloneImageTests(TestCase):
+    """Test the image of a cloned recipe"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = models.Recipe(
+            user=self.user, title="Curry", time_minutes=30, price=Decimal("5.50")
+        )
+        self.recipe.image.save("curry.jpg", ContentFile(b"image"), save=False)
+        self.recipe.save()
+
+    def test_image_copied(self):
+        res = self.client.post(clone_url(self.recipe.id))
+
+        copy = models.Recipe.objects.get(id=res.data["id"])
+        self.assertNotEqual(copy.image.name, self.recipe.image.name)
+        self.assertTrue(os.path.exists(copy.image.path))
+        with copy.image.open("rb") as image:
+            self.assertEqual(image.read(), b"image")
+
+    def test_image_shared(self):
+        res = self.client.post(clone_url(self.recipe.id), {"share_image": True})
+
+        copy = models.Recipe.objects.get(id=res.data["id"])
+        self.assertEqual(copy.image.name, self.recipe.image.name)
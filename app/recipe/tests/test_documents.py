@@ -0,0 +1,209 @@
+"""Tests for the prerendered recipe documents"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import models
+from recipe import documents, serializers
+
+RECIPE_URL = reverse("recipe:recipe-list")
+
+
+def recipe_detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def tag_detail_url(tag_id):
+    return reverse("recipe:tag-detail", args=[tag_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+    }
+    defaults.update(params)
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeDocumentTests(TestCase):
+    """Test the documents are kept in step with the recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_create_builds_document(self):
+        """Test creating a recipe through the API builds its document."""
+        payload = {
+            "title": "Soup",
+            "time_minutes": 20,
+            "price": Decimal("3.00"),
+            "tags": [{"name": "Dinner"}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format="json")
+
+        recipe = models.Recipe.objects.get(title="Soup")
+        self.assertEqual(recipe.document.detail.encode(), res.content)
+
+    def test_retrieve_serves_document(self):
+        """Test retrieve serves the document in a single query."""
+        recipe = create_recipe(user=self.user)
+        documents.rebuild([recipe.id])
+
+        with self.assertNumQueries(1):
+            res = self.client.get(recipe_detail_url(recipe.id))
+
+        self.assertEqual(res.data, serializers.RecipeDetailSerializer(recipe).data)
+
+    def test_list_serves_documents(self):
+        """Test the list of built documents is served in a single query."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        documents.rebuild([recipe.id for recipe in recipes])
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(res.data[0]["tags"], [{"id": tag.id, "name": "Lunch"}])
+
+    def test_reads_do_not_build_documents(self):
+        """Test missing documents are rendered on read but not stored."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]["title"], recipe.title)
+        res = self.client.get(recipe_detail_url(recipe.id))
+        self.assertEqual(res.data["title"], recipe.title)
+
+        self.assertFalse(models.RecipeDocument.objects.exists())
+
+    def test_rebuild_twice(self):
+        recipe = create_recipe(user=self.user)
+        documents.rebuild([recipe.id])
+        models.Recipe.objects.filter(id=recipe.id).update(title="Renamed")
+        documents.rebuild([recipe.id])
+
+        document = models.RecipeDocument.objects.get()
+        self.assertIn('"title":"Renamed"', document.summary)
+
+    def test_missing_summaries_skip_detail(self):
+        """Test list misses render the summary only, as the documents do."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipes = [create_recipe(user=self.user) for _ in range(2)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        ids = [recipe.id for recipe in recipes]
+
+        detail = patch.object(serializers.RecipeDetailSerializer, "to_representation")
+        with detail as patched_detail:
+            summaries = documents.render_summaries(ids)
+
+        patched_detail.assert_not_called()
+        built = documents.rebuild(ids)
+        self.assertEqual(
+            summaries, {recipe_id: built[recipe_id].summary for recipe_id in ids}
+        )
+
+    def test_build_missing_documents(self):
+        """Test the build command builds only the missing documents."""
+        built = create_recipe(user=self.user)
+        documents.rebuild([built.id])
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        out = StringIO()
+        call_command("build_recipe_documents", "--batch-size=2", stdout=out)
+
+        self.assertIn("Built 3 documents", out.getvalue())
+        self.assertEqual(
+            set(models.RecipeDocument.objects.values_list("recipe_id", flat=True)),
+            {built.id} | {recipe.id for recipe in recipes},
+        )
+
+    def test_retrieve_other_user_document(self):
+        """Test retrieve does not serve the document of another user."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        recipe = create_recipe(user=other)
+        documents.rebuild([recipe.id])
+
+        res = self.client.get(recipe_detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_update_rebuilds_document(self):
+        """Test updating a recipe through the API rebuilds its document."""
+        recipe = create_recipe(user=self.user)
+        documents.rebuild([recipe.id])
+
+        self.client.patch(recipe_detail_url(recipe.id), {"title": "New"})
+
+        res = self.client.get(recipe_detail_url(recipe.id))
+        self.assertEqual(res.data["title"], "New")
+        self.assertIn('"title":"New"', models.RecipeDocument.objects.get().detail)
+
+    def test_tag_rename_rebuilds_recipes(self):
+        """Test renaming a tag rebuilds the documents of all its recipes."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        documents.rebuild([recipe.id for recipe in recipes])
+
+        self.client.patch(tag_detail_url(tag.id), {"name": "Brunch"})
+
+        self.assertEqual(models.RecipeDocument.objects.count(), 3)
+        for document in models.RecipeDocument.objects.all():
+            self.assertIn('"name":"Brunch"', document.summary)
+
+    def test_tag_delete_rebuilds_recipes(self):
+        """Test deleting a tag rebuilds the documents of its recipes."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        documents.rebuild([recipe.id])
+
+        self.client.delete(tag_detail_url(tag.id))
+
+        self.assertIn('"tags":[]', models.RecipeDocument.objects.get().detail)
+
+    def test_orm_writes_invalidate_documents(self):
+        """Test writes outside the API drop the documents they make stale."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipe = create_recipe(user=self.user)
+        documents.rebuild([recipe.id])
+
+        recipe.tags.add(tag)
+
+        self.assertFalse(models.RecipeDocument.objects.exists())
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]["tags"], [{"id": tag.id, "name": "Lunch"}])
+
+    def test_check_documents_reports_drift(self):
+        """Test the checker command reports and fixes drifted documents."""
+        recipe = create_recipe(user=self.user)
+        documents.rebuild([recipe.id])
+        models.RecipeDocument.objects.update(detail="{}")
+
+        out = StringIO()
+        call_command("check_recipe_documents", "--fix", stdout=out)
+
+        self.assertIn(f"Recipe {recipe.id} document drifted", out.getvalue())
+        out = StringIO()
+        call_command("check_recipe_documents", stdout=out)
+        self.assertIn("Checked 1 documents", out.getvalue())
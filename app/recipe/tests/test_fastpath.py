@@ -0,0 +1,116 @@
+"""Tests for the fast read path serializers"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from core import models
+from recipe import fastpath, serializers
+
+
+class FastPathTests(TestCase):
+    """Test the fast path renders exactly like the DRF serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        tags = [
+            models.Tag.objects.create(user=self.user, name=name)
+            for name in ["Vegan", "Dinner", "Ünïcödé"]
+        ]
+        ingredients = [
+            models.Ingredient.objects.create(user=self.user, name=name)
+            for name in ["Rice", "Oil"]
+        ]
+        for i, price in enumerate(["5.5", "0.01", "999.99", "12"]):
+            recipe = models.Recipe.objects.create(
+                user=self.user,
+                title=f"Recipe {i}",
+                time_minutes=i * 10,
+                price=Decimal(price),
+                link="" if i % 2 else "https://example.com/recipe",
+            )
+            recipe.tags.add(*tags[: i + 1])
+            recipe.ingredients.add(*ingredients[:i])
+
+    def assertRendersLike(self, queryset, serializer_class, fields=None):
+        """Assert the fast path output is byte for byte the serializer output"""
+        kwargs = {"fields": fields} if fields is not None else {}
+        expected = serializer_class(queryset, many=True, **kwargs).data
+        data = fastpath.serialize(queryset, serializer_class, fields)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(data), renderer.render(expected))
+
+    def test_recipe_serializer_equivalence(self):
+        """Test recipes render byte for byte like RecipeSerializer"""
+        queryset = models.Recipe.objects.filter(user=self.user).order_by("-id")
+
+        self.assertRendersLike(queryset, serializers.RecipeSerializer)
+
+    def test_sparse_recipe_serializer_equivalence(self):
+        """Test trimmed plans render like the trimmed serializer"""
+        queryset = models.Recipe.objects.order_by("id")
+
+        self.assertRendersLike(
+            queryset, serializers.RecipeSerializer, ["price", "tags"]
+        )
+        self.assertRendersLike(queryset, serializers.RecipeSerializer, ["title"])
+
+    def test_tag_and_ingredient_serializer_equivalence(self):
+        """Test tags and ingredients render like their serializers"""
+        self.assertRendersLike(
+            models.Tag.objects.order_by("-name"), serializers.TagSerializer
+        )
+        self.assertRendersLike(
+            models.Ingredient.objects.order_by("-name"),
+            serializers.IngredientSerializer,
+        )
+
+    def test_related_in_id_order(self):
+        """Test both paths order the tags by id, whatever order they were added"""
+        recipe = models.Recipe.objects.create(
+            user=self.user, title="Reversed", time_minutes=5, price=Decimal("1")
+        )
+        tags = list(models.Tag.objects.all())
+        for tag in reversed(tags):
+            recipe.tags.add(tag)
+        queryset = models.Recipe.objects.filter(id=recipe.id)
+        expected = [tag.id for tag in tags]
+
+        with CaptureQueriesContext(connection) as queries:
+            [data] = fastpath.serialize(queryset, serializers.RecipeSerializer)
+            [prefetched] = serializers.RecipeSerializer(
+                queryset.prefetch_related("tags", "ingredients"), many=True
+            ).data
+
+        self.assertEqual([tag["id"] for tag in data["tags"]], expected)
+        self.assertEqual([tag["id"] for tag in prefetched["tags"]], expected)
+        related = [
+            query["sql"]
+            for query in queries
+            if 'FROM "core_tag"' in query["sql"]
+            or 'FROM "core_ingredient"' in query["sql"]
+        ]
+        self.assertEqual(len(related), 4)
+        for sql in related:
+            self.assertRegex(sql, r'ORDER BY "core_(tag|ingredient)"\."id" ASC$')
+
+    def test_fixed_number_of_queries(self):
+        """Test recipes and their relations are fetched in three queries"""
+        with self.assertNumQueries(3):
+            fastpath.serialize(
+                models.Recipe.objects.all(), serializers.RecipeSerializer
+            )
+
+    def test_unsupported_serializer(self):
+        """Test serializers with files are rejected before any query"""
+        with self.assertNumQueries(0):
+            with self.assertRaises(fastpath.UnsupportedSerializer):
+                fastpath.serialize(
+                    models.Recipe.objects.all(), serializers.RecipeDetailSerializer
+                )
@@ -6,14 +6,17 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from recipe import serializers
+from recipe import serializers, views
 from core import models
 
 import tempfile
 import os
+import msgpack
 from PIL import Image
 
 RECIPE_URL = reverse("recipe:recipe-list")
+COOK_WITH_URL = reverse("recipe:recipe-cook-with")
+BATCH_URL = reverse("recipe:recipe-batch")
 
 
 def recipe_detail_url(recipe_id):
@@ -441,6 +444,248 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(serializerRecipe2.data, res.data)
         self.assertNotIn(serializerRecipe3.data, res.data)
 
+    def test_cook_with_ranks_by_coverage(self):
+        """Test recipes are ranked by the fraction of pantry ingredients."""
+        rice = models.Ingredient.objects.create(user=self.user, name="Rice")
+        oil = models.Ingredient.objects.create(user=self.user, name="Oil")
+        beef = models.Ingredient.objects.create(user=self.user, name="Beef")
+        pepper = models.Ingredient.objects.create(user=self.user, name="Pepper")
+        jollof = create_recipe(user=self.user, title="Jollof Rice")
+        jollof.ingredients.add(rice, oil, pepper, beef)
+        fried = create_recipe(user=self.user, title="Fried Rice")
+        fried.ingredients.add(rice, oil)
+        suya = create_recipe(user=self.user, title="Suya")
+        suya.ingredients.add(beef, pepper)
+
+        params = {"ingredients": f"{rice.id},{oil.id}"}
+        res = self.client.get(COOK_WITH_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["title"] for r in res.data], ["Fried Rice", "Jollof Rice"])
+        self.assertEqual(res.data[0]["coverage"], 1.0)
+        self.assertEqual(res.data[0]["missing"], [])
+        self.assertEqual(res.data[1]["coverage"], 0.5)
+        self.assertEqual(res.data[1]["matched"], 2)
+        self.assertEqual(res.data[1]["total"], 4)
+        self.assertEqual(
+            [i["name"] for i in res.data[1]["missing"]], ["Beef", "Pepper"]
+        )
+
+    def test_cook_with_limited_to_user_and_top_k(self):
+        """Test cook-with only ranks the user's recipes and honours limit."""
+        other_user = create_user(email="other@example.com", password="pass12345")
+        other_salt = models.Ingredient.objects.create(user=other_user, name="Salt")
+        create_recipe(user=other_user).ingredients.add(other_salt)
+        salt = models.Ingredient.objects.create(user=self.user, name="Salt")
+        for _ in range(3):
+            create_recipe(user=self.user).ingredients.add(salt)
+
+        params = {"ingredients": f"{salt.id},{other_salt.id}", "limit": 2}
+        with self.assertNumQueries(2):
+            res = self.client.get(COOK_WITH_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+
+    def test_cook_with_requires_ingredients(self):
+        """Test cook-with returns an error without pantry ingredients."""
+        res = self.client.get(COOK_WITH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_retrieve_recipes(self):
+        """Test retrieving several recipes keyed by ID in one request."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        ingredient = models.Ingredient.objects.create(user=self.user, name="Yam")
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        other_recipe = create_recipe(
+            user=create_user(email="other@example.com", password="pass12345")
+        )
+
+        ids = [recipe.id for recipe in recipes] + [other_recipe.id, 9999]
+        params = {"ids": ",".join(str(recipe_id) for recipe_id in ids)}
+        with self.assertNumQueries(3):
+            res = self.client.get(BATCH_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 5)
+        for recipe in recipes:
+            serializer = serializers.RecipeDetailSerializer(recipe)
+            self.assertEqual(res.data["results"][str(recipe.id)], serializer.data)
+        self.assertEqual(res.data["not_found"], [other_recipe.id, 9999])
+
+    def test_batch_retrieve_limits_ids(self):
+        """Test batch retrieve rejects too many IDs."""
+        ids = range(1, views.RecipeViewSet.BATCH_MAX_IDS + 2)
+        params = {"ids": ",".join(str(recipe_id) for recipe_id in ids)}
+        res = self.client.get(BATCH_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_prefetches_relations(self):
+        """Test listing recipes runs a fixed number of queries."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        for _ in range(3):
+            create_recipe(user=self.user).tags.add(tag)
+
+        # The documents, then the recipes with their tags and ingredients.
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["tags"], [{"id": tag.id, "name": "Lunch"}])
+
+    def test_list_sparse_fields(self):
+        """Test listing recipes with only the requested fields."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(models.Tag.objects.create(user=self.user, name="Lunch"))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {"fields": "title,time_minutes"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{"title": recipe.title, "time_minutes": recipe.time_minutes}]
+        )
+
+    def test_list_expand_relations(self):
+        """Test expand only renders and prefetches the named relations."""
+        recipe = create_recipe(user=self.user)
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        recipe.tags.add(tag)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL, {"fields": "title", "expand": "tags"})
+
+        self.assertEqual(
+            res.data,
+            [{"title": recipe.title, "tags": [{"id": tag.id, "name": "Lunch"}]}],
+        )
+        res = self.client.get(RECIPE_URL, {"expand": "ingredients"})
+        self.assertNotIn("tags", res.data[0])
+        self.assertIn("price", res.data[0])
+        self.assertEqual(res.data[0]["ingredients"], [])
+
+    def test_retrieve_sparse_fields(self):
+        """Test retrieving a recipe with only the requested fields."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(recipe_detail_url(recipe.id), {"fields": "description"})
+
+        self.assertEqual(res.data, {"description": recipe.description})
+
+    def test_sparse_fields_unknown_field_error(self):
+        """Test requesting an unknown field returns an error."""
+        res = self.client.get(RECIPE_URL, {"fields": "title,user"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_recipes_msgpack(self):
+        """Test listing recipes as MessagePack through content negotiation."""
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT="application/msgpack")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/msgpack")
+        json_res = self.client.get(RECIPE_URL, HTTP_ACCEPT="application/json")
+        self.assertEqual(msgpack.unpackb(res.content), json_res.json())
+
+    def test_create_recipe_msgpack(self):
+        """Test creating a recipe from a MessagePack body."""
+        payload = {
+            "title": "Pepper Soup",
+            "time_minutes": 25,
+            "price": "4.50",
+            "tags": [{"name": "Spicy"}],
+        }
+
+        res = self.client.post(
+            RECIPE_URL, msgpack.packb(payload), content_type="application/msgpack"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = models.Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, payload["title"])
+        self.assertTrue(recipe.tags.filter(name="Spicy").exists())
+
+    def test_list_normalized_shape(self):
+        """Test the normalized list shares one tag and ingredient dictionary."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        unused_tag = models.Tag.objects.create(user=self.user, name="Unused")
+        ingredient = models.Ingredient.objects.create(user=self.user, name="Rice")
+        for _ in range(2):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPE_URL, {"shape": "normalized"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["recipes"]), 2)
+        for recipe in res.data["recipes"]:
+            self.assertEqual(recipe["tags"], [tag.id])
+            self.assertEqual(recipe["ingredients"], [ingredient.id])
+        self.assertEqual(res.data["tags"], {tag.id: {"id": tag.id, "name": "Lunch"}})
+        self.assertNotIn(unused_tag.id, res.data["tags"])
+        self.assertEqual(
+            res.data["ingredients"],
+            {ingredient.id: {"id": ingredient.id, "name": "Rice"}},
+        )
+
+    def test_list_normalized_vocabulary_version(self):
+        """Test dictionaries are omitted while the cached version is current."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        create_recipe(user=self.user).tags.add(tag)
+        version = self.client.get(
+            RECIPE_URL, {"shape": "normalized", "vocabulary": ""}
+        ).data["vocabulary_version"]
+
+        params = {"shape": "normalized", "vocabulary": version}
+        res = self.client.get(RECIPE_URL, params)
+        self.assertIsNone(res.data["tags"])
+        self.assertEqual(res.data["recipes"][0]["tags"], [tag.id])
+
+        tag.name = "Brunch"
+        tag.save()
+        res = self.client.get(RECIPE_URL, params)
+        self.assertNotEqual(res.data["vocabulary_version"], version)
+        self.assertEqual(res.data["tags"][tag.id]["name"], "Brunch")
+
+    def test_list_normalized_versioned_vocabulary_is_complete(self):
+        """Test a cached vocabulary resolves tags linked after it was sent."""
+        tag = models.Tag.objects.create(user=self.user, name="Lunch")
+        other_tag = models.Tag.objects.create(user=self.user, name="Dinner")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPE_URL, {"shape": "normalized", "vocabulary": ""})
+        cached = res.data["tags"]
+        self.assertIn(other_tag.id, cached)
+
+        recipe.tags.add(other_tag)
+        params = {"shape": "normalized", "vocabulary": res.data["vocabulary_version"]}
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertIsNone(res.data["tags"])
+        for tag_id in res.data["recipes"][0]["tags"]:
+            self.assertIn(tag_id, cached)
+
+    def test_list_normalized_without_vocabulary_not_versioned(self):
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {"shape": "normalized"})
+
+        self.assertIsNone(res.data["vocabulary_version"])
+
+    def test_list_invalid_shape_error(self):
+        """Test an unknown shape returns an error."""
+        res = self.client.get(RECIPE_URL, {"shape": "flat"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ImageUploadTests(TestCase):
     """Tests for Image Upload API"""
@@ -0,0 +1,55 @@
+"""Tests for reading the recipes from the replicas"""
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.db import routers
+
+RECIPE_URL = reverse("recipe:recipe-list")
+
+
+@patch("core.db.routers.replica_aliases", return_value=["replica_1"])
+class ReplicaReadTests(TestCase):
+    """Test the recipe views opt in to the replicas"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        caches["default"].delete(f"db:sticky:{self.user.id}")
+        self.addCleanup(caches["default"].delete, f"db:sticky:{self.user.id}")
+        self.entered = []
+
+    @contextmanager
+    def recording_replica_reads(self):
+        self.entered.append(True)
+        yield
+
+    def test_safe_request_reads_replica(self, patched_aliases):
+        """Test a list by a user who did not write is read from a replica"""
+        with patch("core.db.routers.replica_reads", self.recording_replica_reads):
+            self.client.get(RECIPE_URL)
+
+        self.assertEqual(self.entered, [True])
+
+    def test_write_makes_user_sticky(self, patched_aliases):
+        """Test the reads following a write go to the primary"""
+        payload = {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        with patch("core.db.routers.replica_reads", self.recording_replica_reads):
+            self.client.post(RECIPE_URL, payload)
+            self.client.get(RECIPE_URL)
+
+        self.assertEqual(self.entered, [])
+        self.assertTrue(routers.is_sticky(self.user.id))
+
+    def test_failed_write_not_sticky(self, patched_aliases):
+        self.client.post(RECIPE_URL, {"title": ""})
+
+        self.assertFalse(routers.is_sticky(self.user.id))
@@ -0,0 +1,283 @@
+"""Tests for the recipe stats"""
+import random
+import statistics
+import threading
+import unittest
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from recipe import stats
+
+STATS_URL = reverse("recipe:stats")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_recipe(user, price="5.00", time_minutes=10, **params):
+    return models.Recipe.objects.create(
+        user=user,
+        title=params.pop("title", "Recipe"),
+        price=Decimal(price),
+        time_minutes=time_minutes,
+        **params,
+    )
+
+
+class SketchTests(SimpleTestCase):
+    """Test the percentile sketches"""
+
+    def test_percentiles_within_alpha(self):
+        values = [random.lognormvariate(3, 1) for _ in range(5000)]
+        sketch = {}
+        for value in values:
+            stats.add(sketch, value)
+
+        quantiles = statistics.quantiles(values, n=100, method="inclusive")
+        for p in stats.PERCENTILES:
+            actual = quantiles[p - 1]
+            self.assertAlmostEqual(
+                stats.percentile(sketch, p), actual, delta=actual * 0.03
+            )
+
+    def test_remove_restores_sketch(self):
+        sketch = {}
+        stats.add(sketch, 10)
+        stats.add(sketch, 20)
+        stats.add(sketch, 20, -1)
+
+        other = {}
+        stats.add(other, 10)
+        self.assertEqual(sketch, other)
+
+    def test_zero(self):
+        sketch = {}
+        stats.add(sketch, 0)
+
+        self.assertEqual(stats.percentile(sketch, 50), 0)
+
+    def test_empty(self):
+        self.assertIsNone(stats.percentile({}, 50))
+
+
+class IncrementalStatsTests(TestCase):
+    """Test the stats follow the writes once computed"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        create_recipe(self.user, price="4.00", time_minutes=20)
+        stats.get(self.user.id)
+
+    def assertMatchesRecompute(self, user=None):
+        user = user or self.user
+        stored = models.UserRecipeStats.objects.get(user=user)
+        computed = stats.compute(user.id, "default")
+        for field in [
+            "recipes",
+            "tags",
+            "ingredients",
+            "time_minutes_total",
+            "price_total",
+            "time_minutes_sketch",
+            "price_sketch",
+        ]:
+            self.assertEqual(getattr(stored, field), getattr(computed, field), field)
+
+    def test_create_update_delete(self):
+        recipe = create_recipe(self.user, price="9.99", time_minutes=45)
+        self.assertMatchesRecompute()
+
+        recipe.price = Decimal("2.50")
+        recipe.save()
+        self.assertMatchesRecompute()
+
+        recipe.delete()
+        self.assertMatchesRecompute()
+        self.assertEqual(models.UserRecipeStats.objects.get(user=self.user).recipes, 1)
+
+    def test_tags_and_ingredients(self):
+        tag = models.Tag.objects.create(user=self.user, name="Vegan")
+        models.Ingredient.objects.create(user=self.user, name="Salt")
+        self.assertMatchesRecompute()
+
+        tag.delete()
+        self.assertMatchesRecompute()
+
+    def test_other_users_unchanged(self):
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        create_recipe(other)
+
+        self.assertEqual(models.UserRecipeStats.objects.get(user=self.user).recipes, 1)
+
+    def test_reassigned_recipe(self):
+        """Test a recipe given to another user moves between their stats"""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        stats.get(other.id)
+        recipe = create_recipe(self.user, price="9.99", time_minutes=45)
+
+        recipe.user = other
+        recipe.save()
+
+        self.assertMatchesRecompute()
+        self.assertMatchesRecompute(other)
+        self.assertEqual(models.UserRecipeStats.objects.get(user=other).recipes, 1)
+
+
+class StatsApiTests(TestCase):
+    """Test the stats endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_empty(self):
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["recipes"], 0)
+        self.assertIsNone(res.data["price"]["average"])
+        self.assertIsNone(res.data["time_minutes"]["p50"])
+
+    def test_stats(self):
+        for price, time_minutes in [("2.00", 10), ("4.00", 20), ("9.00", 60)]:
+            create_recipe(self.user, price=price, time_minutes=time_minutes)
+        models.Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(
+            (res.data["recipes"], res.data["tags"], res.data["ingredients"]),
+            (3, 1, 0),
+        )
+        self.assertEqual(res.data["price"]["average"], "5.00")
+        self.assertEqual(res.data["time_minutes"]["average"], 30)
+        self.assertAlmostEqual(res.data["time_minutes"]["p50"], 20, delta=0.2)
+        self.assertAlmostEqual(float(res.data["price"]["p50"]), 4, delta=0.04)
+
+    def test_follows_api_writes(self):
+        self.client.get(STATS_URL)
+        res = self.client.post(
+            RECIPES_URL,
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "5.50",
+                "tags": [{"name": "Thai"}],
+            },
+            format="json",
+        )
+        recipe = models.Recipe.objects.get(title="Curry")
+        self.client.patch(detail_url(recipe.id), {"time_minutes": 40}, format="json")
+        self.client.post(reverse("recipe:recipe-clone", args=[recipe.id]))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual((res.data["recipes"], res.data["tags"]), (2, 1))
+        self.assertEqual(res.data["time_minutes"]["average"], 40)
+
+    def test_other_users_excluded(self):
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        create_recipe(other)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipes"], 0)
+
+
+class RecomputeStatsCommandTests(TestCase):
+    """Test the recompute_stats command"""
+
+    def test_repairs_drift(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        create_recipe(user)
+        stats.get(user.id)
+        models.UserRecipeStats.objects.filter(user=user).update(recipes=7)
+        out = StringIO()
+
+        call_command("recompute_stats", stdout=out)
+
+        self.assertIn(f"User {user.id} stats drifted", out.getvalue())
+        self.assertEqual(models.UserRecipeStats.objects.get(user=user).recipes, 1)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class ConcurrentStatsTests(TransactionTestCase):
+    """Test computing the stats does not lose concurrent writes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+
+    def write_while(self, read):
+        """Run read while a recipe is written in another transaction"""
+        writing = threading.Event()
+        commit = threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    create_recipe(self.user)
+                    writing.set()
+                    commit.wait(5)
+            finally:
+                connections.close_all()
+
+        def run_read():
+            try:
+                read()
+            finally:
+                connections.close_all()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait(5)
+        reader = threading.Thread(target=run_read)
+        reader.start()
+        # The read waits for the write to commit.
+        reader.join(0.5)
+        commit.set()
+        writer.join()
+        reader.join()
+
+    def test_first_read_counts_concurrent_write(self):
+        self.write_while(lambda: stats.get(self.user.id))
+
+        self.assertEqual(models.UserRecipeStats.objects.get(user=self.user).recipes, 1)
+
+    def test_recompute_keeps_concurrent_write(self):
+        stats.get(self.user.id)
+
+        self.write_while(lambda: stats.recompute(self.user.id))
+
+        self.assertEqual(models.UserRecipeStats.objects.get(user=self.user).recipes, 1)
@@ -14,4 +14,8 @@ router.register("ingredients", views.IngredientViewSet)
 app_name = "recipe"
 
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("changes/", views.ChangesView.as_view(), name="changes"),
+    path("stats/", views.StatsView.as_view(), name="stats"),
+    path("", include(router.urls)),
+]
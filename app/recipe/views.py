@@ -1,4 +1,5 @@
 """ Views for the recipe APIs"""
+from contextlib import ExitStack
 
 from drf_spectacular.utils import (
     extend_schema_view,
@@ -6,14 +7,112 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.core import signing
+from django.db import router, transaction
+from django.db.models import Count, FloatField, Max, Q
+from django.db.models.functions import Cast
+from django.http import Http404
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import authentication
 from rest_framework import permissions
 
-from recipe import serializers
+from recipe import cloning, documents, fastpath, serializers, stats
 from core import models
+from core.db import routers, sharding, txids
+from core.renderers import ORJSONRenderer, PrerenderedJSONResponse
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        description="Comma separated list of the fields to return",
+    ),
+    OpenApiParameter(
+        "expand",
+        description="Comma separated list of the related fields (tags, ingredients) "
+        "to return in addition to the other fields",
+    ),
+]
+
+
+class FastListMixin:
+    """List objects through the fast read path when the serializer allows it"""
+
+    def get_list_fields(self):
+        """Return the fields to render in the list, None for all"""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None:
+            try:
+                data = fastpath.serialize(
+                    self.filter_queryset(self.get_queryset()),
+                    self.get_serializer_class(),
+                    self.get_list_fields(),
+                )
+            except fastpath.UnsupportedSerializer:
+                pass
+            else:
+                return Response(data)
+        return super().list(request, *args, **kwargs)
+
+
+class ShardMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Your recipes are being moved, try again shortly."
+    default_code = "shard_moving"
+
+
+class ShardMixin:
+    """Send the queries of a request to the shard of the user"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._shard = ExitStack()
+        if request.user.is_authenticated:
+            shard, moving = sharding.lookup(request.user.id)
+            if moving and request.method not in permissions.SAFE_METHODS:
+                raise ShardMoving()
+            self._shard.enter_context(sharding.use_shard(shard))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if hasattr(self, "_shard"):
+            self._shard.close()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def atomic(self):
+        """Return a transaction on the database of the recipe data"""
+        return transaction.atomic(using=router.db_for_write(models.Recipe))
+
+
+class ReplicaReadMixin:
+    """Read from a replica on safe requests, unless the user wrote recently"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_reads = ExitStack()
+        if (
+            request.method in permissions.SAFE_METHODS
+            and routers.replica_aliases()
+            and not routers.is_sticky(request.user.id)
+        ):
+            self._replica_reads.enter_context(routers.replica_reads())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if hasattr(self, "_replica_reads"):
+            self._replica_reads.close()
+        if (
+            request.method not in permissions.SAFE_METHODS
+            and request.user.is_authenticated
+            and response.status_code < 400
+        ):
+            routers.mark_written(request.user.id)
+        return super().finalize_response(request, response, *args, **kwargs)
+
 
 """We are using the extend schema view which is the decorator that allows us to extend 
 the auto generated schema that is generated by the DRF spectacular."""
@@ -31,16 +130,67 @@ the auto generated schema that is generated by the DRF spectacular."""
                 # OpenApiParameter.STR,
                 description="Comma separated list of ingredient IDs to filter ",
             ),
+            OpenApiParameter(
+                "shape",
+                enum=["nested", "normalized"],
+                description="normalized renders tags and ingredients as ID lists "
+                "and returns them once in top-level dictionaries",
+            ),
+            OpenApiParameter(
+                "vocabulary",
+                description="vocabulary_version of the cached tags and ingredients, "
+                "the dictionaries are null when it is still current. When it is "
+                "not, or empty, they hold all the tags and ingredients of the user",
+            ),
         ]
-    )
+        + SPARSE_FIELDS_PARAMETERS
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+    batch=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                description="Comma separated list of recipe IDs to retrieve",
+                required=True,
+            ),
+        ]
+    ),
+    clone=extend_schema(
+        request=serializers.RecipeCloneSerializer,
+        responses={201: serializers.RecipeSyncSerializer},
+    ),
+    cook_with=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ingredients",
+                description="Comma separated list of ingredient IDs in the pantry",
+                required=True,
+            ),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum number of recipes to return (default 10)",
+            ),
+        ]
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ShardMixin, ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet
+):
     """View for managing Recipe API"""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = models.Recipe.objects.all()
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    COOK_WITH_LIMIT = 10
+    COOK_WITH_MAX_LIMIT = 100
+    BATCH_MAX_IDS = 50
+    RELATED_FIELDS = ["tags", "ingredients"]
+    VOCABULARIES = {
+        "tags": (models.Tag, serializers.TagSerializer),
+        "ingredients": (models.Ingredient, serializers.IngredientSerializer),
+    }
     # authentication_classes = (authentication.TokenAuthentication,)
     # permissions_classes = (permissions.IsAuthenticated,)
 
@@ -73,14 +223,161 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ingredient_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
         # We are filtering by filters we have been filtering by: self.queryset
-        return (
+        queryset = (
             queryset.filter(user=self.request.user).order_by("-id").distinct()
         )  # we need to make it distinct because we could have multiple tags or ingredients added to the same recipe.
+        if self.action in ("list", "retrieve"):
+            queryset = self._select_columns(queryset)
+        return queryset
 
         # return self.queryset.filter(user=self.request.user)
         # recipes = self.queryset.filter(user=self.request.user).order_by("-id")
         # return recipes
 
+    def _requested_fields(self):
+        """Return the fields asked with `fields` and `expand`, or None for all"""
+        if hasattr(self, "_fields"):
+            return self._fields
+        self._fields = None
+        fields = self.request.query_params.get("fields")
+        expand = self.request.query_params.get("expand")
+        if self.action not in ("list", "retrieve") or not (fields or expand):
+            return None
+
+        available = self.get_serializer_class().Meta.fields
+        if fields:
+            requested = {name.strip() for name in fields.split(",")}
+        else:
+            requested = set(available) - set(self.RELATED_FIELDS)
+        if expand:
+            requested |= {name.strip() for name in expand.split(",")}
+        unknown = requested - set(available)
+        if unknown:
+            raise ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}."}
+            )
+        self._fields = [name for name in available if name in requested]
+        return self._fields
+
+    def _select_columns(self, queryset):
+        """Only load the columns and relations of the rendered fields"""
+        fields = self._requested_fields()
+        rendered = self.get_serializer_class().Meta.fields if fields is None else fields
+        related = [name for name in self.RELATED_FIELDS if name in rendered]
+        if related:
+            queryset = queryset.prefetch_related(*related)
+        if fields is not None:
+            columns = [name for name in fields if name not in self.RELATED_FIELDS]
+            queryset = queryset.only("id", *columns)
+        return queryset
+
+    def get_list_fields(self):
+        return self._requested_fields()
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, optionally in the normalized shape"""
+        shape = request.query_params.get("shape", "nested")
+        if shape not in ("nested", "normalized"):
+            raise ValidationError({"shape": "Expected nested or normalized."})
+        if shape == "nested":
+            if self._serves_documents():
+                return self._list_documents()
+            return super().list(request, *args, **kwargs)
+
+        recipes, vocabularies = fastpath.serialize_normalized(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            self.get_list_fields(),
+        )
+        version = None
+        cached = request.query_params.get("vocabulary")
+        if cached is not None:
+            version = self._vocabulary_version(request.user)
+            if cached == version:
+                vocabularies = dict.fromkeys(vocabularies)
+            else:
+                vocabularies = self._vocabularies(request.user, vocabularies)
+        return Response(
+            {"recipes": recipes, **vocabularies, "vocabulary_version": version}
+        )
+
+    def _vocabulary_version(self, user):
+        # Tag and ingredient changes all bump the change sequence of the user.
+        return str(
+            models.Change.objects.filter(
+                user=user, kind__in=[models.Change.TAG, models.Change.INGREDIENT]
+            ).aggregate(seq=Max("id"))["seq"]
+            or 0
+        )
+
+    def _vocabularies(self, user, names):
+        """Return all the tags and ingredients of the user, keyed by id.
+
+        A cached version resolves the ids of any page, whatever the recipes
+        or their links, until a tag or an ingredient changes.
+        """
+        vocabularies = {}
+        for name in names:
+            model, serializer_class = self.VOCABULARIES[name]
+            items = fastpath.serialize(
+                model.objects.filter(user=user).order_by("id"), serializer_class
+            )
+            vocabularies[name] = {item["id"]: item for item in items}
+        return vocabularies
+
+    def _serves_documents(self):
+        """Whether the response is the prerendered JSON of whole recipes"""
+        return (
+            isinstance(self.request.accepted_renderer, ORJSONRenderer)
+            and self._requested_fields() is None
+        )
+
+    def _list_documents(self):
+        rows = list(
+            self.filter_queryset(self.get_queryset()).values_list(
+                "id", "document__summary"
+            )
+        )
+        summaries = dict(rows)
+        missing = [recipe_id for recipe_id, summary in rows if summary is None]
+        if missing:
+            # Rendered without being stored, reads never write. Writes
+            # outside the API leave these until build_recipe_documents runs.
+            summaries.update(documents.render_summaries(missing))
+        body = "[" + ",".join(summaries[recipe_id] for recipe_id, _ in rows) + "]"
+        return PrerenderedJSONResponse(body.encode())
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe from its prerendered document when possible"""
+        if not self._serves_documents():
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            recipe_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        row = (
+            models.RecipeDocument.objects.filter(
+                recipe_id=recipe_id, recipe__user=request.user
+            )
+            .values_list("detail", "has_image")
+            .first()
+        )
+        if row is None:
+            # Not built yet, reads never write.
+            return super().retrieve(request, *args, **kwargs)
+        detail, has_image = row
+        if has_image:
+            # The image URL is absolute, it depends on the request host.
+            return super().retrieve(request, *args, **kwargs)
+        return PrerenderedJSONResponse(detail.encode())
+
+    def get_serializer(self, *args, **kwargs):
+        """Trim the serializer to the requested fields"""
+        fields = self._requested_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
     # DRF Own Way of knowing the model to work with based on the action.
     # Override the method and do somethings here.
     def get_serializer_class(self):
@@ -90,12 +387,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # actions are ways of adding additional functionalities ontop of the default functionality on the django modelviewset
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
+        elif self.action == "batch":
+            return serializers.RecipeDetailSerializer
+        elif self.action == "cook_with":
+            return serializers.RecipeCoverageSerializer
+        elif self.action == "clone":
+            return serializers.RecipeCloneSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new recipe. This perform create is used to override the behaviour for when DRF saves a model for a viewset"""
 
-        serializer.save(user=self.request.user)
+        with self.atomic():
+            recipe = serializer.save(user=self.request.user)
+            documents.rebuild([recipe.id])
+
+    def perform_update(self, serializer):
+        with self.atomic():
+            recipe = serializer.save()
+            documents.rebuild([recipe.id])
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
@@ -103,10 +413,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with self.atomic():
+                serializer.save()
+                documents.rebuild([recipe.id])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=["POST"], detail=True)
+    def clone(self, request, pk=None):
+        """Copy a recipe with its tags and ingredients, return the copy"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with self.atomic():
+            copy = cloning.clone(recipe, **serializer.validated_data)
+            documents.rebuild([copy.id])
+        copy = models.Recipe.objects.prefetch_related(*self.RELATED_FIELDS).get(
+            pk=copy.pk
+        )
+        # The detail fields and the id of the copy.
+        return Response(
+            serializers.RecipeSyncSerializer(
+                copy, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(methods=["GET"], detail=False, url_path="batch")
+    def batch(self, request):
+        """Retrieve several recipes by ID in a fixed number of queries"""
+        ids = request.query_params.get("ids")
+        if not ids:
+            raise ValidationError({"ids": "This query parameter is required."})
+        try:
+            # dict.fromkeys removes duplicates while keeping the request order.
+            recipe_ids = list(dict.fromkeys(self._params_to_ints(ids)))
+        except ValueError:
+            raise ValidationError({"ids": "Expected comma separated integer IDs."})
+        if len(recipe_ids) > self.BATCH_MAX_IDS:
+            raise ValidationError(
+                {"ids": f"At most {self.BATCH_MAX_IDS} IDs can be requested."}
+            )
+
+        recipes = self.queryset.filter(
+            user=request.user, id__in=recipe_ids
+        ).prefetch_related("tags", "ingredients")
+        found = {recipe.id: recipe for recipe in recipes}
+        results = {
+            str(recipe_id): self.get_serializer(found[recipe_id]).data
+            for recipe_id in recipe_ids
+            if recipe_id in found
+        }
+        not_found = [recipe_id for recipe_id in recipe_ids if recipe_id not in found]
+        return Response({"results": results, "not_found": not_found})
+
+    @action(methods=["GET"], detail=False, url_path="cook-with")
+    def cook_with(self, request):
+        """Rank recipes by the fraction of their ingredients in the pantry"""
+        pantry = request.query_params.get("ingredients")
+        if not pantry:
+            raise ValidationError({"ingredients": "This query parameter is required."})
+        try:
+            pantry_ids = set(self._params_to_ints(pantry))
+            limit = int(request.query_params.get("limit", self.COOK_WITH_LIMIT))
+        except ValueError:
+            raise ValidationError("Expected comma separated integer IDs and limit.")
+        limit = max(1, min(limit, self.COOK_WITH_MAX_LIMIT))
+
+        # A single grouped query computes the coverage of every recipe, the
+        # recipes without any pantry ingredient are dropped before ranking.
+        recipes = list(
+            self.queryset.filter(user=request.user)
+            .annotate(
+                total=Count("ingredients", distinct=True),
+                matched=Count(
+                    "ingredients",
+                    filter=Q(ingredients__id__in=pantry_ids),
+                    distinct=True,
+                ),
+            )
+            .filter(matched__gt=0)
+            .annotate(
+                coverage=Cast("matched", FloatField()) / Cast("total", FloatField())
+            )
+            .order_by("-coverage", "-matched", "-id")[:limit]
+        )
+
+        # Fetch the missing ingredients of the top-k recipes in one more query.
+        missing = {recipe.id: [] for recipe in recipes}
+        rows = (
+            models.Recipe.ingredients.through.objects.filter(recipe_id__in=missing)
+            .exclude(ingredient_id__in=pantry_ids)
+            .values_list("recipe_id", "ingredient_id", "ingredient__name")
+            .order_by("recipe_id", "ingredient__name")
+        )
+        for recipe_id, ingredient_id, name in rows:
+            missing[recipe_id].append({"id": ingredient_id, "name": name})
+        for recipe in recipes:
+            recipe.missing = missing[recipe.id]
+
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -121,6 +529,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
 )
 class BaseRecipeAttrViewSet(
+    ShardMixin,
+    ReplicaReadMixin,
+    FastListMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
@@ -142,6 +553,18 @@ class BaseRecipeAttrViewSet(
             queryset = queryset.filter(recipe__isnull=False)
         return queryset.filter(user=self.request.user).order_by("-name").distinct()
 
+    def perform_update(self, serializer):
+        """Rename the object and rebuild the documents of its recipes"""
+        with self.atomic():
+            instance = serializer.save()
+            documents.rebuild_for(instance)
+
+    def perform_destroy(self, instance):
+        with self.atomic():
+            recipe_ids = list(instance.recipe_set.values_list("id", flat=True))
+            instance.delete()
+            documents.rebuild(recipe_ids)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
@@ -163,3 +586,122 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     # def get_queryset(self):
     #     """Filter queryset to authenticated user"""
     #     return self.queryset.filter(user=self.request.user).order_by("-name")
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "since",
+            description="Token returned by the previous sync, omit for a full sync",
+        ),
+    ],
+    responses=serializers.ChangesSerializer,
+)
+class ChangesView(ShardMixin, APIView):
+    """Sync the recipes, tags and ingredients changed since a token"""
+
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    PAGE_SIZE = 500
+    TOKEN_SALT = "recipe.changes"
+    KEYS = {
+        models.Change.RECIPE: "recipes",
+        models.Change.TAG: "tags",
+        models.Change.INGREDIENT: "ingredients",
+    }
+
+    def _make_token(self, position):
+        # Positions are per shard, see core.db.sharding.
+        return signing.dumps(
+            [sharding.current_shard(), *position], salt=self.TOKEN_SALT
+        )
+
+    def _read_token(self, token):
+        """Return the (txid, id) position of a token, or None if it is invalid,
+        expired or from another shard"""
+        try:
+            shard, txid, seq = signing.loads(
+                token, salt=self.TOKEN_SALT, max_age=settings.SYNC_TOKEN_MAX_AGE
+            )
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        return (txid, seq) if shard == sharding.current_shard() else None
+
+    def get(self, request):
+        """Return the changed rows, the tombstones and the next token"""
+        since = request.query_params.get("since")
+        position = self._read_token(since) if since else None
+        if position is None:
+            return Response(self._full_sync(request.user))
+        return Response(self._delta_sync(request.user, position))
+
+    def _payload(self, user, changed, deleted, position, reset=False, more=False):
+        """Serialize the changed objects of each kind"""
+        sources = {
+            "recipes": (
+                models.Recipe.objects.prefetch_related("tags", "ingredients"),
+                serializers.RecipeSyncSerializer,
+            ),
+            "tags": (models.Tag.objects, serializers.TagSerializer),
+            "ingredients": (models.Ingredient.objects, serializers.IngredientSerializer),
+        }
+        payload = {"reset": reset}
+        for key, (queryset, serializer_class) in sources.items():
+            if not reset and not changed[key]:
+                payload[key] = []
+                continue
+            queryset = queryset.filter(user=user).order_by("id")
+            if not reset:
+                queryset = queryset.filter(id__in=changed[key])
+            payload[key] = serializer_class(
+                queryset, many=True, context={"request": self.request}
+            ).data
+        payload.update(deleted=deleted, next=self._make_token(position), more=more)
+        return payload
+
+    def _full_sync(self, user):
+        # Read the position first, changes racing with the sync are sent again.
+        changes = models.Change.objects.filter(user=user)
+        xmin = txids.xmin(changes.db)
+        if xmin is not None:
+            position = (xmin, 0)
+        else:
+            position = (0, changes.aggregate(seq=Max("id"))["seq"] or 0)
+        empty = {key: [] for key in self.KEYS.values()}
+        return self._payload(user, empty, empty, position, reset=True)
+
+    def _delta_sync(self, user, position):
+        """Return the changes after a position, in commit order.
+
+        Changes of transactions still running are left for the next sync,
+        even when a later id already committed.
+        """
+        txid, seq = position
+        entries = list(
+            txids.finished(models.Change.objects.filter(user=user))
+            .filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=seq))
+            .order_by("txid", "id")
+            .values_list("txid", "id", "kind", "object_id", "deleted")[
+                : self.PAGE_SIZE + 1
+            ]
+        )
+        more = len(entries) > self.PAGE_SIZE
+        entries = entries[: self.PAGE_SIZE]
+        changed = {key: [] for key in self.KEYS.values()}
+        deleted = {key: [] for key in self.KEYS.values()}
+        for txid, seq, kind, object_id, is_deleted in entries:
+            (deleted if is_deleted else changed)[self.KEYS[kind]].append(object_id)
+        return self._payload(user, changed, deleted, (txid, seq), more=more)
+
+
+class StatsView(ShardMixin, APIView):
+    """Counts and distributions of the recipes of the user"""
+
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @extend_schema(responses=serializers.RecipeStatsSerializer)
+    def get(self, request):
+        """Return the stats, read from a single row kept up to date"""
+        summary = stats.summary(stats.get(request.user.id))
+        return Response(serializers.RecipeStatsSerializer(summary).data)
@@ -6,6 +6,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import AccountDeletion
+
 CREATE_USER_URL = reverse("user:create")  # url for making test request
 CREATE_TOKEN_URL = reverse("user:token")
 ME_URL = reverse("user:me")
@@ -142,3 +144,16 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(self.user.name, payload["name"])
         # self.assertTrue(self.user.check_password(payload["password"]))
+
+    def test_delete_profile_schedules_deletion(self):
+        """Test deleting the profile deactivates the user and defers deletion"""
+        res = self.client.delete(ME_URL)
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(
+            AccountDeletion.objects.filter(
+                user_id=self.user.id, status=AccountDeletion.PENDING
+            ).exists()
+        )
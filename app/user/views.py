@@ -1,7 +1,10 @@
 """ User API Views """
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+
+from core.deletion import schedule_deletion
 from user import serializers
 
 
@@ -15,10 +18,10 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
 
     serializer_class = serializers.AuthTokenSerializer
-    renderer_class = api_settings.DEFAULT_RENDERER_CLASSES
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
 
     serializer_class = serializers.UserSerializer
@@ -28,3 +31,10 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return the authenticated user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user now and delete their data in the background"""
+        schedule_deletion(self.get_object())
+        return Response(
+            {"detail": "Account deletion scheduled."}, status=status.HTTP_202_ACCEPTED
+        )
@@ -5,6 +5,20 @@ server{
         alias /vol/static;
     }
 
+    location /api/recipe/events/ {
+        proxy_pass              http://${EVENTS_HOST}:${EVENTS_PORT};
+        proxy_http_version      1.1;
+        proxy_set_header        Connection "";
+        proxy_buffering         off;
+        proxy_read_timeout      1h;
+    }
+
+    location ~ ^/(admin|api/schema|api/docs)/ {
+        uwsgi_pass              ${ADMIN_HOST}:${ADMIN_PORT};
+        include                 /etc/nginx/uwsgi_params;
+        client_max_body_size    10M;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
@@ -2,8 +2,24 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+if [ "${SKIP_SETUP:-0}" = "1" ]; then
+    # Another service collects the static files and migrates.
+    python manage.py wait_for_db --probe
+elif [ "${FAST_BOOT:-0}" = "1" ]; then
+    python manage.py fast_boot
+else
+    python manage.py wait_for_db
+    python manage.py collectstatic --noinput
+    python manage.py migrate_shards
+fi
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+WORKERS=$(python -m app.workers)
+if [ "${PRELOAD:-0}" = "1" ]; then
+    # Loaded and frozen in the master, then shared by the forked workers.
+    MODULE=app.wsgi_preload
+else
+    MODULE=app.wsgi
+fi
+echo "Starting $WORKERS workers with $MODULE"
+
+uwsgi --socket :9000 --workers "$WORKERS" --master --enable-threads --module "$MODULE"